@@ -0,0 +1,61 @@
+"""Compare the legacy and streaming XML cleaning stages on a multi-megabyte song."""
+
+import argparse
+import io
+import tempfile
+import time
+from pathlib import Path
+
+from lxml import etree
+from synthetic_card import big_song_xml
+
+from deluge_card.deluge_xml import read_and_clean_xml
+
+
+def legacy_read_and_clean_xml(xml_path):
+    """The previous implementation, copying every line into a BytesIO."""
+    newxml = io.BytesIO()
+    with open(xml_path, 'rb') as f:
+        lcount = 0
+        for line in f.readlines():
+            lcount += 1
+            if b'<firmwareVersion>' == line[:17] and lcount < 3:
+                continue
+            if b'<earliestCompatibleFirmware>' == line[:28] and lcount < 4:
+                continue
+            newxml.write(line)
+    newxml.seek(0)
+    return newxml
+
+
+def measure(label: str, clean, xml_path: Path, repeat: int) -> None:
+    """Print the mean time to clean, and to clean and parse xml_path."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        clean(xml_path).read()
+    cleaned = (time.perf_counter() - start) / repeat
+
+    start = time.perf_counter()
+    for _ in range(repeat):
+        etree.parse(clean(xml_path), etree.XMLParser(recover=True))
+    parsed = (time.perf_counter() - start) / repeat
+    print(f'{label:8}  clean {cleaned * 1000:7.2f}ms  clean+parse {parsed * 1000:7.2f}ms')
+
+
+def main():
+    """Main entrypoint."""
+    parser = argparse.ArgumentParser(description='bench_clean_xml.py - XML cleaning stage micro-benchmark.')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--instruments', type=int, default=40, help='song size, in copies of the fixture instruments.')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        xml_path = Path(tmp, 'SONG.XML')
+        xml_path.write_bytes(big_song_xml(args.instruments))
+        print(f'song size {xml_path.stat().st_size / 1e6:.1f}MB')
+        measure('legacy', legacy_read_and_clean_xml, xml_path, args.repeat)
+        measure('stream', read_and_clean_xml, xml_path, args.repeat)
+
+
+if __name__ == '__main__':
+    main()  # pragma: no cover
@@ -0,0 +1,164 @@
+"""Measure the memory held by the full sample usage map of a synthetic card.
+
+The same sample references are read from every song and built into a usage map
+(sample path => settings) in each representation, in its own process:
+
+* before: `Sample` and `SampleSetting` as they were, slotted attrs classes with a
+  weakref slot, a fresh Path per reference and the xpath string of each reference.
+* after: the current classes, without the weakref slot, Paths shared through
+  `helpers.sample_path` and interned xpaths, as `DelugeXml.samples_from_refs()` builds them.
+* used_samples: `DelugeCardFS.used_samples()` itself, for reference (it also checks that
+  the samples exist, through the card's folder listings).
+
+lxml allocates outside the Python heap, which `tracemalloc` does not see, so the growth
+of the peak resident set size is reported too.
+"""
+
+import argparse
+import gc
+import multiprocessing
+import resource
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+from typing import List
+
+from attrs import define, field
+from synthetic_card import make_synthetic_card
+
+from deluge_card import DelugeCardFS
+from deluge_card.deluge_sample import Sample, SampleSetting
+from deluge_card.helpers import ensure_absolute, sample_path
+
+
+@define
+class OldSample(object):
+    """Sample before the change: weakref slot, a Path per reference."""
+
+    path: Path
+    settings: List['OldSampleSetting'] = field(factory=list, eq=False)
+
+    def __eq__(self, other):
+        return super(OldSample, self).__eq__(other)
+
+    def __hash__(self):
+        return super(OldSample, self).__hash__()
+
+
+@define
+class OldSampleSetting(object):
+    """SampleSetting before the change: weakref slot, an xpath string per reference."""
+
+    xml_file: object
+    sample: OldSample
+    xml_path: str
+
+
+def usage_map(card: DelugeCardFS, new_sample, new_setting) -> list:
+    """Build the usage map from the references of every song, merging the samples of each file."""
+    sample_map: dict = dict()
+    for xml in card.songs():
+        file_map: dict = dict()
+        for sample_file, xpath in xml.sample_refs():
+            sample = new_sample(card.card_root, sample_file, file_map)
+            sample.settings.append(new_setting(xml, sample, xpath))
+        for sample in file_map.values():
+            if sample.path in sample_map:
+                sample_map[sample.path].settings += sample.settings
+            else:
+                sample_map[sample.path] = sample
+    return list(sample_map.values())
+
+
+def before(card: DelugeCardFS) -> list:
+    """Usage map in the representation before the change."""
+
+    def new_sample(root, sample_file, file_map):
+        sample = OldSample(ensure_absolute(root, Path(sample_file)))
+        return file_map.setdefault(sample.path, sample)
+
+    return usage_map(card, new_sample, OldSampleSetting)
+
+
+def after(card: DelugeCardFS) -> list:
+    """Usage map in the current representation."""
+
+    def new_sample(root, sample_file, file_map):
+        path = sample_path(root, sample_file)
+        sample = file_map.get(path)
+        if sample is None:
+            sample = file_map[path] = Sample(path)
+        return sample
+
+    def new_setting(xml, sample, xpath):
+        return SampleSetting(xml, sample, sys.intern(xpath))
+
+    return usage_map(card, new_sample, new_setting)
+
+
+def used_samples(card: DelugeCardFS) -> list:
+    """Usage map from the library."""
+    return list(card.used_samples())
+
+
+def max_rss() -> int:
+    """Peak resident set size of this process, in bytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss if sys.platform == 'darwin' else rss * 1024
+
+
+def measure(name: str, run, card_root: Path, results):
+    """Run one representation on a fresh card, printing the time and the memory it holds."""
+    card = DelugeCardFS(card_root)
+    list(card.songs())  # not counted, the same for all
+    sample_path.cache_clear()
+    gc.collect()
+    rss = max_rss()
+    tracemalloc.start()
+    start = time.perf_counter()
+    samples = run(card)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = max_rss() - rss
+
+    refs = sum(len(s.settings) for s in samples)
+    print(
+        f'{name:>12}: {len(samples)} samples, {refs} references in {elapsed:.2f}s, '
+        f'python heap {current / 1e6:.1f}MB ({current / refs:.0f} bytes/reference), peak {peak / 1e6:.1f}MB, '
+        f'RSS peak +{rss / 1e6:.1f}MB'
+    )
+    results.put(current)
+
+
+def measure_apart(name: str, run, card_root: Path) -> int:
+    """Measure one representation in a fresh process, so nothing is shared with the others."""
+    context = multiprocessing.get_context('spawn')
+    results = context.Queue()
+    process = context.Process(target=measure, args=(name, run, card_root, results))
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main():
+    """Main entrypoint."""
+    parser = argparse.ArgumentParser(description='bench_memory.py - memory of the used_samples() usage map.')
+    parser.add_argument('--songs', type=int, default=1000, help='~50 sample references per song.')
+    parser.add_argument('--samples', type=int, default=2000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        make_synthetic_card(Path(tmp), songs=args.songs, kits=0, synths=0, samples=args.samples)
+        old = measure_apart('before', before, Path(tmp))
+        new = measure_apart('after', after, Path(tmp))
+        measure_apart('used_samples', used_samples, Path(tmp))
+        print(f'after vs before: python heap {new / old:.0%}')
+
+
+if __name__ == '__main__':
+    main()  # pragma: no cover
@@ -0,0 +1,44 @@
+"""Compare serial and parallel whole-card sample scans on a synthetic card."""
+
+import argparse
+import os
+import tempfile
+import time
+from pathlib import Path
+
+from synthetic_card import make_synthetic_card
+
+from deluge_card import DelugeCardFS
+
+
+def timed_scan(card_root: Path, workers: int, use_processes: bool) -> float:
+    """Time a full used_samples() scan, with a fresh card instance."""
+    card = DelugeCardFS(card_root)
+    start = time.perf_counter()
+    count = sum(len(s.settings) for s in card.used_samples(workers=workers, use_processes=use_processes))
+    elapsed = time.perf_counter() - start
+    print(f'  workers={workers:2d} processes={use_processes!s:5}  {elapsed:7.2f}s  ({count} settings)')
+    return elapsed
+
+
+def main():
+    """Main entrypoint."""
+    parser = argparse.ArgumentParser(description='bench_parallel_scan.py - serial vs parallel used_samples().')
+    parser.add_argument('--files', type=int, default=5000, help='number of XML files on the synthetic card.')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 4)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        songs = args.files * 8 // 10
+        kits = synths = (args.files - songs) // 2
+        print(f'building synthetic card: {songs} songs, {kits} kits, {synths} synths')
+        make_synthetic_card(Path(tmp), songs=songs, kits=kits, synths=synths, samples=2000)
+
+        serial = timed_scan(Path(tmp), 0, False)
+        threads = timed_scan(Path(tmp), args.workers, False)
+        processes = timed_scan(Path(tmp), args.workers, True)
+        print(f'speedup: threads x{serial / threads:.2f}, processes x{serial / processes:.2f}')
+
+
+if __name__ == '__main__':
+    main()  # pragma: no cover
@@ -0,0 +1,35 @@
+"""Compare tree-based and streaming sample reference extraction."""
+
+import argparse
+import time
+from pathlib import Path
+
+from deluge_card.deluge_xml import parse_xml, read_sample_refs, read_sample_refs_tree, sample_refs_from_tree
+
+
+def measure(label: str, func, xml_files, repeat: int) -> None:
+    """Print the mean time of func over xml_files."""
+    start = time.perf_counter()
+    for _ in range(repeat):
+        count = sum(len(func(p)) for p in xml_files)
+    elapsed = (time.perf_counter() - start) / repeat
+    print(f'{label:10}  {elapsed * 1000:8.1f}ms  ({count} refs)')
+
+
+def main():
+    """Main entrypoint."""
+    parser = argparse.ArgumentParser(description='bench_sample_refs.py - tree vs streaming sample discovery.')
+    parser.add_argument('xml', nargs='*', help='XML files, defaults to the DC01 test fixtures.')
+    parser.add_argument('--repeat', type=int, default=10)
+    args = parser.parse_args()
+
+    fixtures = Path(__file__).parent.parent / 'tests' / 'fixtures' / 'DC01'
+    xml_files = [Path(p) for p in args.xml] or sorted(fixtures.rglob('*.XML'))
+
+    measure('tree', lambda p: sample_refs_from_tree(parse_xml(p)), xml_files, args.repeat)
+    measure('tree bytes', read_sample_refs_tree, xml_files, args.repeat)
+    measure('streaming', read_sample_refs, xml_files, args.repeat)
+
+
+if __name__ == '__main__':
+    main()  # pragma: no cover
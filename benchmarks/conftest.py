@@ -0,0 +1,58 @@
+"""Fixtures for the benchmark suite: synthetic cards, built once per session."""
+
+import os
+import shutil
+from pathlib import Path
+
+import pytest
+from synthetic_card import make_presets, make_synthetic_card
+
+from deluge_card import DelugeCardFS
+
+# card size, override with e.g. DELUGE_BENCH_SONGS=2000
+SONGS = int(os.environ.get('DELUGE_BENCH_SONGS', 200))
+KITS = int(os.environ.get('DELUGE_BENCH_KITS', 50))
+SYNTHS = int(os.environ.get('DELUGE_BENCH_SYNTHS', 50))
+SAMPLES = int(os.environ.get('DELUGE_BENCH_SAMPLES', 1000))
+PRESETS = int(os.environ.get('DELUGE_BENCH_PRESETS', 5000))
+
+
+@pytest.fixture(scope='session')
+def synthetic_root(tmp_path_factory) -> Path:
+    """Root folder of a synthetic card, shared by read-only benchmarks."""
+    root = tmp_path_factory.mktemp('card')
+    make_synthetic_card(root, songs=SONGS, kits=KITS, synths=SYNTHS, samples=SAMPLES)
+    return root
+
+
+@pytest.fixture(scope='session')
+def preset_root(tmp_path_factory) -> Path:
+    """Root folder of a synthetic card holding only synth and kit presets."""
+    root = tmp_path_factory.mktemp('presets')
+    DelugeCardFS.initialise(str(root))
+    make_presets(root, PRESETS)
+    for path in root.glob('*/*.XML'):
+        # age them past the card index's mtime window, so their digests are trusted
+        st = path.stat()
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - 10**10))
+    return root
+
+
+@pytest.fixture
+def card(synthetic_root) -> DelugeCardFS:
+    """A fresh card instance, so no state is cached between rounds."""
+    return DelugeCardFS(synthetic_root)
+
+
+@pytest.fixture
+def card_copy(synthetic_root, tmp_path):
+    """Factory for writable copies of the synthetic card."""
+    count = [0]
+
+    def copy() -> DelugeCardFS:
+        count[0] += 1
+        root = Path(tmp_path, f'copy{count[0]}')
+        shutil.copytree(synthetic_root, root)
+        return DelugeCardFS(root)
+
+    return copy
@@ -0,0 +1,133 @@
+"""Build synthetic Deluge cards for benchmarking.
+
+Songs, kits and synths are copied from the test fixture templates, with their
+sample references rewritten to point at generated sample files.
+"""
+
+import argparse
+import random
+import re
+import struct
+from pathlib import Path
+from typing import List
+
+from deluge_card import DelugeCardFS
+
+FIXTURES = Path(__file__).parent.parent / 'tests' / 'fixtures' / 'DC01'
+
+FILE_NAME_ATTR = re.compile(rb'fileName="[^"]*"')
+FILE_NAME_ELEM = re.compile(rb'<fileName>[^<]*</fileName>')
+PARAM_VALUE = re.compile(rb'0x[0-9A-F]{8}')
+
+
+def wav_bytes(frames: int = 32, channels: int = 1, rate: int = 44100, bits: int = 16) -> bytes:
+    """A minimal PCM WAV file."""
+    block = channels * bits // 8
+    data = bytes(frames * block)
+    fmt = struct.pack('<HHIIHH', 1, channels, rate, rate * block, block, bits)
+    body = b'WAVE' + b'fmt ' + struct.pack('<I', len(fmt)) + fmt + b'data' + struct.pack('<I', len(data)) + data
+    return b'RIFF' + struct.pack('<I', len(body)) + body
+
+
+def make_samples(card_root: Path, count: int, per_folder: int = 50) -> List[str]:
+    """Write count sample files, returning their card-relative paths."""
+    paths = []
+    for i in range(count):
+        rel = f'SAMPLES/SYNTHETIC/F{i // per_folder:03d}/S{i:05d}.wav'
+        dest = Path(card_root, rel)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        dest.write_bytes(wav_bytes(frames=32 + i % 64))
+        paths.append(rel)
+    return paths
+
+
+def rewrite_refs(xml: bytes, samples: List[str], rnd: random.Random) -> bytes:
+    """Point every sample reference in xml at a random synthetic sample."""
+    xml = FILE_NAME_ATTR.sub(lambda m: f'fileName="{rnd.choice(samples)}"'.encode(), xml)
+    return FILE_NAME_ELEM.sub(lambda m: f'<fileName>{rnd.choice(samples)}</fileName>'.encode(), xml)
+
+
+def big_song_xml(repeat: int = 40) -> bytes:
+    """A large song, made by repeating the instruments of a fixture song."""
+    xml = Path(FIXTURES, 'SONGS', 'SONG002A.XML').read_bytes()
+    start = xml.index(b'<instruments>') + len(b'<instruments>')
+    end = xml.index(b'</instruments>')
+    return xml[:start] + xml[start:end] * repeat + xml[end:]
+
+
+def tweak_params(xml: bytes, rnd: random.Random, fraction: float) -> bytes:
+    """Give about fraction of the 32 bit parameter values in xml a new random value."""
+
+    def tweak(match):
+        return f'0x{rnd.getrandbits(32):08X}'.encode() if rnd.random() < fraction else match.group()
+
+    return PARAM_VALUE.sub(tweak, xml)
+
+
+def make_presets(card_root: Path, count: int, seed: int = 42) -> None:
+    """Write count synth and kit presets, a tenth exact copies and a tenth near copies of another.
+
+    Args:
+        card_root (Path): root folder of a card.
+        count (int): number of presets, split evenly between SYNTHS and KITS.
+        seed (int): random seed, for repeatable presets.
+    """
+    rnd = random.Random(seed)
+    for folder, prefix in [('SYNTHS', 'SYNT'), ('KITS', 'KIT')]:
+        templates = [p.read_bytes() for p in sorted(Path(FIXTURES, folder).glob('*.XML'))]
+        written: List[bytes] = []
+        for i in range(count // 2):
+            kind = rnd.random()
+            if written and kind < 0.1:
+                xml = rnd.choice(written)  # exact copy
+            elif written and kind < 0.2:
+                xml = PARAM_VALUE.sub(lambda m: f'0x{int(m.group()[2:], 16) ^ 1:08X}'.encode(), rnd.choice(written))
+            else:
+                xml = tweak_params(templates[i % len(templates)], rnd, 0.5)
+            written.append(xml)
+            Path(card_root, folder, f'{prefix}{i:05d}.XML').write_bytes(xml)
+
+
+def make_synthetic_card(
+    card_root: Path, songs: int = 100, kits: int = 20, synths: int = 20, samples: int = 200, seed: int = 42
+) -> DelugeCardFS:
+    """Create a synthetic card in the (empty) card_root folder.
+
+    Args:
+        card_root (Path): an empty folder.
+        songs (int): number of songs.
+        kits (int): number of kits.
+        synths (int): number of synths.
+        samples (int): number of sample files.
+        seed (int): random seed, for repeatable cards.
+
+    Returns:
+        card (DelugeCardFS): the new card.
+    """
+    rnd = random.Random(seed)
+    card = DelugeCardFS.initialise(str(card_root))
+    sample_paths = make_samples(card.card_root, max(samples, 1))
+    for folder, count, prefix in [('SONGS', songs, 'SONG'), ('KITS', kits, 'KIT'), ('SYNTHS', synths, 'SYNT')]:
+        templates = [p.read_bytes() for p in sorted(Path(FIXTURES, folder).glob('*.XML'))]
+        for i in range(count):
+            xml = rewrite_refs(templates[i % len(templates)], sample_paths, rnd)
+            Path(card.card_root, folder, f'{prefix}{i:05d}.XML').write_bytes(xml)
+    return card
+
+
+def main():
+    """Main entrypoint."""
+    parser = argparse.ArgumentParser(description='synthetic_card.py - build a synthetic deluge card.')
+    parser.add_argument('root', help='empty folder for the new card.')
+    parser.add_argument('--songs', type=int, default=100)
+    parser.add_argument('--kits', type=int, default=20)
+    parser.add_argument('--synths', type=int, default=20)
+    parser.add_argument('--samples', type=int, default=200)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args()
+
+    make_synthetic_card(Path(args.root), args.songs, args.kits, args.synths, args.samples, args.seed)
+
+
+if __name__ == '__main__':
+    main()  # pragma: no cover
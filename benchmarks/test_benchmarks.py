@@ -0,0 +1,82 @@
+"""Benchmarks for the hot paths, run with `pytest benchmarks` (needs pytest-benchmark)."""
+
+from pathlib import Path
+
+import pytest
+
+from deluge_card import DelugeCardFS
+from deluge_card.deluge_xml import parse_xml, read_sample_refs, read_sample_refs_tree
+
+pytest.importorskip('pytest_benchmark')
+
+
+def test_duplicate_presets(benchmark, preset_root):
+    card = DelugeCardFS(preset_root)
+    report = benchmark.pedantic(lambda: card.duplicate_presets(workers=4, use_processes=True), rounds=1)
+    assert report.groups
+
+
+def test_duplicate_presets_indexed(benchmark, preset_root):
+    DelugeCardFS(preset_root, use_index=True).duplicate_presets()  # the digests of unchanged presets are kept
+    report = benchmark(lambda: DelugeCardFS(preset_root, use_index=True).duplicate_presets())
+    assert report.groups
+
+
+def test_near_duplicate_presets(benchmark, preset_root):
+    pytest.importorskip('numpy')
+    card = DelugeCardFS(preset_root)
+    report = benchmark.pedantic(
+        lambda: card.duplicate_presets(tolerance=0.001, workers=4, use_processes=True), rounds=1
+    )
+    assert not all(group.exact for group in report.groups)
+
+
+def test_list_songs(benchmark, synthetic_root):
+    songs = benchmark(lambda: list(DelugeCardFS(synthetic_root).songs()))
+    assert len(songs) > 0
+
+
+def test_list_songs_pattern(benchmark, synthetic_root):
+    benchmark(lambda: list(DelugeCardFS(synthetic_root).songs('**/SONG000?1.XML')))
+
+
+def test_used_samples(benchmark, synthetic_root):
+    samples = benchmark(lambda: list(DelugeCardFS(synthetic_root).used_samples()))
+    assert len(samples) > 0
+
+
+def test_samples(benchmark, synthetic_root):
+    benchmark(lambda: list(DelugeCardFS(synthetic_root).samples()))
+
+
+def test_parse_song(benchmark, card):
+    song = next(card.songs())
+    benchmark(parse_xml, song.path)
+
+
+def test_read_song_sample_refs(benchmark, card):
+    song = next(card.songs())
+    benchmark(read_sample_refs_tree, song.path)
+
+
+def test_stream_song_sample_refs(benchmark, card):
+    song = next(card.songs())
+    benchmark(read_sample_refs, song.path)
+
+
+def test_song_tempo_and_scale(benchmark, card):
+    songs = [song.load() for song in card.songs()]
+    benchmark(lambda: [(song.tempo(), song.scale()) for song in songs])
+
+
+def test_mv_samples(benchmark, card_copy):
+    def setup():
+        card = card_copy()
+        Path(card.card_root, 'SAMPLES', 'MV').mkdir()
+        return (card,), {}
+
+    def move(card):
+        return list(card.mv_samples('**/SYNTHETIC/F000/*.wav', Path('SAMPLES/MV')))
+
+    modops = benchmark.pedantic(move, setup=setup, rounds=5)
+    assert len(modops) > 0
@@ -0,0 +1,79 @@
+"""Helpers running blocking card operations from asyncio, without stalling the event loop."""
+
+import asyncio
+import collections
+from concurrent.futures import Executor
+from typing import AsyncIterator, Callable, Deque, Iterable, List, Optional, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+DEFAULT_CONCURRENCY = 4
+
+
+async def run_blocking(executor: Optional[Executor], fn: Callable[..., R], *args) -> R:
+    """Run a blocking function in an executor.
+
+    Args:
+        executor (Optional[Executor]): the executor, None for the event loop's default executor.
+        fn (Callable): the blocking function.
+        args: arguments for fn.
+
+    Returns:
+        result: the result of fn.
+    """
+    return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+
+
+async def alist(executor: Optional[Executor], iterable: Iterable[T]) -> List[T]:
+    """Consume a blocking iterable (e.g. a folder walking generator) in an executor.
+
+    Args:
+        executor (Optional[Executor]): the executor, None for the event loop's default executor.
+        iterable (Iterable): the iterable, not yet started.
+
+    Returns:
+        items (List): the items of the iterable.
+    """
+    return await run_blocking(executor, list, iterable)
+
+
+async def amap(
+    fn: Callable[[T], R],
+    items: Iterable[T],
+    concurrency: int = DEFAULT_CONCURRENCY,
+    executor: Optional[Executor] = None,
+) -> AsyncIterator[R]:
+    """Apply a blocking function to items in an executor, yielding the results in order.
+
+    At most `concurrency` calls are in flight, and results are only computed that far
+    ahead of the consumer, so memory stays bounded when fn parses large files.
+
+    Args:
+        fn (Callable): the blocking function.
+        items (Iterable): the arguments for fn.
+        concurrency (int): maximum number of calls in flight.
+        executor (Optional[Executor]): the executor, None for the event loop's default executor.
+
+    Yields:
+        result: the next result, in the order of items.
+    """
+    loop = asyncio.get_running_loop()
+    items = iter(items)
+    in_flight: Deque[asyncio.Future] = collections.deque()
+
+    def submit() -> None:
+        for item in items:
+            in_flight.append(loop.run_in_executor(executor, fn, item))
+            return
+
+    for _ in range(max(1, concurrency)):
+        submit()
+    try:
+        while in_flight:
+            result = await in_flight.popleft()
+            submit()
+            yield result
+    finally:
+        for future in in_flight:
+            future.cancel()
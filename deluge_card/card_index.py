@@ -0,0 +1,341 @@
+"""Persistent on-disk index of the sample references in a card's XML files.
+
+The index is a small SQLite database stored in the card root. Each XML file is
+keyed by its card-relative path, modification time and size, so only files that
+changed since the last scan need to be parsed again. The digests of presets (see
+`preset_dedup`) and the metadata of samples (see `sample_info`) are kept the same way.
+
+Entries for files modified within `RACY_NS` of being indexed are not trusted, as a
+change within the filesystem's timestamp resolution (2 seconds on FAT) keeps the same
+modification time. The index is only a cache: a damaged database file is deleted and
+built again.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+from attrs import astuple, define, field
+
+from .deluge_xml import read_sample_refs, read_sample_refs_tree
+from .sample_info import SampleInfo
+
+INDEX_FILENAME = '.deluge_card_index.sqlite'
+SCHEMA_VERSION = 6
+
+# entries indexed less than this after their file's modification time are re-read
+RACY_NS = 2_000_000_000
+
+# number of sample files from which lookup_sample_infos() scans the whole table
+LOOKUP_SCAN_MIN = 64
+
+# sample_info columns of a file that is not a WAV or AIFF file
+NO_INFO = (None, None, None, None, None)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS xml_file (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    indexed_ns INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sample_ref (
+    xml_path TEXT NOT NULL REFERENCES xml_file(path) ON DELETE CASCADE,
+    seq INTEGER NOT NULL,
+    sample_file TEXT NOT NULL,
+    xpath TEXT NOT NULL,
+    PRIMARY KEY (xml_path, seq)
+);
+CREATE TABLE IF NOT EXISTS preset_digest (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    indexed_ns INTEGER NOT NULL,
+    digest TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS sample_info (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    indexed_ns INTEGER NOT NULL,
+    format TEXT,
+    sample_rate INTEGER,
+    channels INTEGER,
+    bits_per_sample INTEGER,
+    frame_count INTEGER
+);
+"""
+
+
+def _is_current(row: Sequence, st: os.stat_result) -> bool:
+    """Is an index row, starting (mtime_ns, size, indexed_ns), current and trusted for a file with stat st."""
+    mtime_ns, size, indexed_ns = row[:3]
+    return mtime_ns == st.st_mtime_ns and size == st.st_size and indexed_ns - mtime_ns >= RACY_NS
+
+
+@define
+class CardIndex:
+    """Persistent index of XML sample references.
+
+    Attributes:
+        card_root (Path): root folder of the card.
+        db_path (Path): path of the SQLite database file.
+    """
+
+    card_root: Path
+    db_path: Path = field()
+    _conn: sqlite3.Connection = field(init=False, repr=False)
+    _lock: threading.RLock = field(init=False, factory=threading.RLock, repr=False)
+    _prefix: str = field(init=False, repr=False)
+
+    @db_path.default
+    def _default_db_path(self):
+        return Path(self.card_root, INDEX_FILENAME)
+
+    def __attrs_post_init__(self):
+        self._prefix = os.path.join(str(self.card_root), '')
+        try:
+            self._conn = self._connect()
+        except sqlite3.DatabaseError:
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        """Delete a damaged database file and create it again, it is only a cache."""
+        conn = getattr(self, '_conn', None)
+        if conn is not None:
+            conn.close()
+        for suffix in ('', '-journal', '-wal'):
+            Path(f'{self.db_path}{suffix}').unlink(missing_ok=True)
+        self._conn = self._connect()
+
+    def _connect(self) -> sqlite3.Connection:
+        # shared by worker threads (e.g. the async API), access is serialised by _lock
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        # this is a cache, so durability is traded for speed on slow SD cards.
+        conn.execute('PRAGMA synchronous = OFF')
+        conn.execute('PRAGMA journal_mode = MEMORY')
+        conn.execute('PRAGMA foreign_keys = ON')
+        if conn.execute('PRAGMA user_version').fetchone()[0] != SCHEMA_VERSION:
+            conn.executescript(
+                'DROP TABLE IF EXISTS sample_ref; DROP TABLE IF EXISTS xml_file; DROP TABLE IF EXISTS preset_digest; '
+                'DROP TABLE IF EXISTS sample_info;'
+            )
+            conn.executescript(SCHEMA)
+            conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+            conn.commit()
+        try:
+            # a damaged file may only fail once its schema or tables are read
+            for table in ('xml_file', 'sample_ref', 'preset_digest', 'sample_info'):
+                conn.execute(f'SELECT * FROM {table} LIMIT 1').fetchall()
+        except sqlite3.DatabaseError:
+            conn.close()
+            raise
+        return conn
+
+    def _key(self, xml_path: Path) -> str:
+        if isinstance(xml_path, Path):
+            # str() of a Path is normalised, so a prefix match is enough (and much faster than relative_to)
+            text = str(xml_path)
+            if text.startswith(self._prefix):
+                return text[len(self._prefix) :].replace(os.sep, '/')
+        try:
+            return Path(xml_path).relative_to(self.card_root).as_posix()
+        except ValueError:
+            return Path(xml_path).as_posix()
+
+    def lookup(self, xml_path: Path) -> Optional[List[Tuple[str, str]]]:
+        """Get the indexed sample references, if the index is current for this file.
+
+        Args:
+            xml_path (Path): path of the XML file.
+
+        Returns:
+            refs (Optional[List[Tuple[str, str]]]): (fileName, xpath) pairs, or None if stale.
+        """
+        st = Path(xml_path).stat()
+        key = self._key(xml_path)
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    'SELECT mtime_ns, size, indexed_ns FROM xml_file WHERE path = ?', (key,)
+                ).fetchone()
+                if row is None or not _is_current(row, st):
+                    return None
+                cursor = self._conn.execute(
+                    'SELECT sample_file, xpath FROM sample_ref WHERE xml_path = ? ORDER BY seq', (key,)
+                )
+                return [(sample_file, xpath) for sample_file, xpath in cursor]
+            except sqlite3.DatabaseError:
+                self._rebuild()
+                return None
+
+    def store(self, xml_path: Path, refs: List[Tuple[str, str]], stat: Optional[os.stat_result] = None) -> None:
+        """Record the sample references for a file.
+
+        Args:
+            xml_path (Path): path of the XML file.
+            refs (List[Tuple[str, str]]): (fileName, xpath) pairs.
+            stat (os.stat_result): stat of the file when the refs were read, defaults to a fresh stat.
+        """
+        st = stat or Path(xml_path).stat()
+        key = self._key(xml_path)
+        with self._lock, self._conn:
+            self._conn.execute('DELETE FROM xml_file WHERE path = ?', (key,))
+            self._conn.execute(
+                'INSERT INTO xml_file (path, mtime_ns, size, indexed_ns) VALUES (?, ?, ?, ?)',
+                (key, st.st_mtime_ns, st.st_size, time.time_ns()),
+            )
+            self._conn.executemany(
+                'INSERT INTO sample_ref (xml_path, seq, sample_file, xpath) VALUES (?, ?, ?, ?)',
+                ((key, seq, sample_file, xpath) for seq, (sample_file, xpath) in enumerate(refs)),
+            )
+
+    def sample_refs(self, xml_path: Path, stream: bool = False) -> List[Tuple[str, str]]:
+        """Get the sample references for a file, parsing it only if it changed.
+
+        Args:
+            xml_path (Path): path of the XML file.
+            stream (bool): parse a changed file in one streaming pass rather than into a tree.
+
+        Returns:
+            refs (List[Tuple[str, str]]): (fileName, xpath) pairs.
+        """
+        refs = self.lookup(xml_path)
+        if refs is None:
+            st = Path(xml_path).stat()
+            refs = read_sample_refs(xml_path) if stream else read_sample_refs_tree(xml_path)
+            self.store(xml_path, refs, st)
+        return refs
+
+    def lookup_digest(self, xml_path: Path, stat: Optional[os.stat_result] = None) -> Optional[str]:
+        """Get the indexed preset digest, if the index is current for this file.
+
+        Args:
+            xml_path (Path): path of the preset XML file.
+            stat (os.stat_result): stat of the file, defaults to a fresh stat.
+
+        Returns:
+            digest (Optional[str]): the digest, or None if stale.
+        """
+        st = stat or Path(xml_path).stat()
+        with self._lock:
+            try:
+                row = self._conn.execute(
+                    'SELECT mtime_ns, size, indexed_ns, digest FROM preset_digest WHERE path = ?',
+                    (self._key(xml_path),),
+                ).fetchone()
+            except sqlite3.DatabaseError:
+                self._rebuild()
+                return None
+        if row is None or not _is_current(row, st):
+            return None
+        return row[3]
+
+    def store_digest(self, xml_path: Path, digest: str, stat: Optional[os.stat_result] = None) -> None:
+        """Record the preset digest for a file.
+
+        Args:
+            xml_path (Path): path of the preset XML file.
+            digest (str): the digest.
+            stat (os.stat_result): stat of the file when the digest was made, defaults to a fresh stat.
+        """
+        st = stat or Path(xml_path).stat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO preset_digest (path, mtime_ns, size, indexed_ns, digest) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (self._key(xml_path), st.st_mtime_ns, st.st_size, time.time_ns(), digest),
+            )
+
+    def lookup_sample_infos(
+        self, entries: Sequence[Tuple[Path, os.stat_result]]
+    ) -> List[Tuple[bool, Optional[SampleInfo]]]:
+        """Get the indexed metadata of sample files, where the index is current for the file.
+
+        Args:
+            entries (Sequence[Tuple[Path, os.stat_result]]): (path, stat) of each sample file.
+
+        Returns:
+            infos (List[Tuple[bool, Optional[SampleInfo]]]): (current, metadata) of each file; current is False
+                if the file is not indexed or has changed, the metadata is None for a file that is not a
+                WAV or AIFF file.
+        """
+        columns = 'path, mtime_ns, size, indexed_ns, format, sample_rate, channels, bits_per_sample, frame_count'
+        keys = [self._key(path) for path, _ in entries]
+        with self._lock:
+            try:
+                if len(keys) < LOOKUP_SCAN_MIN:
+                    query = f'SELECT {columns} FROM sample_info WHERE path = ?'
+                    rows = {key: self._conn.execute(query, (key,)).fetchone() for key in keys}
+                else:
+                    # one scan of the table is much faster than a query per file
+                    rows = {row[0]: row for row in self._conn.execute(f'SELECT {columns} FROM sample_info')}
+            except sqlite3.DatabaseError:
+                self._rebuild()
+                rows = {}
+        infos: List[Tuple[bool, Optional[SampleInfo]]] = []
+        for key, (_, st) in zip(keys, entries):
+            row = rows.get(key)
+            if row is None or not _is_current(row[1:], st):
+                infos.append((False, None))
+            else:
+                infos.append((True, SampleInfo(*row[4:]) if row[4] is not None else None))
+        return infos
+
+    def store_sample_infos(self, entries: Iterable[Tuple[Path, Optional[SampleInfo], os.stat_result]]) -> None:
+        """Record the metadata of sample files, in one transaction.
+
+        Args:
+            entries (Iterable[Tuple[Path, Optional[SampleInfo], os.stat_result]]): (path, metadata, stat of the
+                file when the metadata was read) for each file, None metadata for a file that is not a WAV or
+                AIFF file, so it is not read again while unchanged.
+        """
+        now = time.time_ns()
+        rows = [
+            (self._key(path), st.st_mtime_ns, st.st_size, now) + (astuple(info) if info else NO_INFO)
+            for path, info, st in entries
+        ]
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO sample_info VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+
+    def prune(self, xml_paths: Iterable[Path]) -> int:
+        """Remove entries for XML files that are not in xml_paths.
+
+        Args:
+            xml_paths (Iterable[Path]): paths of the XML files to keep.
+
+        Returns:
+            count (int): number of entries removed.
+        """
+        keep = set(self._key(p) for p in xml_paths)
+        with self._lock, self._conn:
+            stale = [(key,) for (key,) in self._conn.execute('SELECT path FROM xml_file') if key not in keep]
+            self._conn.executemany('DELETE FROM xml_file WHERE path = ?', stale)
+            self._conn.executemany(
+                'DELETE FROM preset_digest WHERE path = ?',
+                [(key,) for (key,) in self._conn.execute('SELECT path FROM preset_digest') if key not in keep],
+            )
+        return len(stale)
+
+    def prune_sample_infos(self, sample_paths: Iterable[Path]) -> int:
+        """Remove the metadata of sample files that are not in sample_paths.
+
+        Args:
+            sample_paths (Iterable[Path]): paths of the sample files to keep.
+
+        Returns:
+            count (int): number of entries removed.
+        """
+        keep = set(self._key(p) for p in sample_paths)
+        with self._lock, self._conn:
+            stale = [(key,) for (key,) in self._conn.execute('SELECT path FROM sample_info') if key not in keep]
+            self._conn.executemany('DELETE FROM sample_info WHERE path = ?', stale)
+        return len(stale)
+
+    def close(self) -> None:
+        """Close the database connection."""
+        with self._lock:
+            self._conn.close()
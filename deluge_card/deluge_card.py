@@ -1,15 +1,31 @@
 """Main class representing a Deluge Filesystem in a folder or a mounted SD card."""
 
+import functools
 import itertools
-from pathlib import Path, PurePath
-from typing import Dict, Iterator
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
 from attrs import define, field
 
+from . import aio
+from .card_index import CardIndex
 from .deluge_kit import DelugeKit
-from .deluge_sample import ModOp, Sample, mv_samples
+from .deluge_sample import ModOp, MovePlan, Sample, SampleSetting, apply_mv_plan, plan_mv_samples
 from .deluge_song import DelugeSong
 from .deluge_synth import DelugeSynth
+from .deluge_xml import DelugeXml, read_sample_refs, read_sample_refs_tree
+from .folder_cache import FolderCache
+from .helpers import sample_path
+from .mv_transaction import MoveTransaction
+from .path_pattern import PatternArg, compile_pattern
+from .preset_catalogue import PresetCatalogue
+from .preset_dedup import DedupReport, card_duplicate_presets
+from .sample_dedup import DEFAULT_WORKERS, DedupPlan, apply_dedup_plan, plan_dedup_samples
+from .sample_index import SampleIndex, normalise_sample_path
+from .sample_info import SampleInfo, sample_durations, sample_infos
+from .song_table import SongTable
 
 SONGS = 'SONGS'
 SAMPLES = 'SAMPLES'
@@ -19,30 +35,98 @@ TOP_FOLDERS = [SONGS, SYNTHS, KITS, SAMPLES]
 SAMPLE_TYPES = [".wav", ".mp3", ".aiff", ".ogg"]
 
 
-def list_deluge_fs(folder) -> Iterator['DelugeCardFS']:
+def _scan_candidate(folder: str) -> Tuple[bool, List[str]]:
+    """Scan a folder once with os.scandir.
+
+    Args:
+        folder (str): path of the folder.
+
+    Returns:
+        result (Tuple[bool, List[str]]): True if the folder looks like a card, and the paths of its sub-folders.
+    """
+    with os.scandir(folder) as entries:
+        subfolders = [entry.path for entry in entries if entry.is_dir()]
+    names = set(os.path.basename(path) for path in subfolders)
+    return all(name in names for name in TOP_FOLDERS), subfolders
+
+
+def _try_scan_candidate(folder: str) -> Tuple[bool, List[str]]:
+    try:
+        return _scan_candidate(folder)
+    except OSError:  # e.g. permissions, or removed while scanning
+        return False, []
+
+
+def list_deluge_fs(folder, depth: int = 1, workers: int = 0) -> Iterator['DelugeCardFS']:
     """List deluge_card look-alike filesystems.
 
+    Each folder is read with a single os.scandir, and only folders holding all the
+    top folders are opened as cards. The folders of each level are scanned in a
+    thread pool when workers > 1, and cards are yielded as each level is scanned.
+
     Args:
         folder (str): path of target folder.
+        depth (int): how many levels of sub-folders to search, the default 1 searches folder and its children.
+        workers (int): number of threads scanning folders concurrently, 0 or 1 to scan serially.
 
     Yields:
         cards (Iterator[DelugeCardFS]): generator of DelugeCardFS instances.
     """
+    pool = ThreadPoolExecutor(max_workers=workers) if workers > 1 else None
+    # the target folder itself must be readable
+    frontier = [str(folder)]
+    scanned: Iterable[Tuple[bool, List[str]]] = [_scan_candidate(str(folder))]
+    try:
+        for level in range(depth + 1):
+            next_frontier = []
+            for path, (is_card, subfolders) in zip(frontier, scanned):
+                if is_card:
+                    try:
+                        # absolute, as moves on cards with relative roots resolve paths twice
+                        yield DelugeCardFS.from_folder(os.path.abspath(path))
+                    except InvalidDelugeCard:
+                        pass
+                    # the card's own top folders are not searched for cards
+                    subfolders = [sub for sub in subfolders if os.path.basename(sub) not in TOP_FOLDERS]
+                next_frontier.extend(subfolders)
+            if level == depth or not next_frontier:
+                break
+            frontier = next_frontier
+            scanned = pool.map(_try_scan_candidate, frontier) if pool else map(_try_scan_candidate, frontier)
+    finally:
+        if pool:
+            pool.shutdown(wait=False)
+
+
+def _xml_samples(pattern: PatternArg, xml: DelugeXml) -> List[Sample]:
+    """Samples of an XML file, releasing a tree parsed only for this, so memory stays flat on big cards."""
+    loaded = xml.loaded
+    samples = list(xml.samples_from_refs(xml.sample_refs(), pattern))
+    if not loaded:
+        xml.release()
+    return samples
+
+
+def _merge_samples(sample_map: Dict[Path, Sample], samples: Iterable[Sample]) -> None:
+    """Merge samples used in different settings (song, kit, synth) into sample_map."""
+    for sample in samples:
+        if sample.path in sample_map:
+            sample_map[sample.path].settings += sample.settings
+        else:
+            sample_map[sample.path] = sample
 
-    def _test_card_fs(folder):
-        try:
-            return DelugeCardFS.from_folder(folder)
-        except InvalidDelugeCard:
-            return
 
-    card = _test_card_fs(folder)
-    if card:
-        yield card
-    for fldr in Path(folder).iterdir():
-        card = _test_card_fs(fldr)
-        if not card:
-            continue
-        yield card
+@define(frozen=True)
+class OrphanSample:
+    """A sample file that is not used in any song, kit or synth.
+
+    Attributes:
+        path (Path): Path object for the sample file.
+        size (int): file size in bytes.
+    """
+
+    path: Path
+    size: int
 
 
 class InvalidDelugeCard(Exception):
@@ -63,9 +147,15 @@ class DelugeCardFS:
 
     Attributes:
         card_root (Path): Path object for the root folder.
+        use_index (bool): keep a persistent index of XML sample references in the card root.
+        stream_xml (bool): read the sample references of XML files that are not loaded in one streaming
+            pass, without building a tree. This bounds memory on very large files, but is slower.
     """
 
     card_root: Path = field()
+    use_index: bool = field(default=False, kw_only=True)
+    stream_xml: bool = field(default=False, kw_only=True)
+    _cache: Dict[str, object] = field(factory=dict, init=False, eq=False, repr=False)
 
     @card_root.validator
     def _check_card_root(self, attribute, value):
@@ -96,16 +186,39 @@ class DelugeCardFS:
         return DelugeCardFS(card_root)  # type: ignore
 
     @staticmethod
-    def from_folder(folder: str) -> 'DelugeCardFS':
+    def from_folder(folder: str, use_index: bool = False) -> 'DelugeCardFS':
         """New instance from a Deluge Folder structure.
 
         Args:
             folder (str): valid folder name.
+            use_index (bool): keep a persistent index of XML sample references.
 
         Returns:
             instance (DelugeCardFS): new instance.
         """
-        return DelugeCardFS(Path(folder))
+        return DelugeCardFS(Path(folder), use_index=use_index)
+
+    def index(self) -> Optional[CardIndex]:
+        """The persistent card index, if enabled.
+
+        Returns:
+            index (Optional[CardIndex]): the index, or None when `use_index` is False.
+        """
+        if not self.use_index:
+            return None
+        if 'index' not in self._cache:
+            self._cache['index'] = CardIndex(self.card_root)
+        return self._cache['index']  # type: ignore
+
+    def folder_cache(self) -> FolderCache:
+        """Cached folder listings for this card, used to check that samples exist.
+
+        Returns:
+            cache (FolderCache): the cache, shared by all songs, kits and synths of the card.
+        """
+        if 'folders' not in self._cache:
+            self._cache['folders'] = FolderCache()
+        return self._cache['folders']  # type: ignore
 
     def is_mounted(self) -> bool:
         """Is this a mounted SD card.
@@ -118,99 +231,395 @@ class DelugeCardFS:
         """
         return Path(self.card_root).is_mount()
 
-    def songs(self, pattern: str = "") -> Iterator['DelugeSong']:
+    def _top_folder_files(self, top_folder: str, skip_hidden: bool = True) -> Iterator[Tuple[str, str]]:
+        """Files in a top folder, from the card's cached folder listings (see `folder_cache()`).
+
+        Args:
+            top_folder (str): name of the top folder.
+            skip_hidden (bool): skip hidden files and folders (names starting with '.', e.g. Apple copy crap).
+
+        Yields:
+            item (Tuple[str, str]): (card-relative posix path, path) of the next file, in scandir order.
+        """
+        top = os.path.join(str(self.card_root), top_folder)
+        for folder, listing in self.folder_cache().walk(top, skip_hidden):
+            rel = Path(folder).relative_to(self.card_root).as_posix()
+            for name in listing.files:
+                if not (skip_hidden and name[0] == '.'):
+                    yield f'{rel}/{name}', os.path.join(folder, name)
+
+    def _xml_files(self, top_folder: str, pattern: PatternArg) -> List[Path]:
+        # hidden files are listed, as Path.rglob('*.XML') did
+        matcher = compile_pattern(pattern)
+        paths = (path for _, path in self._top_folder_files(top_folder, skip_hidden=False) if path.endswith('.XML'))
+        return sorted(Path(path) for path in paths if matcher.match_all or matcher.match(path))
+
+    def songs(self, pattern: PatternArg = '') -> Iterator['DelugeSong']:
         """Generator for songs in the Card.
 
         Args:
-            pattern (str): glob-style filename pattern.
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
 
         Yields:
             object (DelugeSong): the next song on the card.
         """
-        for songfile in sorted(Path(self.card_root, SONGS).rglob('*.XML')):
-            if not pattern:
-                yield DelugeSong(self, songfile)  # type: ignore
-                continue
-            if PurePath(songfile).match(pattern):
-                yield DelugeSong(self, songfile)
+        self.folder_cache().revalidate()
+        for songfile in self._xml_files(SONGS, pattern):
+            yield DelugeSong(self, songfile)  # type: ignore
 
-    def kits(self, pattern: str = "") -> Iterator['DelugeKit']:
+    def kits(self, pattern: PatternArg = '') -> Iterator['DelugeKit']:
         """Generator for kits in the Card.
 
         Args:
-            pattern (str): glob-style filename pattern.
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
 
         Yields:
             object (DelugeKit): the next kit on the card.
         """
-        for filepath in sorted(Path(self.card_root, KITS).rglob('*.XML')):
-            if not pattern:
-                yield DelugeKit(self, filepath)  # type: ignore
-                continue
-            if PurePath(filepath).match(pattern):
-                yield DelugeKit(self, filepath)
+        self.folder_cache().revalidate()
+        for filepath in self._xml_files(KITS, pattern):
+            yield DelugeKit(self, filepath)  # type: ignore
 
-    def synths(self, pattern: str = "") -> Iterator['DelugeSynth']:
+    def synths(self, pattern: PatternArg = '') -> Iterator['DelugeSynth']:
         """Generator for synths in the Card.
 
         Args:
-            pattern (str): glob-style filename pattern.
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
 
         Yields:
             object (DelugeSynth): the next synth on the card.
         """
-        for filepath in sorted(Path(self.card_root, SYNTHS).rglob('*.XML')):
-            if not pattern:
-                yield DelugeSynth(self, filepath)  # type: ignore
-                continue
-            if PurePath(filepath).match(pattern):
-                yield DelugeSynth(self, filepath)
+        self.folder_cache().revalidate()
+        for filepath in self._xml_files(SYNTHS, pattern):
+            yield DelugeSynth(self, filepath)  # type: ignore
+
+    def duplicate_presets(
+        self, pattern: PatternArg = '', tolerance: Optional[float] = None, workers: int = 0, use_processes: bool = False
+    ) -> DedupReport:
+        """Find the synth and kit presets that duplicate one another, ignoring their names and firmware versions.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            tolerance (Optional[float]): also group near duplicates, whose parameter values are in the same
+                step of this fraction of their range, on a grid of steps or on one offset by half a step; None for
+                exact duplicates only. A single value less than half a step off always shares a step on one grid,
+                but presets with several such values are missed when they need different grids. Presets matching
+                a common one are grouped together, so a group may span more than one step. Requires numpy.
+            workers (int): number of workers reading presets concurrently, 0 or 1 to read serially.
+            use_processes (bool): read in a process pool rather than a thread pool.
+
+        Returns:
+            report (DedupReport): the duplicate groups, with the space they take.
+        """
+        return card_duplicate_presets(self, pattern, tolerance, workers, use_processes)
+
+    def preset_catalogue(self, pattern: PatternArg = '', songs: bool = True, workers: int = 0) -> PresetCatalogue:
+        """Catalogue the numeric parameters of the synth and kit presets, and optionally the song instruments.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            songs (bool): include the sounds of song instruments.
+            workers (int): number of processes reading files concurrently, 0 or 1 to read serially.
+
+        Returns:
+            catalogue (PresetCatalogue): one row per sound.
+        """
+        return PresetCatalogue.from_card(self, pattern, songs, workers)
+
+    def song_table(self, pattern: PatternArg = '', workers: int = 0) -> SongTable:
+        """Read the metadata (tempo, key, scale, firmware, instruments, samples) of every song.
+
+        Each song is read in one streaming pass, without building a tree.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            workers (int): number of processes reading songs concurrently, 0 or 1 to read serially.
+
+        Returns:
+            table (SongTable): columnar table, one row per song.
+        """
+        return SongTable.from_card(self, pattern, workers)
+
+    def sample_info(self, path: Union[str, Path]) -> Optional[SampleInfo]:
+        """Get the format and length of a sample, read from its file headers (or the card index when enabled).
+
+        Args:
+            path (str|Path): absolute or card-relative sample path.
+
+        Returns:
+            info (Optional[SampleInfo]): the metadata, or None if the file is missing or not a WAV or AIFF file.
+        """
+        path = Path(self.card_root, path)
+        return sample_infos([path], self.index())[path]
+
+    def sample_infos(self, pattern: PatternArg = '', workers: int = 0) -> Dict[Path, Optional[SampleInfo]]:
+        """Get the format and length of the sample files in SAMPLES.
+
+        Only the file headers are read, and only for new or changed files when the card index is enabled.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            workers (int): number of threads reading headers concurrently, 0 or 1 to read serially.
+
+        Returns:
+            infos (Dict[Path, Optional[SampleInfo]]): metadata by sample path, None for files that are not WAV
+                or AIFF files.
+        """
+        self.folder_cache().revalidate()
+        pattern = compile_pattern(pattern)
+        paths = [sample.path for sample in self._sample_files(pattern)]
+        index = self.index()
+        if index and pattern.match_all:
+            index.prune_sample_infos(paths)  # forget deleted and renamed samples
+        return sample_infos(paths, index, workers)
+
+    def kit_durations(self, pattern: PatternArg = '', workers: int = 0) -> Dict[Path, float]:
+        """Total length of the samples used by each kit.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            workers (int): number of threads reading headers concurrently, 0 or 1 to read serially.
+
+        Returns:
+            durations (Dict[Path, float]): seconds by kit path, each sample counted once per kit.
+        """
+        return sample_durations(self, self.kits(pattern), workers)
+
+    def song_durations(self, pattern: PatternArg = '', workers: int = 0) -> Dict[Path, float]:
+        """Total length of the samples used by each song.
 
-    def _sample_files(self, pattern: str = '') -> Iterator['Sample']:
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            workers (int): number of threads reading headers concurrently, 0 or 1 to read serially.
+
+        Returns:
+            durations (Dict[Path, float]): seconds by song path, each sample counted once per song.
+        """
+        return sample_durations(self, self.songs(pattern), workers)
+
+    def _sample_files(self, pattern: PatternArg = '') -> Iterator['Sample']:
         """Get all samples.
 
         Args:
-            pattern (str): glob-style filename pattern.
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
 
         Yields:
             object (Sample): matching samples.
         """
-        smp = Path(self.card_root, 'SAMPLES')
-        paths = (p.resolve() for p in Path(smp).rglob("**/*") if p.suffix.lower() in SAMPLE_TYPES)
-        for fname in paths:
-            # print(fname)
-            if Path(fname).name[0] == '.':  # Apple copy crap
+        matcher = compile_pattern(pattern)
+        for _, fname in self._top_folder_files(SAMPLES):
+            if os.path.splitext(fname)[1].lower() not in SAMPLE_TYPES:
                 continue
-            if not pattern:
+            if matcher.match_all or matcher.match(fname):
                 yield Sample(Path(fname))
+
+    def unused_samples(self, pattern: PatternArg = '') -> Iterator[OrphanSample]:
+        """Generator for sample files not used in any song, kit or synth.
+
+        SAMPLES is walked from the cached folder listings, and files are checked against
+        the sample references read afresh on each call (from the card index when enabled,
+        so only changed XML files are read), so only unused files are stat'ed.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+
+        Yields:
+            object (OrphanSample): the next unused sample, with its size.
+        """
+        self.folder_cache().revalidate()
+        matcher = compile_pattern(pattern)
+        used: Set[str] = set()
+        for xml in itertools.chain(self.synths(), self.songs(), self.kits()):
+            refs = xml.sample_refs()
+            used.update(normalise_sample_path(self.card_root, sample_path(self.card_root, ref)) for ref, _ in refs)
+        for rel, fname in self._top_folder_files(SAMPLES):
+            if os.path.splitext(fname)[1].lower() not in SAMPLE_TYPES or rel.casefold() in used:
                 continue
-            if PurePath(fname).match(pattern):
-                yield Sample(Path(fname))
+            if not matcher.match(fname):
+                continue
+            try:
+                size = os.stat(fname).st_size
+            except FileNotFoundError:  # removed since listed, within the folder's mtime resolution
+                continue
+            yield OrphanSample(Path(fname), size)
 
-    def mv_samples(self, pattern: str, dest: Path) -> Iterator[ModOp]:
+    def mv_samples(self, pattern: PatternArg, dest: Path, transactional: bool = False) -> Iterator[ModOp]:
         """Move samples, updating any affected XML files.
 
         Args:
-            pattern (str): glob-style filename pattern.
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
             dest: (Path): new path for the moved objec(s)
+            transactional (bool): journal the move so it can be rolled back or resumed.
 
         Yields:
             object (ModOp): Details of the move operation.
         """
-        yield from mv_samples(self.card_root, self.samples(pattern), pattern, dest)
+        yield from self.apply_mv_plan(self.plan_mv_samples(pattern, dest), transactional)
+
+    def plan_mv_samples(self, pattern: PatternArg, dest: Path) -> MovePlan:
+        """Plan a sample move, to preview it before `apply_mv_plan()`.
+
+        No XML tree is modified, and only the sample references of each XML file are
+        read (from the card index when enabled).
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            dest: (Path): new path for the moved objec(s)
+
+        Returns:
+            plan (MovePlan): affected samples and XML files, element count and bytes to move.
 
-    def samples(self, pattern: str = "") -> Iterator[Sample]:
+        Raises:
+            ValueError: if dest is not valid, or two sample files would be moved to the same path.
+        """
+        pattern = compile_pattern(pattern)
+        return plan_mv_samples(self.card_root, self.samples(pattern), pattern, dest)
+
+    def apply_mv_plan(self, plan: MovePlan, transactional: bool = False) -> Iterator[ModOp]:
+        """Apply a move planned with `plan_mv_samples()`.
+
+        Args:
+            plan (MovePlan): the plan.
+            transactional (bool): journal the move so it can be rolled back or resumed.
+
+        Yields:
+            object (ModOp): Details of the move operation.
+        """
+        yield from self._apply_modops(apply_mv_plan(plan, transactional))
+
+    def dedup_samples(
+        self, pattern: PatternArg = '', workers: int = DEFAULT_WORKERS, transactional: bool = False
+    ) -> Iterator[ModOp]:
+        """Merge identical sample files, pointing their references at one copy and deleting the others.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            workers (int): number of threads hashing files, 0 or 1 to hash serially.
+            transactional (bool): journal the XML updates and deletions so they can be rolled back or resumed.
+
+        Yields:
+            object (ModOp): Details of the operation.
+        """
+        yield from self.apply_dedup_plan(self.plan_dedup_samples(pattern, workers), transactional)
+
+    def plan_dedup_samples(self, pattern: PatternArg = '', workers: int = DEFAULT_WORKERS) -> DedupPlan:
+        """Plan merging identical sample files, to preview it before `apply_dedup_plan()`.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            workers (int): number of threads hashing files, 0 or 1 to hash serially.
+
+        Returns:
+            plan (DedupPlan): groups of identical samples, affected XML files and bytes reclaimed.
+        """
+        # references are gathered from an up to date sample index, as the pattern may not match every spelling
+        return plan_dedup_samples(self.card_root, self.samples(pattern), workers, self.sample_index(refresh=True))
+
+    def apply_dedup_plan(self, plan: DedupPlan, transactional: bool = False) -> Iterator[ModOp]:
+        """Apply a merge planned with `plan_dedup_samples()`.
+
+        Args:
+            plan (DedupPlan): the plan.
+            transactional (bool): journal the XML updates and deletions so they can be rolled back or resumed.
+
+        Yields:
+            object (ModOp): Details of the operation.
+        """
+        yield from self._apply_modops(apply_dedup_plan(plan, transactional))
+
+    def _apply_modops(self, modops: Iterator[ModOp]) -> Iterator[ModOp]:
+        """Yield the operations, then update the cached sample index and folder listings they changed.
+
+        The index is only updated once every operation is done, never between an XML write
+        and the sample file changes; if the operations stop early the index and the folder
+        listings are dropped.
+        """
+        updated = []
+        folders: Set[Path] = set()
+        try:
+            for modop in modops:
+                if modop.operation.endswith('_xml'):
+                    updated.append(modop.instance)
+                elif modop.operation == 'move_file':
+                    folders.update((modop.instance.old_path.parent, modop.instance.new_path.parent))  # type: ignore
+                elif modop.operation == 'delete_file':
+                    folders.add(modop.instance.old_path.parent)  # type: ignore
+                yield modop
+        except BaseException:
+            self._cache.pop('sample_index', None)  # rebuilt on next use
+            self._cache.pop('folders', None)
+            raise
+        self.folder_cache().invalidate(str(folder) for folder in folders)
+        if 'sample_index' in self._cache:
+            for xml in updated:
+                self._cache['sample_index'].update_xml(xml)  # type: ignore
+
+    def pending_move(self) -> Optional[MoveTransaction]:
+        """An incomplete transactional move, to be resumed (`commit()`) or rolled back (`rollback()`).
+
+        Returns:
+            transaction (Optional[MoveTransaction]): the incomplete move, or None.
+        """
+        return MoveTransaction.pending(self.card_root)
+
+    def sample_index(self, refresh: bool = False) -> SampleIndex:
+        """The reverse index of sample references on this card, built on first use.
+
+        The index is kept up to date by `mv_samples`, other changes to the card
+        need a refresh.
+
+        Args:
+            refresh (bool): bring the index up to date, reading only the XML files changed since
+                they were indexed (see `SampleIndex.refresh()`).
+
+        Returns:
+            index (SampleIndex): sample path => settings index.
+        """
+        if 'sample_index' not in self._cache:
+            self._cache['sample_index'] = SampleIndex.from_card(self)
+        elif refresh:
+            self._cache['sample_index'].refresh(self)  # type: ignore
+        return self._cache['sample_index']  # type: ignore
+
+    def sample_settings(self, path: Union[str, Path]) -> List[SampleSetting]:
+        """Get the settings (in songs, kits and synths) that use a sample.
+
+        Args:
+            path (str|Path): absolute or card-relative sample path.
+
+        Returns:
+            settings (List[SampleSetting]): the settings, empty if the sample is unused.
+        """
+        return self.sample_index().settings(path)
+
+    def sample_users(self, path: Union[str, Path]) -> List[DelugeXml]:
+        """Get the songs, kits and synths that use a sample.
+
+        Args:
+            path (str|Path): absolute or card-relative sample path.
+
+        Returns:
+            xml_files (List[DelugeXml]): the songs, kits and synths.
+        """
+        return self.sample_index().xml_files(path)
+
+    def samples(self, pattern: PatternArg = '', workers: int = 0, use_processes: bool = False) -> Iterator[Sample]:
         """Generator for all samples in the card.
 
         Args:
-            pattern (str): glob-style filename pattern.
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            workers (int): number of workers parsing XML concurrently, 0 or 1 to parse serially.
+            use_processes (bool): parse in a process pool rather than a thread pool. Threads parse each file
+                into a tree in C, releasing the GIL, so they scale with little overhead but hold a tree per
+                thread; processes stream each file without a tree, but cost more to start.
 
         Yields:
             object (Sample): the next sample on the card.
         """
         sample_map: Dict[Path, Sample] = dict()
+        pattern = compile_pattern(pattern)
 
-        used_samples = self.used_samples(pattern)
+        used_samples = self.used_samples(pattern, workers, use_processes)
         all_samples = self._sample_files(pattern)
         for sample in used_samples:
             sample_map[sample.path] = sample
@@ -220,27 +629,180 @@ class DelugeCardFS:
                 sample_map[sample.path] = sample
                 yield sample
 
-    def used_samples(self, pattern: str = '') -> Iterator['Sample']:
+    def _parallel_sample_refs(
+        self, xml_files: List[DelugeXml], workers: int, use_processes: bool
+    ) -> List[List[Tuple[str, str]]]:
+        """Read sample references for xml_files concurrently, in the order given.
+
+        Threads parse each file into a tree, as lxml does that in C without the GIL, while
+        the streaming reader runs Python callbacks per element and would serialise them.
+        Processes use the streaming reader, which keeps their memory (and results) small.
+        """
+        index = self.index()
+        refs: List[Optional[List[Tuple[str, str]]]] = []
+        pending = []
+        for xml in xml_files:
+            if xml.loaded:
+                refs.append(xml.sample_refs())
+                continue
+            refs.append(index.lookup(xml.path) if index else None)
+            if refs[-1] is None:
+                pending.append((len(refs) - 1, xml.path, xml.path.stat()))
+
+        if not pending:
+            return refs  # type: ignore
+
+        pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+        with pool_class(max_workers=workers) as pool:
+            chunksize = max(1, len(pending) // (workers * 4))
+            reader = read_sample_refs if use_processes else read_sample_refs_tree
+            results = pool.map(reader, [path for _, path, _ in pending], chunksize=chunksize)
+            for (i, path, stat), result in zip(pending, results):
+                refs[i] = result
+                if index:
+                    index.store(path, result, stat)
+        return refs  # type: ignore
+
+    def _prune_index(self, xml_files: List[DelugeXml]) -> None:
+        """Drop the index entries of XML files no longer on the card, after a scan of every XML file."""
+        index = self.index()
+        if index:
+            index.prune(xml.path for xml in xml_files)
+
+    def used_samples(
+        self, pattern: PatternArg = '', workers: int = 0, use_processes: bool = False
+    ) -> Iterator['Sample']:
         """Get all samples referenced in XML files.
 
         Args:
-            pattern (str): glob-style filename pattern.
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            workers (int): number of workers parsing XML concurrently, 0 or 1 to parse serially.
+            use_processes (bool): parse in a process pool rather than a thread pool. Threads parse each file
+                into a tree in C, releasing the GIL, so they scale with little overhead but hold a tree per
+                thread; processes stream each file without a tree, but cost more to start.
 
         Yields:
             object (Sample): the next sample on the card.
         """
         sample_map: Dict[Path, Sample] = dict()
-        used_sample_gens = itertools.chain(
-            map(lambda synth: synth.samples(pattern), self.synths()),
-            map(lambda sng: sng.samples(pattern), self.songs()),
-            map(lambda kit: kit.samples(pattern), self.kits()),
-        )
-
-        # merge samples in different settings (song, kit, synth)
-        for sample in itertools.chain.from_iterable(used_sample_gens):
-            if sample.path in sample_map:
-                sample_map[sample.path].settings += sample.settings
-            else:
-                sample_map[sample.path] = sample
+        pattern = compile_pattern(pattern)
+        self.folder_cache().revalidate()
+
+        xml_files = list(itertools.chain(self.synths(), self.songs(), self.kits()))
+        used_sample_gens: Iterable[Iterable[Sample]]
+        if workers > 1:
+            all_refs = self._parallel_sample_refs(xml_files, workers, use_processes)
+            used_sample_gens = map(lambda xml, refs: xml.samples_from_refs(refs, pattern), xml_files, all_refs)
+        else:
+            used_sample_gens = map(functools.partial(_xml_samples, pattern), xml_files)
+
+        # merge samples in different settings (song, kit, synth), in a deterministic order
+        _merge_samples(sample_map, itertools.chain.from_iterable(used_sample_gens))
+        self._prune_index(xml_files)
 
         return (s for s in sample_map.values())
+
+    async def _axml(
+        self, xml_files: Iterable[DelugeXml], load: bool, concurrency: int, executor: Optional[Executor]
+    ) -> AsyncIterator:
+        self.index()  # open the card index (if enabled) in the event loop thread
+        found = await aio.alist(executor, xml_files)
+        if not load:
+            for xml in found:
+                yield xml
+            return
+        async for xml in aio.amap(DelugeXml.load, found, concurrency, executor):
+            yield xml
+
+    def asongs(
+        self,
+        pattern: PatternArg = '',
+        load: bool = True,
+        concurrency: int = aio.DEFAULT_CONCURRENCY,
+        executor: Optional[Executor] = None,
+    ) -> AsyncIterator['DelugeSong']:
+        """Async generator for songs in the card, see `songs()`.
+
+        The folder walk, and the XML parsing, run in an executor so the event loop is not blocked.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            load (bool): parse each song before it is yielded.
+            concurrency (int): maximum number of songs parsed at once (and parsed ahead of the consumer).
+            executor (Optional[Executor]): executor for the blocking work, None for the loop's default executor.
+
+        Yields:
+            object (DelugeSong): the next song on the card.
+        """
+        return self._axml(self.songs(pattern), load, concurrency, executor)
+
+    def akits(
+        self,
+        pattern: PatternArg = '',
+        load: bool = True,
+        concurrency: int = aio.DEFAULT_CONCURRENCY,
+        executor: Optional[Executor] = None,
+    ) -> AsyncIterator['DelugeKit']:
+        """Async generator for kits in the card, see `asongs()`.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            load (bool): parse each kit before it is yielded.
+            concurrency (int): maximum number of kits parsed at once.
+            executor (Optional[Executor]): executor for the blocking work, None for the loop's default executor.
+
+        Yields:
+            object (DelugeKit): the next kit on the card.
+        """
+        return self._axml(self.kits(pattern), load, concurrency, executor)
+
+    def asynths(
+        self,
+        pattern: PatternArg = '',
+        load: bool = True,
+        concurrency: int = aio.DEFAULT_CONCURRENCY,
+        executor: Optional[Executor] = None,
+    ) -> AsyncIterator['DelugeSynth']:
+        """Async generator for synths in the card, see `asongs()`.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            load (bool): parse each synth before it is yielded.
+            concurrency (int): maximum number of synths parsed at once.
+            executor (Optional[Executor]): executor for the blocking work, None for the loop's default executor.
+
+        Yields:
+            object (DelugeSynth): the next synth on the card.
+        """
+        return self._axml(self.synths(pattern), load, concurrency, executor)
+
+    async def asamples(
+        self, pattern: PatternArg = '', concurrency: int = aio.DEFAULT_CONCURRENCY, executor: Optional[Executor] = None
+    ) -> AsyncIterator[Sample]:
+        """Async generator for all samples in the card, see `samples()`.
+
+        XML files are read in an executor, at most `concurrency` at once. Samples are
+        yielded once every file is read, as a sample's settings can come from any file.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            concurrency (int): maximum number of XML files read at once.
+            executor (Optional[Executor]): executor for the blocking work, None for the loop's default executor.
+
+        Yields:
+            object (Sample): the next sample on the card.
+        """
+        self.index()  # open the card index (if enabled) in the event loop thread
+        self.folder_cache().revalidate()
+        pattern = compile_pattern(pattern)
+        xml_files = await aio.alist(executor, itertools.chain(self.synths(), self.songs(), self.kits()))
+        sample_map: Dict[Path, Sample] = dict()
+        async for samples in aio.amap(functools.partial(_xml_samples, pattern), xml_files, concurrency, executor):
+            _merge_samples(sample_map, samples)
+        await aio.run_blocking(executor, self._prune_index, xml_files)
+        for sample in sample_map.values():
+            yield sample
+        for sample in await aio.alist(executor, self._sample_files(pattern)):
+            if sample.path not in sample_map:
+                sample_map[sample.path] = sample
+                yield sample
@@ -1,12 +1,17 @@
 """Main classes representing Deluge Sample."""
 
 import itertools
+import os
+import warnings
 from pathlib import Path
-from typing import Iterator, List
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from attrs import define, field
 
-from .helpers import ensure_absolute
+from .helpers import ensure_absolute, sample_path
+from .mv_transaction import MoveTransaction, check_move_targets
+from .path_pattern import PatternArg, compile_pattern
+from .sample_info import SampleInfo, read_sample_info
 
 if False:
     # for forward-reference type-checking:
@@ -16,14 +21,21 @@ if False:
     import deluge_synth
     import deluge_xml
 
+# XML root element => file type
+XML_FILE_TAGS = {'song': 'song', 'kit': 'kit', 'sound': 'synth'}
+
+# an XML file when a plan was made: (XML file, size, mtime_ns, (xml_path, old sample path) pairs)
+XmlStat = Tuple['deluge_xml.DelugeXml', int, int, Tuple[Tuple[str, Path], ...]]
+
 
 def modify_sample_paths(
-    root: Path, samples: Iterator['Sample'], pattern: str, dest: Path
+    root: Path, samples: Iterator['Sample'], pattern: PatternArg, dest: Path
 ) -> Iterator['SampleMoveOperation']:
     """Modify sample paths just as posix mv does."""
+    matcher = compile_pattern(pattern)
 
     def glob_match(sample) -> bool:
-        return Path(sample.path).match(pattern)
+        return matcher.match(sample.path)
 
     def build_move_op(sample) -> SampleMoveOperation:
         # print('DEBUG:', sample.path)
@@ -40,7 +52,7 @@ def modify_sample_paths(
 
 @define
 class SettingElementUpdater(object):
-    """Setting updater class.
+    """Setting updater class, deprecated: use `plan_xml_updates()` and `DelugeXml.update_sample_elements()`.
 
     Attributes:
         root_xml_path (str): type or root node : /song/, /kit/, or /sound/.
@@ -49,34 +61,57 @@ class SettingElementUpdater(object):
     root_xml_path: str
 
     def update_settings(self, move_op: 'SampleMoveOperation'):
-        """Update settings."""
-        # print(f"DEBUG update_song_elements: {sample}")
-        for setting in move_op.sample.settings:
-            if not setting.xml_path[: len(self.root_xml_path)] == self.root_xml_path:
-                continue
-            # print(f"DEBUG update_song_elements setting: {setting}")
-            setting.xml_file.update_sample_element(setting.xml_path, move_op.new_path)
-            yield setting.xml_file
+        """Update settings, yielding the XML file of each updated setting."""
+        for xml, updates in plan_xml_updates([move_op]).items():
+            updates = [update for update in updates if update[0].startswith(self.root_xml_path)]
+            xml.update_sample_elements(updates)
+            yield from itertools.repeat(xml, len(updates))
+
+
+def _deprecated(name: str) -> None:
+    warnings.warn(
+        f'{name}() is deprecated, use plan_xml_updates() and DelugeXml.update_sample_elements()',
+        DeprecationWarning,
+        stacklevel=3,
+    )
 
 
 def modify_sample_songs(move_ops: List['SampleMoveOperation']) -> Iterator['deluge_song.DelugeSong']:
-    """Update song XML elements."""
+    """Update song XML elements (deprecated)."""
+    _deprecated('modify_sample_songs')
     updater = SettingElementUpdater('/song/')
     return itertools.chain.from_iterable(map(updater.update_settings, move_ops))
 
 
 def modify_sample_kits(move_ops: List['SampleMoveOperation']) -> Iterator['deluge_kit.DelugeKit']:
-    """Update kit XML elements."""
+    """Update kit XML elements (deprecated)."""
+    _deprecated('modify_sample_kits')
     updater = SettingElementUpdater('/kit/')
     return itertools.chain.from_iterable(map(updater.update_settings, move_ops))
 
 
 def modify_sample_synths(move_ops: List['SampleMoveOperation']) -> Iterator['deluge_synth.DelugeSynth']:
-    """Update synth XML elements."""
+    """Update synth XML elements (deprecated)."""
+    _deprecated('modify_sample_synths')
     updater = SettingElementUpdater('/sound/')
     return itertools.chain.from_iterable(map(updater.update_settings, move_ops))
 
 
+def plan_xml_updates(
+    move_ops: List['SampleMoveOperation'],
+) -> Dict['deluge_xml.DelugeXml', List[Tuple[str, Path]]]:
+    """Group the pending sample path changes by XML file.
+
+    Returns:
+        updates (Dict[DelugeXml, List[Tuple[str, Path]]]): (xml_path, new sample path) pairs per XML file.
+    """
+    updates: Dict['deluge_xml.DelugeXml', List[Tuple[str, Path]]] = dict()
+    for move_op in move_ops:
+        for setting in move_op.sample.settings:
+            updates.setdefault(setting.xml_file, []).append((setting.xml_path, move_op.new_path))
+    return updates
+
+
 def validate_mv_dest(root: Path, dest: Path):
     """Check: dest path must be a child of root and must exist."""
     absolute_dest = ensure_absolute(root, dest)
@@ -95,30 +130,233 @@ def validate_mv_dest(root: Path, dest: Path):
         raise ValueError("Destination must be a sub-folder of card.")
 
 
-def mv_samples(root: Path, samples: Iterator['Sample'], pattern: str, dest: Path):
-    """Move samples, updating any affected XML files."""
-    dest = ensure_absolute(root, dest)
+def plan_mv_samples(root: Path, samples: Iterator['Sample'], pattern: PatternArg, dest: Path) -> 'MovePlan':
+    """Plan a sample move, without changing any XML tree or file.
+
+    Only the sample references are needed, so files that are not already loaded are
+    not parsed into trees (and with a card index, unchanged files are not read at all).
+
+    Args:
+        root (Path): root folder of the card.
+        samples (Iterator[Sample]): candidate samples, with their settings.
+        pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+        dest (Path): target folder or file.
+
+    Returns:
+        plan (MovePlan): the planned move.
+
+    Raises:
+        ValueError: if dest is not valid, or two sample files would be moved to the same path.
+    """
     validate_mv_dest(root, dest)  # raises exception if args are invalid
+    dest = ensure_absolute(root, dest)
 
     sample_move_ops = list(modify_sample_paths(root, samples, pattern, dest))  # materialise the list
+    xml_updates = plan_xml_updates(sample_move_ops)
+    # songs, then kits, then synths
+    xml_files = [xml for tag in XML_FILE_TAGS.values() for xml in xml_updates if XML_FILE_TAGS[xml.root_elem] == tag]
+
+    def size(move_op: SampleMoveOperation) -> int:
+        if move_op.old_path == move_op.new_path or not move_op.old_path.exists():
+            return 0
+        return move_op.old_path.stat().st_size
+
+    move_ops = tuple(dict.fromkeys(sample_move_ops))
+    check_move_targets(move_ops)
+    return MovePlan(
+        root,
+        dest,
+        move_ops,
+        tuple((xml, tuple(xml_updates[xml])) for xml in xml_files),
+        sum(size(move_op) for move_op in move_ops),
+        xml_stats(sample_move_ops, xml_files),
+    )
+
+
+def xml_stats(move_ops: List['SampleMoveOperation'], xml_files: List['deluge_xml.DelugeXml']) -> Tuple[XmlStat, ...]:
+    """Record the state of the XML files a plan updates, to check with `check_xml_unchanged()` when applying it.
+
+    Args:
+        move_ops (List[SampleMoveOperation]): the planned operations, with the settings to update.
+        xml_files (List[DelugeXml]): the XML files to update.
+
+    Returns:
+        stats (Tuple[XmlStat, ...]): (XML file, size, mtime_ns, (xml_path, old sample path) pairs) per file.
+    """
+    old_paths: Dict['deluge_xml.DelugeXml', List[Tuple[str, Path]]] = dict()
+    for move_op in move_ops:
+        for setting in move_op.sample.settings:
+            # the path the element refers to, which may be another name of the file
+            old_paths.setdefault(setting.xml_file, []).append((setting.xml_path, setting.sample.path))
+    stats = []
+    for xml in xml_files:
+        st = os.stat(xml.path)
+        stats.append((xml, st.st_size, st.st_mtime_ns, tuple(old_paths[xml])))
+    return tuple(stats)
+
+
+def check_xml_unchanged(stats: Tuple[XmlStat, ...]) -> None:
+    """Raise ValueError if an XML file changed since a plan was made, or no longer holds the planned references.
 
-    updated_songs = set(modify_sample_songs(sample_move_ops))
-    updated_kits = set(modify_sample_kits(sample_move_ops))
-    updated_synths = set(modify_sample_synths(sample_move_ops))
+    Each file is parsed again from the card, replacing any loaded tree (which may be stale, or hold
+    unsaved changes), and the tree is kept to apply the plan to, so the file is parsed only once. The
+    tree of a file that fails the check is released.
 
-    # write the modified XML, per unique song, kit, synth
-    # TODO this is writing files multiple times
-    for updated, tag in [(updated_songs, 'song'), (updated_kits, 'kit'), (updated_synths, 'synth')]:
-        for xml in updated:
-            xml.write_xml()
-            yield ModOp(f"update_{tag}_xml", str(xml.path), xml)
+    Args:
+        stats (Tuple[XmlStat, ...]): the XML files when planned, from `xml_stats()`.
+    """
+    for xml, size, mtime_ns, old_paths in stats:
+        try:
+            st = os.stat(xml.path)
+        except OSError:
+            raise ValueError(f'XML file missing since planned: {xml.path}')
+        if st.st_size != size or st.st_mtime_ns != mtime_ns:
+            raise ValueError(f'XML file changed since planned: {xml.path}')
+        # mtimes on FAT have a 2 second resolution, so check the references too, read from the file itself
+        # as the card index is keyed on the same (mtime_ns, size)
+        xml.release()
+        refs = {
+            xpath: sample_path(xml.cardfs.card_root, sample_file) for sample_file, xpath in xml.load().sample_refs()
+        }
+        for xpath, old_path in old_paths:
+            if refs.get(xpath) != old_path:
+                xml.release()
+                raise ValueError(f'sample reference changed since planned: {xml.path} {xpath}')
+
+
+def apply_mv_plan(plan: 'MovePlan', transactional: bool = False) -> Iterator['ModOp']:
+    """Apply a planned sample move, updating and writing the affected XML files.
+
+    With transactional=True the XML is written to temporary files and a journal of the
+    planned renames is saved before anything is replaced, see `mv_transaction`. If a
+    rename fails the move is rolled back, if the process dies it can be resumed or
+    rolled back from the journal. A plan is applied once, it is not updated by applying it.
+
+    Args:
+        plan (MovePlan): the plan, from `plan_mv_samples()`.
+        transactional (bool): journal the move so it can be rolled back or resumed.
+
+    Yields:
+        object (ModOp): Details of the move operation.
+
+    Raises:
+        ValueError: if an XML file changed since the plan was made, or transactional and the move is refused
+            (see `MoveTransaction.check()`); the card is not changed. The XML files are read from the card
+            again to check them (see `check_xml_unchanged()`), replacing any loaded trees, and those trees
+            are updated.
+    """
+    check_xml_unchanged(plan.xml_stats)
+    xml_files = list(plan.xml_files)
+    unique_move_ops = list(plan.move_ops)
+
+    if transactional:
+        MoveTransaction.check(plan.root, unique_move_ops)  # refuse before any tree is changed
+    try:
+        # apply all the changes to each XML file in one pass, then write each file once.
+        for xml, updates in plan.xml_updates:
+            xml.update_sample_elements(list(updates))
+        if transactional:
+            transaction = MoveTransaction.prepare(plan.root, xml_files, unique_move_ops)
+            try:
+                transaction.commit()
+            except Exception:
+                transaction.rollback()
+                raise
+    except Exception:
+        for xml in xml_files:
+            xml.release()  # the card is unchanged, drop the updated trees (they are parsed again on next use)
+        raise
+
+    if transactional:
+        for xml in xml_files:
+            yield ModOp(f"update_{XML_FILE_TAGS[xml.root_elem]}_xml", str(xml.path), xml)
+        for move_op in unique_move_ops:
+            yield ModOp("move_file", str(move_op.new_path), move_op)
+        return
+
+    for xml in xml_files:
+        xml.write_xml()
+        yield ModOp(f"update_{XML_FILE_TAGS[xml.root_elem]}_xml", str(xml.path), xml)
 
     # move the samples
-    for move_op in set(sample_move_ops):
+    for move_op in unique_move_ops:
         move_op.do_move()
         yield ModOp("move_file", str(move_op.new_path), move_op)
 
 
+def mv_samples(root: Path, samples: Iterator['Sample'], pattern: PatternArg, dest: Path, transactional: bool = False):
+    """Move samples, updating any affected XML files.
+
+    This plans the move with `plan_mv_samples()` then applies it with `apply_mv_plan()`.
+    """
+    yield from apply_mv_plan(plan_mv_samples(root, samples, pattern, dest), transactional)
+
+
+@define(frozen=True)
+class MovePlan(object):
+    """A planned sample move, see `plan_mv_samples()`.
+
+    The references of XML files already loaded when planning are read from their trees, the memory
+    copy rather than the card. Applying the plan checks them against the files on the card, so a plan
+    made over trees with unsaved changes is refused.
+
+    Attributes:
+        root (Path): root folder of the card.
+        dest (Path): absolute target folder or file.
+        move_ops (Tuple[SampleMoveOperation, ...]): the sample file moves, one per sample.
+        xml_updates (Tuple[Tuple[DelugeXml, Tuple[Tuple[str, Path], ...]], ...]): (xml_path, new sample path)
+            pairs per affected XML file, songs then kits then synths.
+        bytes_to_move (int): total size of the sample files changing path.
+        xml_stats (Tuple[XmlStat, ...]): (XML file, size, mtime_ns, (xml_path, old sample path) pairs) of each
+            affected XML file when planned, to check that none changed before the plan is applied.
+    """
+
+    root: Path
+    dest: Path
+    move_ops: Tuple['SampleMoveOperation', ...]
+    xml_updates: Tuple[Tuple['deluge_xml.DelugeXml', Tuple[Tuple[str, Path], ...]], ...]
+    bytes_to_move: int = 0
+    xml_stats: Tuple[XmlStat, ...] = ()
+
+    @property
+    def samples(self) -> List['Sample']:
+        """The samples to move."""
+        return [move_op.sample for move_op in self.move_ops]
+
+    @property
+    def xml_files(self) -> List['deluge_xml.DelugeXml']:
+        """The XML files to update."""
+        return [xml for xml, _ in self.xml_updates]
+
+    @property
+    def element_count(self) -> int:
+        """Number of XML sample elements to update."""
+        return sum(len(updates) for _, updates in self.xml_updates)
+
+    def xml_file_counts(self) -> Dict[str, int]:
+        """Number of XML files to update, by type.
+
+        Returns:
+            counts (Dict[str, int]): counts for 'song', 'kit' and 'synth'.
+        """
+        counts = dict.fromkeys(XML_FILE_TAGS.values(), 0)
+        for xml in self.xml_files:
+            counts[XML_FILE_TAGS[xml.root_elem]] += 1
+        return counts
+
+    def summary(self) -> str:
+        """A human readable summary of the plan.
+
+        Returns:
+            summary (str): the summary.
+        """
+        counts = self.xml_file_counts()
+        return (
+            f'move {len(self.move_ops)} samples ({self.bytes_to_move / 1e6:.1f}MB), updating {self.element_count} '
+            f'elements in {counts["song"]} songs, {counts["kit"]} kits, {counts["synth"]} synths.'
+        )
+
+
 @define(eq=False)
 class SampleMoveOperation(object):
     """Represents a sample file move operation.
@@ -154,7 +392,7 @@ class SampleMoveOperation(object):
         self.old_path.rename(self.new_path)
 
 
-@define  # (frozen=True)
+@define(weakref_slot=False)  # (frozen=True)
 class Sample(object):
     """represents a sample file.
 
@@ -172,8 +410,16 @@ class Sample(object):
     def __hash__(self):
         return super(Sample, self).__hash__()
 
+    def info(self) -> Optional[SampleInfo]:
+        """Read the format and length of this sample from its file headers, see `sample_info`.
 
-@define
+        Returns:
+            info (Optional[SampleInfo]): the metadata, or None if the file is not a WAV or AIFF file.
+        """
+        return read_sample_info(self.path)
+
+
+@define(weakref_slot=False)
 class SampleSetting(object):
     """represents a sample in the context of a DelugeXML file.
 
@@ -186,6 +432,11 @@ class SampleSetting(object):
     sample: 'Sample'
     xml_path: str
 
+    @property
+    def element(self):
+        """The sample element in the loaded XML tree (parsed if need be)."""
+        return self.xml_file.sample_element(self.xml_path)
+
 
 @define
 class ModOp(object):
@@ -41,6 +41,58 @@ class Mode(enum.Enum):
     locrian = [0, 1, 3, 5, 6, 8, 10]
 
 
+def mode_name(mode_notes: List[int]) -> str:
+    """Get the descriptive name of a scale (mode).
+
+    Args:
+        mode_notes ([int]): mode intervals, relative to root.
+
+    Returns:
+        str: scale_mode name, or 'other'.
+    """
+    try:
+        return Mode(mode_notes).name
+    except ValueError:
+        return 'other'
+
+
+def convert_tempo(time_per_timer_tick: str, timer_tick_fraction: str) -> float:
+    """Convert the song timer attributes to a tempo in beats per minute.
+
+    Args:
+        time_per_timer_tick (str): the `timePerTimerTick` attribute.
+        timer_tick_fraction (str): the `timerTickFraction` attribute.
+
+    Returns:
+        float: tempo BPM.
+
+    Javascript:
+        [downrush convertTempo()](https://github.com/jamiefaye/downrush/blob
+        /a4fa2794002cdcebb093848af501ca17a32abe9a/xmlView/src/SongViewLib.js#L508)
+    """
+    # // Return song tempo calculated from timePerTimerTick and timerTickFraction
+    # function convertTempo(jsong)
+    # {
+    #     let fractPart = (jsong.timerTickFraction>>>0) / 0x100000000;
+    #     let realTPT = Number(jsong.timePerTimerTick) + fractPart;
+    #     // Timer tick math: 44100 = standard Fs; 48 = PPQN;
+    #     // tempo = (44100 * 60) / 48 * realTPT;
+    #     // tempo = 55125 / realTPT
+    #     // rounded to 1 place after decimal point:
+    #     let tempo = Math.round(551250 / realTPT) / 10;
+    #
+    #     // console.log("timePerTimerTick=" + jsong.timePerTimerTick + " realTPT= " +  realTPT +
+    #     //      " tempo= " + tempo);
+    #     // console.log("timerTickFraction=" + jsong.timerTickFraction + " fractPart= " +  fractPart);
+    #     return tempo;
+    # }
+    fractPart = (int(timer_tick_fraction)) / int('0x100000000', 16)
+    realTPT = float(time_per_timer_tick) + fractPart
+    tempo = round((44100 * 60) / (96 * realTPT), 1)
+    # tempo = round(55125/realTPT/2, 1)
+    return tempo
+
+
 @dataclass
 class Kit:
     """Describes a kit object."""
@@ -107,11 +159,7 @@ class DelugeSong(DelugeXml):
         Returns:
             str: scale_mode name.
         """
-        mn = self.mode_notes()
-        try:
-            return Mode(mn).name
-        except ValueError:
-            return 'other'
+        return mode_name(self.mode_notes())
 
     def scale(self) -> str:
         """Get the song scale and key.
@@ -128,35 +176,8 @@ class DelugeSong(DelugeXml):
 
         Returns:
             float: tempo BPM.
-
-        Javascript:
-            [downrush convertTempo()](https://github.com/jamiefaye/downrush/blob
-            /a4fa2794002cdcebb093848af501ca17a32abe9a/xmlView/src/SongViewLib.js#L508)
         """
-        # // Return song tempo calculated from timePerTimerTick and timerTickFraction
-        # function convertTempo(jsong)
-        # {
-        #     let fractPart = (jsong.timerTickFraction>>>0) / 0x100000000;
-        #     let realTPT = Number(jsong.timePerTimerTick) + fractPart;
-        #     // Timer tick math: 44100 = standard Fs; 48 = PPQN;
-        #     // tempo = (44100 * 60) / 48 * realTPT;
-        #     // tempo = 55125 / realTPT
-        #     // rounded to 1 place after decimal point:
-        #     let tempo = Math.round(551250 / realTPT) / 10;
-        #
-        #     // console.log("timePerTimerTick=" + jsong.timePerTimerTick + " realTPT= " +  realTPT +
-        #     //      " tempo= " + tempo);
-        #     // console.log("timerTickFraction=" + jsong.timerTickFraction + " fractPart= " +  fractPart);
-        #     return tempo;
-        # }
-        fractPart = (int(self.xmlroot.get('timerTickFraction'))) / int('0x100000000', 16)
-        # print(int('0x100000000', 16))
-        # print(fractPart)
-        realTPT = float(self.xmlroot.get('timePerTimerTick')) + fractPart
-        # print(realTPT)
-        tempo = round((44100 * 60) / (96 * realTPT), 1)
-        # tempo = round(55125/realTPT/2, 1)
-        return tempo
+        return convert_tempo(self.xmlroot.get('timePerTimerTick'), self.xmlroot.get('timerTickFraction'))
 
     @property
     def synths(self) -> Generator[DelugeSongSound, Any, Any]:
@@ -2,8 +2,9 @@
 
 import enum
 import logging
-from dataclasses import dataclass, field
+from dataclasses import dataclass
 from pathlib import Path
+from typing import ClassVar, Dict, Optional, Tuple
 
 import lxml.etree
 
@@ -61,9 +62,8 @@ def attr_or_elem(elem: lxml.etree._Element, name: str, cast=str):
     """Deluge Synth/Sound are similar forms but the former uses elements and the latter uses attributes."""
     rval = None
     try:
-        if elem.get(name):
-            rval = elem.get(name)
-        else:
+        rval = elem.get(name)
+        if not rval:
             rval = elem.getroottree().find(f'./{name}').text
     except Exception:
         log.info(f'attr_or_elem() got Exception looking for "{name}" in {elem}')
@@ -80,78 +80,210 @@ def default_attr_or_elem(elem: lxml.etree._Element, name: str, cast=str, default
         return default
 
 
+class SoundLookup(object):
+    """The attribute and element values of a sound element, looked up as `attr_or_elem()` does.
+
+    Attributes are read from the element directly (one lxml lookup each, copying them
+    all to a dict costs more than the few that are used); the children of the document
+    root, where `attr_or_elem()` looks for values that are not attributes, are collected
+    into a dict on the first lookup that misses the attributes.
+    """
+
+    __slots__ = ('elem', '_children')
+
+    def __init__(self, elem: lxml.etree._Element):
+        """New lookup.
+
+        Args:
+            elem (lxml.etree._Element): the sound element.
+        """
+        self.elem = elem
+        self._children: Optional[Dict[str, Optional[str]]] = None
+
+    def _root_children(self) -> Dict[str, Optional[str]]:
+        if self._children is None:
+            children: Dict[str, Optional[str]] = dict()
+            for child in self.elem.getroottree().getroot():
+                if isinstance(child.tag, str):  # not a comment
+                    children.setdefault(child.tag, child.text)  # first match, as find()
+            self._children = children
+        return self._children
+
+    def get(self, name: str, cast=str):
+        """Get a value, as `attr_or_elem()`.
+
+        Args:
+            name (str): attribute or element name.
+            cast (callable): type of the value.
+
+        Returns:
+            value: the cast value.
+
+        Raises:
+            AttributeError: if the sound has no such value.
+        """
+        rval = self.elem.get(name)
+        if not rval:
+            try:
+                rval = self._root_children()[name]
+            except KeyError:
+                log.info(f'SoundLookup.get() found no "{name}" in {self.elem}')
+                raise AttributeError(name) from None
+        return cast(rval)
+
+    def get_default(self, name: str, cast=str, default=None):
+        """Get a value that may be missing, as `default_attr_or_elem()`.
+
+        Args:
+            name (str): attribute or element name.
+            cast (callable): type of the value.
+            default: value if the sound has no such value.
+
+        Returns:
+            value: the cast value, or default.
+        """
+        try:
+            return self.get(name, cast)
+        except AttributeError:
+            return default
+
+
+class memoised(object):
+    """A read-only property computed on first access, then stored on the instance.
+
+    Like `functools.cached_property`, without its per-access lock.
+    """
+
+    def __init__(self, func):
+        """New memoised property.
+
+        Args:
+            func (callable): computes the value from the instance.
+        """
+        self.func = func
+        self.name = func.__name__
+        self.__doc__ = func.__doc__
+
+    def __set_name__(self, owner, name):
+        self.name = name
+
+    def __get__(self, instance, owner=None):
+        if instance is None:
+            return self
+        value = instance.__dict__[self.name] = self.func(instance)
+        return value
+
+
 class Base(object):
-    """https://stackoverflow.com/a/59987363."""
+    """Sound fields are resolved on first access, from one `SoundLookup` per sound element.
+
+    `repr()` and `==` cover the dataclass fields and the memoised fields, in dataclass order.
+    """
 
-    def __post_init__(self):
-        # just intercept the __post_init__ calls so they
-        # aren't relayed to `object`
-        pass
+    sound: lxml.etree._Element
+    _fields: ClassVar[Tuple[str, ...]]
+
+    @classmethod
+    def _field_names(cls) -> Tuple[str, ...]:
+        if '_fields' not in cls.__dict__:
+            names: Dict[str, None] = dict()
+            for klass in reversed(cls.__mro__):
+                if '__dataclass_fields__' in klass.__dict__:
+                    names.update(dict.fromkeys(klass.__dict__.get('__annotations__', {})))
+                names.update(
+                    (name, None)
+                    for name, value in klass.__dict__.items()
+                    if isinstance(value, memoised) and not name.startswith('_')
+                )
+            cls._fields = tuple(names)
+        return cls._fields
+
+    def _field_values(self) -> tuple:
+        return tuple(getattr(self, name) for name in self._field_names())
+
+    def __repr__(self) -> str:
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self._field_names())
+        return f'{self.__class__.__qualname__}({fields})'
+
+    def __eq__(self, other) -> bool:
+        if other.__class__ is not self.__class__:
+            return NotImplemented
+        return self._field_values() == other._field_values()
+
+    @memoised
+    def _lookup(self) -> SoundLookup:
+        return SoundLookup(self.sound)
 
 
-@dataclass
 class NamedSound(Base):
     """A sound base class."""
 
-    name: str = field(init=False)
+    @memoised
+    def name(self) -> str:
+        """Sound name."""
+        return self._lookup.get('name')
 
-    def __post_init__(self):
-        super().__post_init__()
-        self.name = attr_or_elem(self.sound, 'name')
 
-
-@dataclass
 class PolyphonicSound(Base):
     """A polyphonic composable class."""
 
-    polyphonic: Polyphony = field(init=False)
-
-    def __post_init__(self):
-        super().__post_init__()
-        self.polyphonic = Polyphony(attr_or_elem(self.sound, 'polyphonic'))
+    @memoised
+    def polyphonic(self) -> Polyphony:
+        """Polyphony mode."""
+        return Polyphony(self._lookup.get('polyphonic'))
 
 
-@dataclass
 class PresetSound(Base):
     """A preset composable class."""
 
-    preset_slot: int = field(init=False)
-    preset_sub_slot: int = field(init=False)
+    @memoised
+    def preset_slot(self) -> Optional[str]:
+        """Preset slot, None if missing."""
+        return self._lookup.get_default('presetSlot')
 
-    def __post_init__(self):
-        super().__post_init__()
-        self.preset_slot = default_attr_or_elem(self.sound, 'presetSlot', default=None)
-        self.preset_sub_slot = default_attr_or_elem(self.sound, 'presetSubSlot', default=None)
+    @memoised
+    def preset_sub_slot(self) -> Optional[str]:
+        """Preset sub slot, None if missing."""
+        return self._lookup.get_default('presetSubSlot')
 
 
-@dataclass
+@dataclass(repr=False, eq=False)
 class BaseSound(Base):
     """A sound base class."""
 
     sound: lxml.etree._Element
-    lpf_mode: LpfMode = field(init=False)
-    mode: SynthMode = field(init=False)
-    mod_fx_type: str = field(init=False)
-    voice_priority: int = field(init=False)
 
-    def __post_init__(self):
-        super().__post_init__()
-        self.mode = SynthMode(attr_or_elem(self.sound, 'mode'))
-        self.lpf_mode = LpfMode(attr_or_elem(self.sound, 'lpfMode'))
-        self.mod_fx_type = ModFxType(attr_or_elem(self.sound, 'modFXType'))
-        self.voice_priority = attr_or_elem(self.sound, 'voicePriority', int)
+    @memoised
+    def lpf_mode(self) -> LpfMode:
+        """Low-pass filter mode."""
+        return LpfMode(self._lookup.get('lpfMode'))
+
+    @memoised
+    def mode(self) -> SynthMode:
+        """Synth engine mode."""
+        return SynthMode(self._lookup.get('mode'))
 
+    @memoised
+    def mod_fx_type(self) -> ModFxType:
+        """Mod FX type."""
+        return ModFxType(self._lookup.get('modFXType'))
 
-@dataclass
+    @memoised
+    def voice_priority(self) -> int:
+        """Voice priority."""
+        return self._lookup.get('voicePriority', int)
+
+
+@dataclass(repr=False, eq=False)
 class DelugeSynthSound(BaseSound, PolyphonicSound):
     """A synth sound."""
 
     path: Path
-    transpose: int = field(init=False)
 
-    def __post_init__(self):
-        super().__post_init__()
-        self.transpose = default_attr_or_elem(self.sound, 'transpose', cast=int, default=0)
+    @memoised
+    def transpose(self) -> int:
+        """Transpose, 0 if missing."""
+        return self._lookup.get_default('transpose', cast=int, default=0)
 
     @staticmethod
     def from_synth(synth: DelugeSynth) -> 'DelugeSynthSound':
@@ -159,24 +291,25 @@ class DelugeSynthSound(BaseSound, PolyphonicSound):
         return DelugeSynthSound(synth.xmlroot, path=synth.path)
 
 
-@dataclass
+@dataclass(repr=False, eq=False)
 class DelugeSongSound(BaseSound, PolyphonicSound, PresetSound):
     """A song instrument synth sound."""
 
-    # activeModFunction: bool = field(init=False)
-    default_velocity: int = field(init=False)
-    is_armed: bool = field(init=False)
+    # activeModFunction: bool
+
+    @memoised
+    def default_velocity(self) -> int:
+        """Default note velocity."""
+        return self._lookup.get('defaultVelocity', int)
 
-    def __post_init__(self):
-        super().__post_init__()
-        self.default_velocity = attr_or_elem(self.sound, 'defaultVelocity', int)
-        self.is_armed = attr_or_elem(self.sound, 'isArmedForRecording', bool)
+    @memoised
+    def is_armed(self) -> bool:
+        """Armed for recording."""
+        return self._lookup.get('isArmedForRecording', bool)
 
 
-@dataclass
+@dataclass(repr=False, eq=False)
 class DelugeSongKitSound(BaseSound, NamedSound):
     """A song instrument sound."""
 
-    # activeModFunction: bool = field(init=False)
-    def __post_init__(self):
-        super().__post_init__()
+    # activeModFunction: bool
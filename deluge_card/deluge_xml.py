@@ -1,14 +1,16 @@
 """Base class for a Deluge XML file."""
 
 import io
-from pathlib import Path, PurePath
-from typing import Dict, Iterator
+import sys
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
 
 from attrs import define, field
 from lxml import etree
 
 from .deluge_sample import Sample, SampleSetting
-from .helpers import ensure_absolute
+from .helpers import sample_path
+from .path_pattern import PatternArg, compile_pattern
 
 if False:
     # for forward-reference type-checking:
@@ -16,20 +18,212 @@ if False:
     from deluge_card import DelugeCardFS
 
 
-def read_and_clean_xml(xml_path):
-    """Strip illegal elements."""
-    newxml = io.BytesIO()
-    with open(xml_path, 'rb') as f:
-        lcount = 0
-        for line in f.readlines():
-            lcount += 1
+class CleanXmlReader(io.RawIOBase):
+    """Read-only stream of a Deluge XML file, without the illegal header lines.
+
+    Only the first few lines are inspected, the rest of the file is handed to the
+    reader unchanged, so no extra copy of the file is made.
+    """
+
+    def __init__(self, xml_path):
+        """Open xml_path, reading past the header lines.
+
+        Args:
+            xml_path (Path): path of the XML file.
+        """
+        super().__init__()
+        self._file = open(xml_path, 'rb')
+        head = []
+        for lcount in range(1, 4):
+            line = self._file.readline()
             if b'<firmwareVersion>' == line[:17] and lcount < 3:
                 continue
             if b'<earliestCompatibleFirmware>' == line[:28] and lcount < 4:
                 continue
-            newxml.write(line)
-    newxml.seek(0)
-    return newxml
+            head.append(line)
+        self._head = b''.join(head)
+
+    def readable(self) -> bool:
+        """This stream is readable."""
+        return True
+
+    def read(self, size: int = -1) -> bytes:
+        """Read up to size bytes, the kept header lines first then the file."""
+        if self._head:
+            if size is None or size < 0:
+                data, self._head = self._head + self._file.read(), b''
+            else:
+                data, self._head = self._head[:size], self._head[size:]
+            return data
+        data = self._file.read(size)
+        if not data:
+            self.close()
+        return data
+
+    def readall(self) -> bytes:
+        """Read the rest of the stream."""
+        return self.read()
+
+    def read_parts(self) -> Tuple[bytes, bytes]:
+        """Read the rest of the stream as the kept header lines and the rest of the file, without joining them.
+
+        Returns:
+            parts (Tuple[bytes, bytes]): header lines not yet read, and the rest of the file.
+        """
+        head, self._head = self._head, b''
+        return head, self._file.read()
+
+    def readinto(self, buffer) -> int:
+        """Read into a pre-allocated buffer."""
+        data = self.read(len(buffer))
+        buffer[: len(data)] = data
+        return len(data)
+
+    def close(self) -> None:
+        """Close the stream and the underlying file."""
+        self._file.close()
+        super().close()
+
+
+def read_and_clean_xml(xml_path):
+    """Strip illegal elements."""
+    return CleanXmlReader(xml_path)
+
+
+def parse_xml(xml_path) -> etree._Element:
+    """Parse a (cleaned) Deluge XML file, returning the root element."""
+    try:
+        parser = etree.XMLParser(recover=True)
+        return etree.parse(read_and_clean_xml(xml_path), parser).getroot()
+    except Exception as err:
+        print(f'parsing {xml_path} raises.')
+        raise err
+
+
+def sample_elements(xmlroot: etree._Element) -> List[Tuple[str, etree._Element]]:
+    """Find the sample elements in a parsed Deluge XML tree.
+
+    Args:
+        xmlroot (etree._Element): root element.
+
+    Returns:
+        elements (List[Tuple[str, etree._Element]]): (xpath, element) pairs, `fileName` attributes first.
+    """
+    tree = etree.ElementTree(xmlroot)
+    elements = xmlroot.findall(".//*[@fileName]") + xmlroot.findall(".//fileName")
+    return [(tree.getpath(e), e) for e in elements]
+
+
+def sample_refs_from_tree(xmlroot: etree._Element) -> List[Tuple[str, str]]:
+    """Extract the sample references from a parsed Deluge XML tree.
+
+    Args:
+        xmlroot (etree._Element): root element.
+
+    Returns:
+        refs (List[Tuple[str, str]]): (fileName, xpath) pairs, `fileName` attributes first.
+    """
+    refs = [(_sample_file(e), xpath) for xpath, e in sample_elements(xmlroot)]
+    return [(sample_file, xpath) for sample_file, xpath in refs if sample_file]
+
+
+def _sample_file(elem: etree._Element) -> str:
+    return elem.text if elem.tag == 'fileName' else elem.get('fileName')
+
+
+class _SampleRefsTarget:
+    """lxml parser target (SAX-style) collecting sample references, without building a tree.
+
+    Xpaths are resolved when parsing completes, once all sibling counts are known, and
+    match those from `ElementTree.getpath()`.
+    """
+
+    def __init__(self):
+        self.steps: List[Tuple[str, int, Dict[str, int]]] = []
+        self.child_counts: List[Dict[str, int]] = [dict()]
+        self.attr_refs: List[Tuple[str, tuple]] = []
+        self.elem_refs: List[Tuple[str, tuple]] = []
+        self.text: Optional[List[str]] = None
+
+    def start(self, tag, attrib):
+        counts = self.child_counts[-1]
+        counts[tag] = counts.get(tag, 0) + 1
+        self.steps.append((tag, counts[tag], counts))
+        self.child_counts.append(dict())
+        if tag == 'fileName':
+            self.text = []
+        elif len(self.steps) > 1 and attrib.get('fileName'):
+            self.attr_refs.append((attrib.get('fileName'), tuple(self.steps)))
+
+    def data(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
+    def end(self, tag):
+        if tag == 'fileName' and self.text is not None:
+            text = ''.join(self.text)
+            if len(self.steps) > 1 and text:
+                self.elem_refs.append((text, tuple(self.steps)))
+            self.text = None
+        self.steps.pop()
+        self.child_counts.pop()
+
+    def close(self) -> List[Tuple[str, str]]:
+        def xpath(steps) -> str:
+            return ''.join(f'/{tag}[{pos}]' if counts[tag] > 1 else f'/{tag}' for tag, pos, counts in steps)
+
+        return [(sample_file, xpath(steps)) for sample_file, steps in self.attr_refs + self.elem_refs]
+
+
+def read_sample_refs(xml_path) -> List[Tuple[str, str]]:
+    """Read the sample references from a Deluge XML file, without building a tree.
+
+    The file is parsed in a single streaming pass, so memory use is bounded by the
+    number of references rather than the size of the document. The parser target runs
+    a Python callback per element, so this is slower than `read_sample_refs_tree()`.
+
+    Args:
+        xml_path (Path): path of the XML file.
+
+    Returns:
+        refs (List[Tuple[str, str]]): (fileName, xpath) pairs, `fileName` attributes first.
+    """
+    target = _SampleRefsTarget()
+    try:
+        refs = etree.parse(read_and_clean_xml(xml_path), etree.XMLParser(target=target, recover=True))
+    except Exception as err:
+        print(f'parsing {xml_path} raises.')
+        raise err
+    if not target.child_counts[0]:
+        # no root element was recovered, let the regular parser raise its error
+        return sample_refs_from_tree(parse_xml(xml_path))
+    return refs
+
+
+def read_sample_refs_tree(xml_path) -> List[Tuple[str, str]]:
+    """Read the sample references from a Deluge XML file, by parsing it into a tree.
+
+    The file is read into memory once and fed to lxml after the kept header lines, so the
+    document is not copied again, and parsed in C, releasing the GIL, with no Python
+    callbacks per element as in `read_sample_refs()`. This is the faster reader, and the
+    one that scales across threads, at the cost of holding one tree (per thread) while it runs.
+
+    Args:
+        xml_path (Path): path of the XML file.
+
+    Returns:
+        refs (List[Tuple[str, str]]): (fileName, xpath) pairs, `fileName` attributes first.
+    """
+    with read_and_clean_xml(xml_path) as reader:
+        head, rest = reader.read_parts()
+    parser = etree.XMLParser(recover=True)
+    parser.feed(head)
+    parser.feed(rest)
+    xmlroot = parser.close()
+    if xmlroot is None:
+        # no root element was recovered, let the regular parser raise its error
+        xmlroot = parse_xml(xml_path)
+    return sample_refs_from_tree(xmlroot)
 
 
 @define
@@ -43,21 +237,70 @@ class DelugeXml:
 
     cardfs: 'DelugeCardFS'
     path: Path
-    xmlroot: etree.ElementTree = field(init=False)
+    _xmlroot: Optional[etree._Element] = field(init=False, default=None, repr=False)
+    _elements: Optional[Dict[str, etree._Element]] = field(init=False, default=None, repr=False)
     uniqid: int = field(init=False)
     # samples_xpath: str = field(init=False)
     root_elem: str = field(init=False)
 
     def __attrs_post_init__(self):
         self.uniqid = hash(f'{str(self.cardfs.card_root)}{str(self.path)}')
-        # ultimately we might want to lazy load here ....
-        # see https://stackoverflow.com/questions/55548536/python-attrs-class-attribute-cached-lazy-load
+
+    @property
+    def xmlroot(self) -> etree._Element:
+        """The root element of the XML, parsed on first access."""
+        if self._xmlroot is None:
+            self._xmlroot = parse_xml(self.path)
+        return self._xmlroot
+
+    @xmlroot.setter
+    def xmlroot(self, value: etree._Element):
+        self._xmlroot = value
+        self._elements = None
+
+    @property
+    def loaded(self) -> bool:
+        """True if the XML tree is currently parsed and held in memory."""
+        return self._xmlroot is not None
+
+    def load(self) -> 'DelugeXml':
+        """Parse the XML now, rather than on first access of `xmlroot`.
+
+        Returns:
+            instance (DelugeXml): this instance.
+        """
+        self.xmlroot
+        return self
+
+    def release(self) -> None:
+        """Release the parsed XML tree, it is parsed again on next access.
+
+        Any unsaved changes to the tree are discarded.
+        """
+        self._xmlroot = None
+        self._elements = None
+
+    def sample_element(self, xml_path: str) -> etree._Element:
+        """Get a sample element by its xpath, as held in a SampleSetting.
+
+        The sample elements of the loaded tree are mapped by xpath on first use, so
+        each lookup after that is a dict access rather than a search of the tree.
+
+        Args:
+            xml_path (str): xpath of the element, as from `ElementTree.getpath()`.
+
+        Returns:
+            element (etree._Element): the element with the `fileName` attribute, or the `fileName` element.
+
+        Raises:
+            ValueError: if the xpath does not locate a sample element.
+        """
+        if self._elements is None:
+            self._elements = dict(sample_elements(self.xmlroot))
         try:
-            parser = etree.XMLParser(recover=True)
-            self.xmlroot = etree.parse(read_and_clean_xml(self.path), parser).getroot()
-        except Exception as err:
-            print(f'parsing {self.path} raises.')
-            raise err
+            return self._elements[xml_path]
+        except KeyError:
+            raise ValueError(f'sample element {xml_path} not found in {self.path}')
 
     def __eq__(self, other):
         return self.uniqid == other.uniqid
@@ -67,9 +310,7 @@ class DelugeXml:
 
     def update_sample_element(self, xml_path, sample_path):
         """Update XML element from sample_setting."""
-        tree = etree.ElementTree(self.xmlroot)
-        elem = tree.find(xml_path.replace(f'/{self.root_elem}/', '//'))
-        # print('DEBUG old path', elem.get('fileName'), elem)
+        elem = self.sample_element(xml_path)
         sample_path = sample_path.relative_to(self.cardfs.card_root)
         if elem.tag == 'fileName':
             elem.text = str(sample_path)
@@ -77,6 +318,20 @@ class DelugeXml:
             elem.set('fileName', str(sample_path))
         return elem
 
+    def update_sample_elements(self, updates: List[Tuple[str, Path]]) -> List[etree._Element]:
+        """Update many sample elements, see `update_sample_element`.
+
+        Args:
+            updates (List[Tuple[str, Path]]): (xml_path, sample_path) pairs.
+
+        Returns:
+            elements (List[etree._Element]): the updated elements.
+
+        Raises:
+            ValueError: if an xml_path does not locate a sample element.
+        """
+        return [self.update_sample_element(xml_path, sample_path) for xml_path, sample_path in updates]
+
     def write_xml(self, new_path=None) -> str:
         """Write the song XML."""
         filename = new_path or self.path
@@ -84,39 +339,74 @@ class DelugeXml:
             doc.write(etree.tostring(self.xmlroot, pretty_print=True))
         return str(filename)
 
-    def samples(self, pattern: str = "", allow_missing=False) -> Iterator[Sample]:
+    def sample_refs(self, use_index: bool = True) -> List[Tuple[str, str]]:
+        """Get the sample references in this file.
+
+        An already loaded tree is used as-is (it may hold unsaved changes), otherwise
+        the card index is consulted when enabled, so unchanged files are not parsed,
+        or the file is read without keeping its tree (streamed, with `stream_xml` on
+        the card).
+
+        Args:
+            use_index (bool): consult the card index; False reads a file that is not loaded, e.g. to verify
+                it when the index may not see a change (within the filesystem's mtime resolution). To read
+                the file when it is loaded, `release()` it first.
+
+        Returns:
+            refs (List[Tuple[str, str]]): (fileName, xpath) pairs.
+        """
+        if self._xmlroot is not None:
+            return sample_refs_from_tree(self._xmlroot)
+        index = self.cardfs.index() if use_index else None
+        if index is not None:
+            return index.sample_refs(self.path, self.cardfs.stream_xml)
+        return read_sample_refs(self.path) if self.cardfs.stream_xml else read_sample_refs_tree(self.path)
+
+    def samples(self, pattern: PatternArg = '', allow_missing=False) -> Iterator[Sample]:
         """Generator for samples referenced in the DelugeXML file.
 
+        Sample files are checked against the card's folder listings as cached by the
+        last card-level listing (`songs()`, `samples()`, ...), which revalidates them.
+
+        Args:
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+
+        Yields:
+            object (Sample): the next sample object.
+        """
+        return self.samples_from_refs(self.sample_refs(), pattern, allow_missing)
+
+    def samples_from_refs(
+        self, refs: List[Tuple[str, str]], pattern: PatternArg = '', allow_missing=False
+    ) -> Iterator[Sample]:
+        """Generator for samples, given sample references already read from this file.
+
+        Sample files are checked against the card's cached folder listings, rather than
+        stat'ed for each reference, see `DelugeCardFS.folder_cache()`.
+
         Args:
-            pattern (str): glob-style filename pattern.
+            refs (List[Tuple[str, str]]): (fileName, xpath) pairs, as from `sample_refs()`.
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
 
         Yields:
             object (Sample): the next sample object.
         """
-        tree = etree.ElementTree(self.xmlroot)
         sample_map: Dict[Path, Sample] = dict()
+        exists = self.cardfs.folder_cache().exists
+        matcher = compile_pattern(pattern)
 
-        def update_sample_map(sample_file, tree) -> None:
-            sample = Sample(ensure_absolute(self.cardfs.card_root, Path(sample_file)))
-            if sample.path in sample_map.keys():
-                sample = sample_map[sample.path]
-            else:
-                sample_map[sample.path] = sample
-            sample.settings.append(SampleSetting(self, sample, tree.getpath(e)))
-
-        def match_pattern(sample_file: str, pattern: str) -> None:
-            if sample_file:
-                if (not allow_missing) and (not ensure_absolute(self.cardfs.card_root, Path(sample_file)).exists()):
-                    return
-                if not pattern:
-                    update_sample_map(sample_file, tree)
-                elif PurePath(sample_file).match(pattern):
-                    update_sample_map(sample_file, tree)
-
-        for e in self.xmlroot.findall(".//*[@fileName]"):
-            match_pattern(e.get('fileName'), pattern)
-
-        for e in self.xmlroot.findall(".//fileName"):
-            match_pattern(e.text, pattern)
+        def update_sample_map(path: Path, xpath: str) -> None:
+            sample = sample_map.get(path)
+            if sample is None:
+                sample = sample_map[path] = Sample(path)
+            # xpaths repeat across files (e.g. /song/instruments/sound/osc1), share the strings
+            sample.settings.append(SampleSetting(self, sample, sys.intern(xpath)))
+
+        for sample_file, xpath in refs:
+            path = sample_path(self.cardfs.card_root, sample_file)
+            if (not allow_missing) and (not exists(path)):
+                continue
+            if matcher.match_all or matcher.match(sample_file):
+                update_sample_map(path, xpath)
 
         return (m for m in sample_map.values())
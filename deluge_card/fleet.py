@@ -0,0 +1,184 @@
+"""Run the same operation over many cards, e.g. a folder of backup card images.
+
+Each card is handled by a worker in a thread pool. An error on one card is recorded
+in its result and does not stop the others, the report aggregates all results.
+"""
+
+import collections
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Callable, Counter, Dict, Iterable, List, Optional
+
+from attrs import define, field
+
+from .deluge_card import DelugeCardFS
+from .deluge_sample import validate_mv_dest
+from .path_pattern import PatternArg
+
+DEFAULT_WORKERS = 4
+
+
+@define(frozen=True)
+class CardResult:
+    """The outcome of an operation on one card.
+
+    Attributes:
+        card_root (Path): root folder of the card.
+        value (object): what the operation returned, None if it failed.
+        error (Optional[Exception]): the exception raised by the operation, None if it succeeded.
+        seconds (float): time taken.
+    """
+
+    card_root: Path
+    value: object = None
+    error: Optional[Exception] = None
+    seconds: float = 0.0
+
+    @property
+    def ok(self) -> bool:
+        """True if the operation succeeded."""
+        return self.error is None
+
+
+@define
+class FleetReport:
+    """Aggregated outcome of an operation over many cards.
+
+    Attributes:
+        results (List[CardResult]): one result per card, in card order.
+    """
+
+    results: List[CardResult] = field(factory=list)
+
+    @property
+    def succeeded(self) -> List[CardResult]:
+        """Results of the cards where the operation succeeded."""
+        return [r for r in self.results if r.ok]
+
+    @property
+    def failed(self) -> List[CardResult]:
+        """Results of the cards where the operation raised."""
+        return [r for r in self.results if not r.ok]
+
+    def totals(self) -> Counter[str]:
+        """Sum the operation counts of the successful cards, for operations returning counts.
+
+        Returns:
+            totals (Counter[str]): summed counts.
+        """
+        totals: Counter[str] = collections.Counter()
+        for result in self.succeeded:
+            if isinstance(result.value, dict):
+                totals.update(result.value)
+        return totals
+
+    def summary(self) -> str:
+        """A human readable summary, one line per failed card.
+
+        Returns:
+            summary (str): the summary.
+        """
+        lines = [f'{len(self.results)} cards, {len(self.succeeded)} succeeded, {len(self.failed)} failed.']
+        totals = self.totals()
+        if totals:
+            lines.append(', '.join(f'{key}: {count}' for key, count in sorted(totals.items())))
+        lines += [f'{r.card_root}: {type(r.error).__name__}: {r.error}' for r in self.failed]
+        return '\n'.join(lines)
+
+
+def _run_card(fn: Callable[[DelugeCardFS], object], card: DelugeCardFS) -> CardResult:
+    start = time.perf_counter()
+    try:
+        value = fn(card)
+    except Exception as err:
+        return CardResult(card.card_root, error=err, seconds=time.perf_counter() - start)
+    return CardResult(card.card_root, value, seconds=time.perf_counter() - start)
+
+
+def run_fleet(
+    cards: Iterable[DelugeCardFS], fn: Callable[[DelugeCardFS], object], workers: int = DEFAULT_WORKERS
+) -> FleetReport:
+    """Apply an operation to each card.
+
+    Args:
+        cards (Iterable[DelugeCardFS]): the cards, e.g. from `list_deluge_fs()`.
+        fn (Callable[[DelugeCardFS], object]): the operation, its return value is kept in the card's result.
+        workers (int): number of cards handled concurrently, 0 or 1 to handle them serially.
+
+    Returns:
+        report (FleetReport): the results, in card order.
+    """
+    if workers <= 1:
+        return FleetReport([_run_card(fn, card) for card in cards])
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        return FleetReport(list(pool.map(lambda card: _run_card(fn, card), cards)))
+
+
+def mv_samples_counts(
+    card: DelugeCardFS, pattern: PatternArg, dest: Path, transactional: bool = False
+) -> Dict[str, int]:
+    """Move samples on a card, see `DelugeCardFS.mv_samples()`, counting the operations.
+
+    Args:
+        card (DelugeCardFS): the card.
+        pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+        dest (Path): target folder or file, relative to the card root.
+        transactional (bool): journal the move so it can be rolled back or resumed.
+
+    Returns:
+        counts (Dict[str, int]): number of each ModOp operation.
+
+    Raises:
+        ValueError: if dest is not valid on this card, or it has an interrupted move.
+    """
+    if card.pending_move():
+        raise ValueError(f'interrupted move found in {card.card_root}, resume or roll it back first.')
+    validate_mv_dest(card.card_root, dest)
+    counts = dict(move_file=0, update_song_xml=0, update_kit_xml=0, update_synth_xml=0)
+    for modop in card.mv_samples(pattern, dest, transactional):
+        counts[modop.operation] += 1
+    return counts
+
+
+def fleet_mv_samples(
+    cards: Iterable[DelugeCardFS],
+    pattern: PatternArg,
+    dest: Path,
+    transactional: bool = False,
+    workers: int = DEFAULT_WORKERS,
+) -> FleetReport:
+    """Move samples on each card, see `mv_samples_counts()`.
+
+    Args:
+        cards (Iterable[DelugeCardFS]): the cards.
+        pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+        dest (Path): target folder or file, relative to each card root.
+        transactional (bool): journal each card's move so it can be rolled back or resumed.
+        workers (int): number of cards handled concurrently.
+
+    Returns:
+        report (FleetReport): operation counts per card.
+    """
+    return run_fleet(cards, lambda card: mv_samples_counts(card, pattern, dest, transactional), workers)
+
+
+def fleet_unused_samples(
+    cards: Iterable[DelugeCardFS], pattern: PatternArg = '', workers: int = DEFAULT_WORKERS
+) -> FleetReport:
+    """Count the unused samples on each card, see `DelugeCardFS.unused_samples()`.
+
+    Args:
+        cards (Iterable[DelugeCardFS]): the cards.
+        pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+        workers (int): number of cards handled concurrently.
+
+    Returns:
+        report (FleetReport): `unused_samples` and `unused_bytes` counts per card.
+    """
+
+    def count_unused(card: DelugeCardFS) -> Dict[str, int]:
+        orphans = list(card.unused_samples(pattern))
+        return dict(unused_samples=len(orphans), unused_bytes=sum(o.size for o in orphans))
+
+    return run_fleet(cards, count_unused, workers)
@@ -0,0 +1,163 @@
+"""Cached folder listings, so file existence checks do not need a stat per file.
+
+Each folder is listed once with os.scandir. A listing is trusted until the next
+`revalidate()`, after which it is checked against the folder's mtime (one stat per
+folder, however many files are looked up) and listed again if it changed.
+
+A lookup that misses the listing is answered from it too, files added since the
+folder was listed are found after the next `revalidate()`. Only a name that matches
+a listed file in a different case is stat'ed, once per listing, as the card may be
+case-insensitive (FAT).
+"""
+
+import os
+import threading
+from pathlib import Path
+from typing import Dict, FrozenSet, Iterable, Iterator, Optional, Tuple
+
+from attrs import define, field
+
+
+@define(frozen=True)
+class FolderListing:
+    """The contents of a folder when it was listed.
+
+    Attributes:
+        mtime_ns (int): modification time of the folder.
+        files (Tuple[str, ...]): names of the files, in scandir order.
+        folders (Tuple[str, ...]): names of the sub-folders, in scandir order.
+        file_set (FrozenSet[str]): names of the files, for lookups.
+        folded_set (FrozenSet[str]): case-folded names of the files, for lookups that miss `file_set`.
+        other_case (Dict[str, bool]): names found in `folded_set` only, and whether they exist.
+    """
+
+    mtime_ns: int
+    files: Tuple[str, ...]
+    folders: Tuple[str, ...]
+    file_set: FrozenSet[str] = field(eq=False, repr=False)
+    folded_set: FrozenSet[str] = field(eq=False, repr=False)
+    other_case: Dict[str, bool] = field(factory=dict, eq=False, repr=False)
+
+    @file_set.default
+    def _default_file_set(self):
+        return frozenset(self.files)
+
+    @folded_set.default
+    def _default_folded_set(self):
+        return frozenset(name.casefold() for name in self.files)
+
+
+def list_folder(folder: str) -> FolderListing:
+    """List a folder with a single os.scandir.
+
+    Args:
+        folder (str): path of the folder.
+
+    Returns:
+        listing (FolderListing): the folder contents.
+
+    Raises:
+        OSError: if the folder cannot be read.
+    """
+    mtime_ns = os.stat(folder).st_mtime_ns
+    files = []
+    folders = []
+    with os.scandir(folder) as entries:
+        for entry in entries:
+            if entry.is_dir():
+                folders.append(entry.name)
+            else:
+                files.append(entry.name)
+    return FolderListing(mtime_ns, tuple(files), tuple(folders))
+
+
+@define
+class FolderCache:
+    """Folder listings, validated against the folder mtimes once per `revalidate()`."""
+
+    _listings: Dict[str, Tuple[int, Optional[FolderListing]]] = field(factory=dict, repr=False)
+    _generation: int = field(default=0, repr=False)
+    _lock: threading.Lock = field(factory=threading.Lock, repr=False)
+
+    def revalidate(self) -> None:
+        """Check each cached listing against its folder's mtime on its next use."""
+        with self._lock:
+            self._generation += 1
+
+    def invalidate(self, folders: Iterable[str]) -> None:
+        """Forget the listings of folders changed by this process, they are listed again on next use.
+
+        Unlike `revalidate()`, this does not rely on the folder mtimes, which may not change
+        within their resolution (2 seconds on FAT).
+
+        Args:
+            folders (Iterable[str]): paths of the folders.
+        """
+        with self._lock:
+            for folder in folders:
+                self._listings.pop(folder, None)
+
+    def listing(self, folder: str) -> Optional[FolderListing]:
+        """Get the (cached) listing of a folder.
+
+        Args:
+            folder (str): path of the folder.
+
+        Returns:
+            listing (Optional[FolderListing]): the folder contents, or None if the folder cannot be read.
+        """
+        with self._lock:
+            cached = self._listings.get(folder)
+            if cached and cached[0] == self._generation:
+                return cached[1]
+            listing: Optional[FolderListing] = None
+            try:
+                if cached and cached[1] and os.stat(folder).st_mtime_ns == cached[1].mtime_ns:
+                    listing = cached[1]
+                else:
+                    listing = list_folder(folder)
+            except OSError:
+                pass  # missing or unreadable, also cached until revalidated
+            self._listings[folder] = (self._generation, listing)
+            return listing
+
+    def walk(self, folder: str, skip_hidden: bool = True) -> Iterator[Tuple[str, FolderListing]]:
+        """Walk a folder tree top-down, from the cached listings.
+
+        Args:
+            folder (str): path of the top folder.
+            skip_hidden (bool): do not descend into folders whose name starts with '.'.
+
+        Yields:
+            item (Tuple[str, FolderListing]): (folder path, listing) for each readable folder.
+        """
+        listing = self.listing(folder)
+        if listing is None:
+            return
+        yield folder, listing
+        for name in listing.folders:
+            if skip_hidden and name[0] == '.':
+                continue
+            yield from self.walk(os.path.join(folder, name), skip_hidden)
+
+    def exists(self, path: Path) -> bool:
+        """Does a file exist, according to the cached listing of its folder.
+
+        Args:
+            path (Path): path of the file.
+
+        Returns:
+            exists (bool): True if the file exists.
+        """
+        listing = self.listing(str(path.parent))
+        if listing is None:
+            return False
+        if path.name in listing.file_set:
+            return True
+        if path.name.casefold() not in listing.folded_set:
+            return False
+        # a different case, which exists on a case-insensitive card
+        found = listing.other_case.get(path.name)
+        if found is None:
+            found = listing.other_case[path.name] = path.exists()
+        return found
@@ -1,7 +1,14 @@
 """Helper functions."""
+import functools
 from pathlib import Path
 
 
 def ensure_absolute(root: Path, dest: Path):
     """Make sure the path is absolute, if not make it relate to the root folder."""
     return dest if dest.is_absolute() else Path(root, dest)
+
+
+@functools.lru_cache(maxsize=65536)
+def sample_path(root: Path, sample_file: str) -> Path:
+    """Absolute Path for a sample reference, the same Path object is shared by repeated references."""
+    return ensure_absolute(root, Path(sample_file))
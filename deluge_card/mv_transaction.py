@@ -0,0 +1,253 @@
+"""Crash-safe, transactional sample moves.
+
+A move is prepared by writing every updated XML file to a temporary file beside
+the original, backing up the originals and recording a journal of the planned
+renames (and deletions) in the card root, all fsync'ed. The commit then only
+renames files with `os.replace`, and each step can be detected from the filesystem,
+so an interrupted move can be resumed or rolled back from the journal alone. Files
+to delete are renamed aside to a backup, which is only removed once the commit is done.
+"""
+
+import json
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from attrs import define, field
+
+if False:
+    # for forward-reference type-checking:
+    # ref https://stackoverflow.com/a/38962160
+    import deluge_sample
+    import deluge_xml
+
+JOURNAL_FILENAME = '.deluge_card_journal.json'
+JOURNAL_VERSION = 2
+TMP_SUFFIX = '.dmvtmp'
+BACKUP_SUFFIX = '.dmvbak'
+
+
+def fsync_file(path: Path) -> None:
+    """Flush a file's contents to disk."""
+    with open(path, 'r+b') as f:
+        os.fsync(f.fileno())
+
+
+def fsync_dir(path: Path) -> None:
+    """Flush a directory entry to disk, where the OS supports it."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:  # e.g. on Windows
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _same_file(a: Path, b: Path) -> bool:
+    try:
+        return os.path.samefile(a, b)
+    except OSError:
+        return False
+
+
+def check_move_targets(move_ops: Iterable['deluge_sample.SampleMoveOperation']) -> None:
+    """Check that no two sample files would be moved to the same path.
+
+    Target paths are compared case-insensitively, as on the FAT32 cards used by the Deluge;
+    other names of the same file (e.g. in a different case) are not a conflict.
+
+    Args:
+        move_ops (Iterable[SampleMoveOperation]): the sample moves.
+
+    Raises:
+        ValueError: if two different files would be moved to the same path.
+    """
+    targets: Dict[str, Path] = dict()
+    for move_op in move_ops:
+        old_path = targets.setdefault(move_op.new_path.as_posix().casefold(), move_op.old_path)
+        if old_path != move_op.old_path and not _same_file(old_path, move_op.old_path):
+            raise ValueError(f'{old_path} and {move_op.old_path} would both be moved to {move_op.new_path}')
+
+
+@define
+class MoveTransaction:
+    """A journalled set of sample moves and XML rewrites.
+
+    Attributes:
+        card_root (Path): root folder of the card.
+        xml_files (List[Tuple[str, str, str]]): card-relative (path, tmp, backup) per XML file.
+        samples (List[Tuple[str, str]]): card-relative (old, new) per sample file.
+        deletions (List[Tuple[str, str]]): card-relative (path, backup) per file to delete.
+    """
+
+    card_root: Path
+    xml_files: List[Tuple[str, str, str]] = field(factory=list)
+    samples: List[Tuple[str, str]] = field(factory=list)
+    deletions: List[Tuple[str, str]] = field(factory=list)
+
+    @property
+    def journal_path(self) -> Path:
+        """Path of the journal file."""
+        return Path(self.card_root, JOURNAL_FILENAME)
+
+    def _abs(self, rel: str) -> Path:
+        return Path(self.card_root, rel)
+
+    def _rel(self, path: Path) -> str:
+        return Path(path).relative_to(self.card_root).as_posix()
+
+    @staticmethod
+    def pending(card_root: Path) -> Optional['MoveTransaction']:
+        """Load the journal of an incomplete transaction, if there is one.
+
+        Args:
+            card_root (Path): root folder of the card.
+
+        Returns:
+            transaction (Optional[MoveTransaction]): the incomplete transaction, or None.
+        """
+        journal = Path(card_root, JOURNAL_FILENAME)
+        if not journal.exists():
+            return None
+        data = json.loads(journal.read_text())
+        if data.get('version') not in (1, JOURNAL_VERSION):  # version 1 has no deletions
+            raise ValueError(f'unsupported journal version in {journal}')
+        return MoveTransaction(
+            card_root,
+            [tuple(x) for x in data['xml_files']],  # type: ignore
+            [tuple(s) for s in data['samples']],  # type: ignore
+            [tuple(d) for d in data.get('deletions', [])],  # type: ignore
+        )
+
+    @staticmethod
+    def check(card_root: Path, move_ops: List['deluge_sample.SampleMoveOperation']) -> None:
+        """Check that a transaction could be prepared, before any XML tree is updated for it.
+
+        Args:
+            card_root (Path): root folder of the card.
+            move_ops (List[SampleMoveOperation]): the sample moves.
+
+        Raises:
+            ValueError: if another transaction is incomplete, or a move would overwrite a file (including
+                one moved by another move op).
+        """
+        if Path(card_root, JOURNAL_FILENAME).exists():
+            raise ValueError(f'incomplete move found in {card_root}, resume or roll it back first.')
+        check_move_targets(move_ops)
+        for move_op in move_ops:
+            # another name of the same file (e.g. a case-only rename on a FAT32 card) is not an overwrite
+            if move_op.new_path.exists() and not _same_file(move_op.new_path, move_op.old_path):
+                raise ValueError(f'move would overwrite existing file: {move_op.new_path}')
+
+    @staticmethod
+    def prepare(
+        card_root: Path,
+        xml_files: List['deluge_xml.DelugeXml'],
+        move_ops: List['deluge_sample.SampleMoveOperation'],
+        deletions: Iterable[Path] = (),
+    ) -> 'MoveTransaction':
+        """Write the updated XML to temporary files, back up the originals and write the journal.
+
+        Nothing visible to the Deluge changes until `commit()`.
+
+        Args:
+            card_root (Path): root folder of the card.
+            xml_files (List[DelugeXml]): XML files, already updated in memory.
+            move_ops (List[SampleMoveOperation]): the sample moves.
+            deletions (Iterable[Path]): files to delete once the XML files are replaced, e.g. merged samples.
+
+        Returns:
+            transaction (MoveTransaction): the prepared transaction.
+
+        Raises:
+            ValueError: if the transaction fails `check()`.
+        """
+        MoveTransaction.check(card_root, move_ops)
+        transaction = MoveTransaction(card_root)
+        for move_op in move_ops:
+            transaction.samples.append((transaction._rel(move_op.old_path), transaction._rel(move_op.new_path)))
+        for path in deletions:
+            transaction.deletions.append((transaction._rel(path), transaction._rel(Path(f'{path}{BACKUP_SUFFIX}'))))
+
+        try:
+            for xml in xml_files:
+                tmp = Path(f'{xml.path}{TMP_SUFFIX}')
+                backup = Path(f'{xml.path}{BACKUP_SUFFIX}')
+                transaction.xml_files.append(
+                    (transaction._rel(xml.path), transaction._rel(tmp), transaction._rel(backup))
+                )
+                xml.write_xml(new_path=tmp)
+                fsync_file(tmp)
+                shutil.copy2(xml.path, backup)
+                fsync_file(backup)
+            transaction._write_journal()
+        except Exception:
+            transaction.finish()
+            raise
+        return transaction
+
+    def _write_journal(self) -> None:
+        tmp = Path(f'{self.journal_path}{TMP_SUFFIX}')
+        data = dict(version=JOURNAL_VERSION, xml_files=self.xml_files, samples=self.samples, deletions=self.deletions)
+        tmp.write_text(json.dumps(data, indent=1))
+        fsync_file(tmp)
+        os.replace(tmp, self.journal_path)
+        fsync_dir(self.card_root)
+
+    def commit(self) -> None:
+        """Move the samples, swap in the new XML files, then delete the files to delete.
+
+        Steps already done (by an interrupted commit) are skipped, so this also resumes.
+        """
+        folders = set()
+        for old, new in self.samples:
+            folders.update([self._abs(old).parent, self._abs(new).parent])
+            if self._abs(new).exists() and not self._abs(old).exists():
+                continue  # already moved
+            os.replace(self._abs(old), self._abs(new))
+        for path, tmp, _ in self.xml_files:
+            folders.add(self._abs(path).parent)
+            if self._abs(tmp).exists():
+                os.replace(self._abs(tmp), self._abs(path))
+        for path, backup in self.deletions:
+            # set aside, removed by finish(); another name of a file already set aside is gone too
+            folders.add(self._abs(path).parent)
+            if self._abs(path).exists():
+                os.replace(self._abs(path), self._abs(backup))
+        for folder in folders:
+            fsync_dir(folder)
+        self.finish()
+
+    def rollback(self) -> None:
+        """Restore the original XML files and deleted files, and move the samples back."""
+        for path, tmp, backup in self.xml_files:
+            if self._abs(tmp).exists():
+                self._abs(tmp).unlink()
+            elif self._abs(backup).exists():
+                os.replace(self._abs(backup), self._abs(path))
+        for old, new in reversed(self.samples):
+            if self._abs(new).exists() and not self._abs(old).exists():
+                os.replace(self._abs(new), self._abs(old))
+        # in order, so a file set aside under its first name (as on a case-insensitive card) gets that name back
+        for path, backup in self.deletions:
+            if self._abs(backup).exists() and not self._abs(path).exists():
+                os.replace(self._abs(backup), self._abs(path))
+        self.finish()
+
+    def finish(self) -> None:
+        """Remove the backups (completing the deletions), temporary files and the journal."""
+        for _, tmp, backup in self.xml_files:
+            for leftover in (self._abs(tmp), self._abs(backup)):
+                if leftover.exists():
+                    leftover.unlink()
+        for _, backup in self.deletions:
+            if self._abs(backup).exists():
+                self._abs(backup).unlink()
+        if self.journal_path.exists():
+            self.journal_path.unlink()
+        fsync_dir(self.card_root)
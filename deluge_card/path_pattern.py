@@ -0,0 +1,155 @@
+"""Glob-style path patterns, compiled once to a regular expression.
+
+Patterns match like `PurePath.match()`: a relative pattern matches the end of a
+path, an absolute pattern the whole path, and each `*`, `?` or `[...]` stays within
+one path component. In addition `**` matches any number of whole components, and
+matching can ignore case, as the FAT32 cards used by the Deluge do.
+
+A `PathPattern` can hold several include and exclude patterns, a path matches if it
+matches any include pattern (or there are none) and no exclude pattern.
+"""
+
+import functools
+import os
+import re
+from pathlib import PurePath
+from typing import Optional, Pattern, Sequence, Tuple, Union
+
+from attrs import define, field
+
+
+def _translate_component(component: str) -> str:
+    """Translate one glob path component to a regular expression."""
+    i, n = 0, len(component)
+    res = []
+    while i < n:
+        c = component[i]
+        i += 1
+        if c == '*':
+            res.append('[^/]*')
+        elif c == '?':
+            res.append('[^/]')
+        elif c == '[':
+            j = i
+            if j < n and component[j] == '!':
+                j += 1
+            if j < n and component[j] == ']':
+                j += 1
+            while j < n and component[j] != ']':
+                j += 1
+            if j >= n:
+                res.append('\\[')
+            else:
+                chars = re.sub(r'([\\\[&~|])', r'\\\1', component[i:j])
+                i = j + 1
+                if chars[0] == '!':
+                    chars = '^/' + chars[1:]
+                elif chars[0] == '^':
+                    chars = '\\' + chars
+                res.append(f'[{chars}]')
+        else:
+            res.append(re.escape(c))
+    return ''.join(res)
+
+
+def translate(pattern: str) -> str:
+    """Translate a glob pattern to a regular expression, to search a posix path string.
+
+    Args:
+        pattern (str): glob-style path pattern.
+
+    Returns:
+        regex (str): the regular expression.
+
+    Raises:
+        ValueError: if the pattern is empty.
+    """
+    if not pattern:
+        raise ValueError('empty pattern')
+    pattern = pattern.replace(os.sep, '/')
+    anchored = pattern.startswith('/')
+    components = [c for c in pattern.split('/') if c and c != '.']
+    res = '^/' if anchored else '(?:^|/)'
+    for i, component in enumerate(components):
+        last = i == len(components) - 1
+        if component == '**':
+            res += '(?:[^/]*/)*' if not last else '.*'
+        else:
+            res += _translate_component(component) + ('' if last else '/')
+    return res + '$'
+
+
+def _patterns(patterns: Union[str, Sequence[str]]) -> Tuple[str, ...]:
+    return (patterns,) if isinstance(patterns, str) else tuple(patterns)
+
+
+@define(frozen=True)
+class PathPattern:
+    """Compiled include and exclude glob patterns.
+
+    Attributes:
+        include (Tuple[str, ...]): patterns a path must match one of, none to match any path.
+        exclude (Tuple[str, ...]): patterns a path must not match.
+        ignore_case (bool): match regardless of case.
+    """
+
+    include: Tuple[str, ...] = field(default=(), converter=_patterns)
+    exclude: Tuple[str, ...] = field(default=(), converter=_patterns)
+    ignore_case: bool = False
+    _include_re: Optional[Pattern] = field(init=False, repr=False, eq=False)
+    _exclude_re: Optional[Pattern] = field(init=False, repr=False, eq=False)
+
+    def __attrs_post_init__(self):
+        flags = re.IGNORECASE if self.ignore_case else 0
+        for name, patterns in (('_include_re', self.include), ('_exclude_re', self.exclude)):
+            patterns = [p for p in patterns if p]
+            regex = re.compile('|'.join(f'(?:{translate(p)})' for p in patterns), flags) if patterns else None
+            object.__setattr__(self, name, regex)
+
+    @property
+    def match_all(self) -> bool:
+        """True if every path matches."""
+        return self._include_re is None and self._exclude_re is None
+
+    def match(self, path: Union[str, PurePath]) -> bool:
+        """Does a path match.
+
+        Args:
+            path (str|PurePath): the path.
+
+        Returns:
+            match (bool): True if path matches an include pattern (or there are none) and no exclude pattern.
+        """
+        path = str(path)
+        if os.sep != '/':
+            path = path.replace(os.sep, '/')
+        if self._include_re is not None and not self._include_re.search(path):
+            return False
+        return self._exclude_re is None or not self._exclude_re.search(path)
+
+
+PatternArg = Union[str, Sequence[str], PathPattern, None]
+
+
+@functools.lru_cache(maxsize=256)
+def _compile_str(pattern: str) -> PathPattern:
+    return PathPattern(pattern)
+
+
+def compile_pattern(pattern: PatternArg) -> PathPattern:
+    """Compile a pattern argument, as taken by the listing and move methods.
+
+    Args:
+        pattern (str|Sequence[str]|PathPattern|None): a glob pattern, several (any of which may match),
+            or an already compiled pattern. An empty pattern matches every path.
+
+    Returns:
+        pattern (PathPattern): the compiled pattern.
+    """
+    if isinstance(pattern, PathPattern):
+        return pattern
+    if not pattern:
+        return _compile_str('')
+    if isinstance(pattern, str):
+        return _compile_str(pattern)
+    return PathPattern(pattern)
@@ -0,0 +1,344 @@
+"""Catalogue of the numeric parameters of every sound preset on a card.
+
+Sounds are collected from synth presets (SYNTHS), kit presets (KITS) and,
+optionally, the synth and kit instruments of songs. Each file is read in a single
+streaming pass (an lxml parser target, no tree is built).
+
+A parameter is named by its path below the sound element, the same whether the
+value is written as an element (older firmware) or an attribute, e.g.
+`defaultParams/lpfFrequency`, `osc1/transpose`, `unison/num`. Patch cables are named
+by their source and destination, e.g. `patchCables/velocity->volume`, and hold the
+cable amount.
+
+Values are kept as written; `decode_param()` decodes one, and
+`PresetCatalogue.to_numpy()` decodes the whole catalogue into a matrix at once
+(requires numpy), for similarity search and statistics.
+"""
+
+import re
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from attrs import define, field
+from lxml import etree
+
+from .deluge_xml import read_and_clean_xml
+from .path_pattern import PatternArg
+
+if False:
+    # for forward-reference type-checking:
+    # ref https://stackoverflow.com/a/38962160
+    from deluge_card import DelugeCardFS
+
+# kind of sound, by where it is defined
+SYNTH = 'synth'
+KIT = 'kit'
+SONG_SYNTH = 'song_synth'
+SONG_KIT = 'song_kit'
+
+# numeric sound attributes that are instrument settings, not sound parameters
+SKIP_PARAMS = frozenset(
+    ['presetSlot', 'presetSubSlot', 'defaultVelocity', 'isArmedForRecording', 'activeModFunction', 'colour']
+)
+
+# values decode_param() and decode_params() accept: ASCII decimal, or hex
+NUMBER = re.compile(r'-?[0-9]+|0[xX][0-9A-Fa-f]+')
+
+
+def decode_param(value: str) -> int:
+    """Decode a Deluge parameter value.
+
+    Hex values (`0x80000000`) are signed 32 bit integers, others are decimal.
+
+    Args:
+        value (str): the value as written in the XML.
+
+    Returns:
+        value (int): decoded value.
+    """
+    if value[:2] in ('0x', '0X'):
+        v = int(value, 16) & 0xFFFFFFFF
+        return v - 0x100000000 if v & 0x80000000 else v
+    return int(value)
+
+
+def _is_number(value: str) -> bool:
+    return NUMBER.fullmatch(value) is not None
+
+
+def decode_params(values: Sequence[str]):
+    """Decode many Deluge parameter values at once, requires numpy.
+
+    The values are joined into one ASCII buffer; the eight digit hex values, the form
+    the Deluge writes, are gathered from it with array indexing and decoded together
+    as big-endian int32. The other values are converted by numpy when all decimal.
+
+    Args:
+        values (Sequence[str]): values as written in the XML.
+
+    Returns:
+        values (numpy.ndarray): decoded values, as int64.
+    """
+    import numpy
+
+    count = len(values)
+    decoded = numpy.zeros(count, dtype=numpy.int64)
+    if not count:
+        return decoded
+    lengths = numpy.fromiter(map(len, values), dtype=numpy.int64, count=count)
+    buffer = numpy.frombuffer(''.join(values).encode('ascii'), dtype=numpy.uint8)
+    starts = numpy.cumsum(lengths) - lengths
+    fixed = lengths == 10
+    starts_fixed = starts[fixed]
+    fixed[fixed] = (buffer[starts_fixed] == ord('0')) & ((buffer[starts_fixed + 1] | 0x20) == ord('x'))
+    if fixed.any():
+        digits = buffer[starts[fixed][:, None] + numpy.arange(2, 10)]
+        decoded[fixed] = numpy.frombuffer(bytes.fromhex(digits.tobytes().decode('ascii')), dtype='>i4')
+    others = [values[i] for i in numpy.flatnonzero(~fixed).tolist()]
+    if others:
+        try:
+            decoded[~fixed] = numpy.array(others).astype(numpy.int64)  # all decimal
+        except ValueError:
+            decoded[~fixed] = [decode_param(v) for v in others]
+    return decoded
+
+
+class _SoundParamsTarget:
+    """lxml parser target (SAX-style) collecting the numeric parameters of each sound."""
+
+    def __init__(self, kind: str):
+        self.kind = kind  # of the file: SYNTH, KIT or 'song'
+        self.tags: List[str] = []
+        self.sounds: List[Tuple[str, Optional[str], Dict[str, str]]] = []
+        self.sound_depth = -1  # depth of the current sound element, -1 when outside a sound
+        self.sound_kind = ''
+        self.name: Optional[str] = None
+        self.params: Dict[str, str] = dict()
+        self.cables: List[Dict[str, str]] = []
+        self.text: List[str] = []
+
+    def _starts_sound(self, tag: str) -> bool:
+        if tag != 'sound' or self.sound_depth >= 0:
+            return False
+        if len(self.tags) == 1:
+            return self.kind == SYNTH
+        return self.tags[-2] in ('instruments', 'soundSources')
+
+    def _param(self, name: str, value: str):
+        if self.cables:
+            self.cables[-1][name.rsplit('/', 1)[-1]] = value
+        elif name == 'name':
+            self.name = value
+        elif name not in SKIP_PARAMS and _is_number(value):
+            self.params.setdefault(name, value)
+
+    def start(self, tag, attrib):
+        self.tags.append(tag)
+        self.text = []
+        if self._starts_sound(tag):
+            self.sound_depth = len(self.tags)
+            if self.kind != 'song':
+                self.sound_kind = self.kind
+            else:
+                self.sound_kind = SONG_KIT if 'kit' in self.tags else SONG_SYNTH
+            self.name = None
+            self.params = dict()
+        if self.sound_depth < 0:
+            return
+        if tag == 'patchCable':
+            self.cables.append(dict(attrib))
+            return
+        prefix = '/'.join(self.tags[self.sound_depth :])
+        for name, value in attrib.items():
+            self._param(f'{prefix}/{name}' if prefix else name, value)
+
+    def data(self, data):
+        self.text.append(data)
+
+    def end(self, tag):
+        depth = len(self.tags)
+        if self.sound_depth >= 0 and depth >= self.sound_depth:
+            text = ''.join(self.text).strip()
+            self.text = []
+            if tag == 'patchCable':
+                self._cable()
+            elif depth == self.sound_depth:
+                self.sounds.append((self.sound_kind, self.name, self.params))
+                self.sound_depth = -1
+            elif text:
+                self._param('/'.join(self.tags[self.sound_depth :]), text)
+        self.tags.pop()
+
+    def _cable(self):
+        key = '/'.join(f"{c.get('source')}->{c.get('destination')}" for c in self.cables)
+        amount = self.cables.pop().get('amount')  # nested cables control the depth of the enclosing one
+        if amount and _is_number(amount):
+            self.params.setdefault(f'patchCables/{key}', amount)
+
+    def close(self):
+        return self.sounds
+
+
+def read_sound_params(path: Path, kind: str) -> List[Tuple[str, Optional[str], Dict[str, str]]]:
+    """Read the numeric parameters of the sounds in a preset or song file, in one streaming pass.
+
+    Args:
+        path (Path): path of the XML file.
+        kind (str): SYNTH, KIT or 'song'.
+
+    Returns:
+        sounds (List[Tuple[str, Optional[str], Dict[str, str]]]): (sound kind, sound name, values by
+            parameter name) for each sound, in file order.
+    """
+    try:
+        return etree.parse(read_and_clean_xml(path), etree.XMLParser(target=_SoundParamsTarget(kind), recover=True))
+    except Exception as err:
+        print(f'parsing {path} raises.')
+        raise err
+
+
+@define
+class PresetCatalogue:
+    """Numeric parameters of many sounds, one row per sound.
+
+    Attributes:
+        paths (List[str]): file each sound is defined in.
+        kinds (List[str]): SYNTH, KIT, SONG_SYNTH or SONG_KIT.
+        names (List[str]): sound name; the file stem for synth presets, which have none.
+        params (List[Dict[str, str]]): parameter values, as written, by parameter name.
+    """
+
+    paths: List[str] = field(factory=list)
+    kinds: List[str] = field(factory=list)
+    names: List[str] = field(factory=list)
+    params: List[Dict[str, str]] = field(factory=list)
+
+    @staticmethod
+    def from_files(files: Iterable[Tuple[Path, str]], workers: int = 0) -> 'PresetCatalogue':
+        """Catalogue the sounds in some files.
+
+        Args:
+            files (Iterable[Tuple[Path, str]]): (path, kind) of each file, kind being SYNTH, KIT or 'song'.
+            workers (int): number of processes reading files concurrently, 0 or 1 to read serially. The
+                streaming reader runs Python callbacks per element, which threads would serialise.
+
+        Returns:
+            catalogue (PresetCatalogue): new instance.
+        """
+        files = list(files)
+        paths = [path for path, _ in files]
+        kinds = [kind for _, kind in files]
+
+        if workers <= 1 or len(files) < 2:
+            results: Iterable = map(read_sound_params, paths, kinds)
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                chunksize = max(1, len(files) // (workers * 4))
+                results = list(pool.map(read_sound_params, paths, kinds, chunksize=chunksize))
+
+        catalogue = PresetCatalogue()
+        for (path, _), sounds in zip(files, results):
+            for kind, name, params in sounds:
+                catalogue.paths.append(str(path))
+                catalogue.kinds.append(kind)
+                catalogue.names.append(name or path.stem)
+                catalogue.params.append(params)
+        return catalogue
+
+    @staticmethod
+    def from_card(
+        card: 'DelugeCardFS', pattern: PatternArg = '', songs: bool = True, workers: int = 0
+    ) -> 'PresetCatalogue':
+        """Catalogue the synth and kit presets on a card, and optionally the song instruments.
+
+        Args:
+            card (DelugeCardFS): the card.
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            songs (bool): include the sounds of song instruments.
+            workers (int): number of processes reading files concurrently, 0 or 1 to read serially.
+
+        Returns:
+            catalogue (PresetCatalogue): sounds of the synths, then the kits, then the songs.
+        """
+        files = [(synth.path, SYNTH) for synth in card.synths(pattern)]
+        files += [(kit.path, KIT) for kit in card.kits(pattern)]
+        if songs:
+            files += [(song.path, 'song') for song in card.songs(pattern)]
+        return PresetCatalogue.from_files(files, workers)
+
+    def __len__(self) -> int:
+        return len(self.params)
+
+    def columns(self) -> List[str]:
+        """Names of all the parameters in the catalogue.
+
+        Returns:
+            names (List[str]): sorted parameter names.
+        """
+        return sorted(set().union(*self.params))
+
+    def values(self, row: int) -> Dict[str, int]:
+        """Decoded parameters of a sound.
+
+        Args:
+            row (int): index of the sound.
+
+        Returns:
+            values (Dict[str, int]): value by parameter name.
+        """
+        return {name: decode_param(value) for name, value in self.params[row].items()}
+
+    def to_numpy(self, columns: Optional[Sequence[str]] = None) -> Tuple[Any, List[str]]:
+        """Decode the catalogue to a matrix, requires numpy.
+
+        All the values are decoded in one `decode_params()` call.
+
+        Args:
+            columns (Optional[Sequence[str]]): parameters to include, all by default.
+
+        Returns:
+            matrix (Tuple[numpy.ndarray, List[str]]): (sounds x parameters float64 matrix, with NaN where a
+                sound lacks a parameter; the parameter name of each column).
+        """
+        import numpy
+
+        columns = list(columns) if columns is not None else self.columns()
+        column_index = {name: i for i, name in enumerate(columns)}
+        rows: List[int] = []
+        cols: List[int] = []
+        values: List[str] = []
+        for row, params in enumerate(self.params):
+            for name, value in params.items():
+                col = column_index.get(name)
+                if col is not None:
+                    rows.append(row)
+                    cols.append(col)
+                    values.append(value)
+        matrix = numpy.full((len(self.params), len(columns)), numpy.nan)
+        matrix[rows, cols] = decode_params(values)
+        return matrix, columns
+
+    def nearest(self, row: int, k: int = 5, columns: Optional[Sequence[str]] = None) -> List[Tuple[int, float]]:
+        """Find the sounds most similar to a sound, requires numpy.
+
+        The distance between two sounds is the mean absolute difference of the parameters both
+        have, as a fraction of the int32 range.
+
+        Args:
+            row (int): index of the sound.
+            k (int): number of sounds to return.
+            columns (Optional[Sequence[str]]): parameters to compare, all by default.
+
+        Returns:
+            nearest (List[Tuple[int, float]]): (index, distance) of the nearest other sounds, nearest first.
+        """
+        import numpy
+
+        matrix, _ = self.to_numpy(columns)
+        diff = numpy.abs(matrix - matrix[row]) / 2.0**32
+        shared = (~numpy.isnan(diff)).sum(axis=1)
+        distance = numpy.where(shared > 0, numpy.nansum(diff, axis=1) / numpy.maximum(shared, 1), numpy.inf)
+        distance[row] = numpy.inf
+        order = numpy.argsort(distance, kind='stable')[:k]
+        return [(int(i), float(distance[i])) for i in order if numpy.isfinite(distance[i])]
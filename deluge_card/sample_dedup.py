@@ -0,0 +1,315 @@
+"""Find sample files with the same content, and merge them.
+
+Files are first bucketed by size, so only files sharing a size are read. Within a
+bucket the first chunk of each file is hashed, then the whole of the files whose
+first chunks match. Files are hashed through mmap in fixed-size chunks, in a thread
+pool (hashlib releases the GIL while hashing).
+
+Merging a group keeps one canonical copy, the one with the most references (then
+the shortest path), points every XML reference to the other copies at it with the
+same element updates `mv_samples` uses, then deletes the other copies. All the names
+of a file (hard links, or names in a different case on a case-insensitive card) are
+one candidate, with the references to any of its names. Given the card's sample
+index, references are gathered by case-folded path, so that references the candidate
+samples were filtered without (or to names missing on a case-sensitive copy) are
+rewritten too.
+"""
+
+import hashlib
+import itertools
+import mmap
+import os
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from attrs import define
+
+from .deluge_sample import (
+    XML_FILE_TAGS,
+    ModOp,
+    Sample,
+    SampleMoveOperation,
+    XmlStat,
+    check_xml_unchanged,
+    plan_xml_updates,
+    xml_stats,
+)
+from .mv_transaction import MoveTransaction
+from .sample_index import SampleIndex, normalise_sample_path
+
+if False:
+    # for forward-reference type-checking:
+    # ref https://stackoverflow.com/a/38962160
+    import deluge_xml
+
+CHUNK_SIZE = 1 << 20
+HEAD_SIZE = 1 << 16
+DEFAULT_WORKERS = 4
+
+
+def file_digest(path: Path, length: int = -1, chunk_size: int = CHUNK_SIZE) -> str:
+    """Hash a file, reading it through mmap in chunks.
+
+    Args:
+        path (Path): path of the file.
+        length (int): number of bytes to hash from the start of the file, -1 for all.
+        chunk_size (int): bytes hashed per update.
+
+    Returns:
+        digest (str): sha1 hex digest.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        length = size if length < 0 else min(length, size)
+        if not length:
+            return digest.hexdigest()
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            view = memoryview(mapped)
+            try:
+                for offset in range(0, length, chunk_size):
+                    digest.update(view[offset : min(offset + chunk_size, length)])
+            finally:
+                view.release()
+    return digest.hexdigest()
+
+
+def _refine(groups: List[List[Path]], length: int, workers: int) -> List[List[Path]]:
+    """Split groups of files by the digest of their first length bytes (all if -1)."""
+    paths = [path for group in groups for path in group]
+    if workers > 1 and len(paths) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            digests = dict(zip(paths, pool.map(lambda path: file_digest(path, length), paths)))
+    else:
+        digests = {path: file_digest(path, length) for path in paths}
+    refined: List[List[Path]] = []
+    for group in groups:
+        by_digest: Dict[str, List[Path]] = {}
+        for path in group:
+            by_digest.setdefault(digests[path], []).append(path)
+        refined.extend(g for g in by_digest.values() if len(g) > 1)
+    return refined
+
+
+def duplicate_files(paths: Iterable[Path], workers: int = DEFAULT_WORKERS) -> List[List[Path]]:
+    """Group files with the same content.
+
+    Args:
+        paths (Iterable[Path]): the files; missing and empty files are ignored, as are other names of an
+            already given file (hard links, or different case on a case-insensitive card).
+        workers (int): number of threads hashing files, 0 or 1 to hash serially.
+
+    Returns:
+        groups (List[List[Path]]): files with the same content, groups of two or more, in the given order.
+    """
+    by_size: Dict[int, List[Path]] = {}
+    seen = set()
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        if st.st_size and (st.st_dev, st.st_ino) not in seen:
+            seen.add((st.st_dev, st.st_ino))
+            by_size.setdefault(st.st_size, []).append(path)
+    small = [group for size, group in by_size.items() if len(group) > 1 and size <= HEAD_SIZE]
+    big = [group for size, group in by_size.items() if len(group) > 1 and size > HEAD_SIZE]
+    return _refine(small + _refine(big, HEAD_SIZE, workers), -1, workers)
+
+
+@define(frozen=True)
+class DedupPlan(object):
+    """A planned sample merge, see `plan_dedup_samples()`.
+
+    Attributes:
+        root (Path): root folder of the card.
+        groups (Tuple[Tuple[Path, Tuple[Path, ...]], ...]): (canonical copy, other copies) per group of identical
+            sample files.
+        removals (Tuple[SampleMoveOperation, ...]): per copy to delete, its path and the canonical path its
+            references move to.
+        xml_updates (Tuple[Tuple[DelugeXml, Tuple[Tuple[str, Path], ...]], ...]): (xml_path, new sample path)
+            pairs per affected XML file, songs then kits then synths.
+        bytes_reclaimed (int): total size of the copies to delete.
+        file_stats (Tuple[Tuple[Path, int, int], ...]): (path, size, mtime_ns) of each file in the groups when
+            planned, to check that none changed before the plan is applied.
+        xml_stats (Tuple[XmlStat, ...]): (XML file, size, mtime_ns, (xml_path, old sample path) pairs) of each
+            affected XML file when planned, likewise.
+    """
+
+    root: Path
+    groups: Tuple[Tuple[Path, Tuple[Path, ...]], ...]
+    removals: Tuple[SampleMoveOperation, ...]
+    xml_updates: Tuple[Tuple['deluge_xml.DelugeXml', Tuple[Tuple[str, Path], ...]], ...]
+    bytes_reclaimed: int = 0
+    file_stats: Tuple[Tuple[Path, int, int], ...] = ()
+    xml_stats: Tuple[XmlStat, ...] = ()
+
+    @property
+    def xml_files(self) -> List['deluge_xml.DelugeXml']:
+        """The XML files to update."""
+        return [xml for xml, _ in self.xml_updates]
+
+    @property
+    def element_count(self) -> int:
+        """Number of XML sample elements to update."""
+        return sum(len(updates) for _, updates in self.xml_updates)
+
+    def summary(self) -> str:
+        """A human readable summary of the plan.
+
+        Returns:
+            summary (str): the summary.
+        """
+        return (
+            f'merge {len(self.groups)} groups of identical samples, deleting {len(self.removals)} copies '
+            f'({self.bytes_reclaimed / 1e6:.1f}MB), updating {self.element_count} elements in '
+            f'{len(self.xml_updates)} XML files.'
+        )
+
+
+def plan_dedup_samples(
+    root: Path, samples: Iterable[Sample], workers: int = DEFAULT_WORKERS, index: Optional[SampleIndex] = None
+) -> DedupPlan:
+    """Plan merging identical sample files, without changing any XML tree or file.
+
+    Args:
+        root (Path): root folder of the card.
+        samples (Iterable[Sample]): candidate samples, with their settings.
+        workers (int): number of threads hashing files, 0 or 1 to hash serially.
+        index (SampleIndex): the card's sample index, to gather every reference to each name of the candidates;
+            without it only the settings of the given samples are rewritten.
+
+    Returns:
+        plan (DedupPlan): the planned merge.
+    """
+    # one candidate per file, with the references to all of its names
+    by_inode: Dict[Tuple[int, int], Sample] = {}
+    aliases: Dict[Path, List[Path]] = {}
+    stats: Dict[Path, os.stat_result] = {}
+    for sample in samples:
+        path = Path(root, sample.path) if not sample.path.is_absolute() else sample.path
+        try:
+            st = os.stat(path)
+        except OSError:
+            continue
+        candidate = by_inode.get((st.st_dev, st.st_ino))
+        if candidate is None:
+            by_inode[(st.st_dev, st.st_ino)] = Sample(path, list(sample.settings))
+            aliases[path] = []
+            stats[path] = st
+        elif path not in aliases and path not in aliases[candidate.path]:
+            candidate.settings.extend(sample.settings)
+            aliases[candidate.path].append(path)
+            stats[path] = st
+    by_path = {sample.path: sample for sample in by_inode.values()}
+    if index is not None:
+        for path, sample in by_path.items():
+            seen = set((st.xml_file, st.xml_path) for st in sample.settings)
+            for name in [path] + aliases[path]:
+                for setting in index.settings(normalise_sample_path(root, name)):
+                    if (setting.xml_file, setting.xml_path) not in seen:
+                        seen.add((setting.xml_file, setting.xml_path))
+                        sample.settings.append(setting)
+
+    groups = []
+    removals = []
+    reclaimed = 0
+    for group in duplicate_files(by_path, workers):
+        group.sort(key=lambda path: (-len(by_path[path].settings), len(str(path)), str(path)))
+        canonical, copies = group[0], group[1:]
+        groups.append((canonical, tuple(itertools.chain.from_iterable([copy] + aliases[copy] for copy in copies))))
+        for copy in copies:
+            removals.append(SampleMoveOperation(copy, canonical, by_path[copy]))
+            # the other names are removed too, their references are among the copy's settings
+            removals.extend(SampleMoveOperation(alias, canonical, Sample(alias)) for alias in aliases[copy])
+            reclaimed += stats[copy].st_size
+
+    xml_updates = plan_xml_updates(removals)
+    # songs, then kits, then synths
+    xml_files = [xml for tag in XML_FILE_TAGS.values() for xml in xml_updates if XML_FILE_TAGS[xml.root_elem] == tag]
+    return DedupPlan(
+        root,
+        tuple(groups),
+        tuple(removals),
+        tuple((xml, tuple(xml_updates[xml])) for xml in xml_files),
+        reclaimed,
+        tuple(
+            (path, stats[path].st_size, stats[path].st_mtime_ns)
+            for canonical, copies in groups
+            for path in (canonical,) + copies
+        ),
+        xml_stats(removals, xml_files),
+    )
+
+
+def _check_unchanged(plan: DedupPlan) -> None:
+    """Raise ValueError if a sample file of the plan changed since it was made."""
+    for path, size, mtime_ns in plan.file_stats:
+        try:
+            st = os.stat(path)
+        except OSError:
+            raise ValueError(f'sample missing since planned: {path}')
+        if st.st_size != size or st.st_mtime_ns != mtime_ns:
+            raise ValueError(f'sample changed since planned: {path}')
+
+
+def apply_dedup_plan(plan: DedupPlan, transactional: bool = False) -> Iterator[ModOp]:
+    """Apply a planned sample merge: update and write the affected XML files, then delete the copies.
+
+    The copies are deleted only once every XML file is written, so an interruption leaves
+    at worst unused copies behind. With transactional=True the XML updates and the
+    deletions are one journalled transaction, see `mv_transaction`: an interrupted merge
+    is resumed or rolled back, copies included, with `DelugeCardFS.pending_move()`.
+
+    Args:
+        plan (DedupPlan): the plan, from `plan_dedup_samples()`.
+        transactional (bool): journal the XML updates and deletions so they can be rolled back or resumed.
+
+    Yields:
+        object (ModOp): Details of the operation.
+
+    Raises:
+        ValueError: if a sample or XML file changed since the plan was made, or transactional and the move
+            is refused (see `MoveTransaction.check()`); the card is not changed. The XML files are read from
+            the card again to check them, replacing any loaded trees, and those trees are updated.
+    """
+    _check_unchanged(plan)
+    check_xml_unchanged(plan.xml_stats)
+    xml_files = plan.xml_files
+    if transactional:
+        MoveTransaction.check(plan.root, [])  # refuse before any tree is changed
+    try:
+        for xml, updates in plan.xml_updates:
+            xml.update_sample_elements(list(updates))
+        if transactional:
+            transaction = MoveTransaction.prepare(
+                plan.root, xml_files, [], [removal.old_path for removal in plan.removals]
+            )
+            try:
+                transaction.commit()
+            except Exception:
+                transaction.rollback()
+                raise
+    except Exception:
+        for xml in xml_files:
+            xml.release()  # the card is unchanged, drop the updated trees (they are parsed again on next use)
+        raise
+
+    if transactional:
+        for xml in xml_files:
+            yield ModOp(f"update_{XML_FILE_TAGS[xml.root_elem]}_xml", str(xml.path), xml)
+        for removal in plan.removals:
+            yield ModOp("delete_file", str(removal.old_path), removal)
+        return
+
+    for xml in xml_files:
+        xml.write_xml()
+        yield ModOp(f"update_{XML_FILE_TAGS[xml.root_elem]}_xml", str(xml.path), xml)
+
+    for removal in plan.removals:
+        try:
+            removal.old_path.unlink()
+        except FileNotFoundError:  # another name of a file already removed, on a case-insensitive card
+            pass
+        yield ModOp("delete_file", str(removal.old_path), removal)
@@ -0,0 +1,174 @@
+"""Reverse index of sample references: sample path => settings in songs, kits and synths."""
+
+import itertools
+import os
+import time
+from pathlib import Path
+from typing import Dict, Iterator, List, Tuple, Union
+
+from attrs import define, field
+
+from .card_index import _is_current
+from .deluge_sample import SampleSetting
+from .deluge_xml import DelugeXml
+
+if False:
+    # for forward-reference type-checking:
+    # ref https://stackoverflow.com/a/38962160
+    from deluge_card import DelugeCardFS
+
+
+def normalise_sample_path(card_root: Path, path: Union[str, Path]) -> str:
+    """Normalise a sample path for lookups.
+
+    Paths are made relative to the card root (when inside it), use posix separators
+    and are case-folded, as the FAT32 cards used by the Deluge are case-insensitive.
+
+    Args:
+        card_root (Path): root folder of the card.
+        path (str|Path): absolute or card-relative sample path.
+
+    Returns:
+        key (str): normalised path.
+    """
+    path = Path(path)
+    try:
+        path = path.relative_to(card_root)
+    except ValueError:
+        pass
+    return path.as_posix().casefold()
+
+
+@define
+class SampleIndex:
+    """Reverse index from sample paths to the settings that reference them.
+
+    Attributes:
+        card_root (Path): root folder of the card.
+    """
+
+    card_root: Path
+    _settings: Dict[str, List[SampleSetting]] = field(factory=dict, repr=False)
+    _xml_keys: Dict[Path, List[str]] = field(factory=dict, repr=False)
+    _xml_stats: Dict[Path, Tuple[int, int, int]] = field(factory=dict, repr=False)
+
+    @staticmethod
+    def from_card(card: 'DelugeCardFS') -> 'SampleIndex':
+        """Build the index for every song, kit and synth on a card.
+
+        Args:
+            card (DelugeCardFS): the card.
+
+        Returns:
+            index (SampleIndex): new instance.
+        """
+        index = SampleIndex(card.card_root)
+        for xml in itertools.chain(card.synths(), card.songs(), card.kits()):
+            index.add_xml(xml)
+        return index
+
+    def refresh(self, card: 'DelugeCardFS') -> int:
+        """Bring the index up to date with a card, reading only the XML files changed since they were indexed.
+
+        Files are compared by modification time and size as in the card index, see `card_index`.
+
+        Args:
+            card (DelugeCardFS): the card.
+
+        Returns:
+            count (int): number of XML files read.
+        """
+        xml_files = list(itertools.chain(card.synths(), card.songs(), card.kits()))
+        paths = set(Path(xml.path) for xml in xml_files)
+        for xml_path in [xml_path for xml_path in self._xml_keys if xml_path not in paths]:
+            self.remove_xml(xml_path)
+        count = 0
+        for xml in xml_files:
+            row = self._xml_stats.get(Path(xml.path))
+            if row is None or not _is_current(row, os.stat(xml.path)):
+                self.update_xml(xml)
+                count += 1
+        return count
+
+    def add_xml(self, xml: DelugeXml) -> None:
+        """Add the sample settings of an XML file.
+
+        Args:
+            xml (DelugeXml): song, kit or synth.
+        """
+        st = os.stat(xml.path)
+        indexed_ns = time.time_ns()
+        keys = []
+        for sample in xml.samples(allow_missing=True):
+            key = normalise_sample_path(self.card_root, sample.path)
+            self._settings.setdefault(key, []).extend(sample.settings)
+            keys.append(key)
+        # one file may reference a sample under paths differing in case only
+        self._xml_keys[Path(xml.path)] = list(dict.fromkeys(keys))
+        self._xml_stats[Path(xml.path)] = (st.st_mtime_ns, st.st_size, indexed_ns)
+
+    def remove_xml(self, xml_path: Path) -> None:
+        """Remove the sample settings of an XML file.
+
+        Args:
+            xml_path (Path): path of the song, kit or synth.
+        """
+        self._xml_stats.pop(Path(xml_path), None)
+        for key in self._xml_keys.pop(Path(xml_path), []):
+            settings = [st for st in self._settings[key] if Path(st.xml_file.path) != Path(xml_path)]
+            if settings:
+                self._settings[key] = settings
+            else:
+                del self._settings[key]
+
+    def update_xml(self, xml: DelugeXml) -> None:
+        """Replace the sample settings of an XML file, e.g. after it changed.
+
+        Args:
+            xml (DelugeXml): song, kit or synth.
+        """
+        self.remove_xml(xml.path)
+        self.add_xml(xml)
+
+    def settings(self, path: Union[str, Path]) -> List[SampleSetting]:
+        """Get the settings referencing a sample.
+
+        Args:
+            path (str|Path): absolute or card-relative sample path.
+
+        Returns:
+            settings (List[SampleSetting]): the settings, empty if the sample is unused.
+        """
+        return list(self._settings.get(normalise_sample_path(self.card_root, path), []))
+
+    def xml_files(self, path: Union[str, Path]) -> List[DelugeXml]:
+        """Get the songs, kits and synths referencing a sample.
+
+        Args:
+            path (str|Path): absolute or card-relative sample path.
+
+        Returns:
+            xml_files (List[DelugeXml]): unique XML files, in index order.
+        """
+        return list(dict.fromkeys(st.xml_file for st in self.settings(path)))
+
+    def is_used(self, path: Union[str, Path]) -> bool:
+        """Is the sample referenced by any song, kit or synth.
+
+        Args:
+            path (str|Path): absolute or card-relative sample path.
+
+        Returns:
+            used (bool): True if referenced.
+        """
+        return normalise_sample_path(self.card_root, path) in self._settings
+
+    def paths(self) -> Iterator[str]:
+        """Iterate the normalised paths of all referenced samples."""
+        return iter(self._settings)
+
+    def __len__(self) -> int:
+        return len(self._settings)
+
+    def __contains__(self, path) -> bool:
+        return self.is_used(path)
@@ -0,0 +1,227 @@
+"""Sample file metadata (sample rate, channels, bit depth, length), read from the file headers.
+
+Only the RIFF (WAV) or AIFF chunk headers are read: a few hundred bytes per file,
+whatever the length of the audio. Chunks are walked with seeks, from the file
+header to the format chunk (`fmt ` or `COMM`) and the start of the audio data
+(`data`), skipping any chunk in between (e.g. `JUNK`, `LIST`).
+
+The metadata is kept in the card index when it is enabled, so only new or changed
+files are read again. MP3 and OGG samples are not supported, their metadata is None.
+"""
+
+import os
+import struct
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from attrs import define
+
+from .helpers import sample_path
+
+if False:
+    # for forward-reference type-checking:
+    # ref https://stackoverflow.com/a/38962160
+    from deluge_card import DelugeCardFS
+
+    from .card_index import CardIndex
+    from .deluge_xml import DelugeXml
+
+WAV = 'wav'
+AIFF = 'aiff'
+
+MAX_CHUNKS = 64  # chunks walked looking for the format and data chunks
+
+# WAV format tags whose frames are block_align bytes each
+_PCM_FORMATS = (1, 3, 0xFFFE)  # PCM, IEEE float, extensible
+_NO_SIZE = 0xFFFFFFFF  # chunk size of RF64 files, the real size is in the ds64 chunk
+
+
+@define(frozen=True)
+class SampleInfo:
+    """Format and length of a sample file.
+
+    Attributes:
+        format (str): WAV or AIFF.
+        sample_rate (int): frames per second.
+        channels (int): number of channels.
+        bits_per_sample (int): bits per sample of one channel.
+        frame_count (int): number of sample frames.
+    """
+
+    format: str
+    sample_rate: int
+    channels: int
+    bits_per_sample: int
+    frame_count: int
+
+    @property
+    def duration(self) -> float:
+        """Length in seconds."""
+        return self.frame_count / self.sample_rate if self.sample_rate else 0.0
+
+
+def _chunks(f: BinaryIO, byteorder: str, end: int) -> Iterator[Tuple[bytes, int, int]]:
+    """Walk the chunks from the current file position, yielding (chunk id, offset of its data, size)."""
+    offset = f.tell()
+    for _ in range(MAX_CHUNKS):
+        if offset + 8 > end:
+            return
+        f.seek(offset)
+        chunk_id, size = struct.unpack(byteorder + '4sI', f.read(8))
+        yield chunk_id, offset + 8, size
+        offset += 8 + size + (size & 1)  # chunks are padded to an even size
+
+
+def _read_wav(f: BinaryIO, file_size: int) -> Optional[SampleInfo]:
+    fmt = None
+    fact_frames = None
+    data_size64 = None
+    for chunk_id, offset, size in _chunks(f, '<', file_size):
+        if chunk_id == b'ds64' and size >= 16:
+            f.seek(offset)
+            _, data_size64 = struct.unpack('<QQ', f.read(16))
+        elif chunk_id == b'fmt ' and size >= 16:
+            f.seek(offset)
+            fmt = struct.unpack('<HHIIHH', f.read(16))
+        elif chunk_id == b'fact' and size >= 4:
+            f.seek(offset)
+            (fact_frames,) = struct.unpack('<I', f.read(4))
+        elif chunk_id == b'data':
+            if size == _NO_SIZE and data_size64 is not None:
+                size = data_size64
+            # the size may be a placeholder, or the file truncated
+            size = min(size, file_size - offset)
+            break
+    else:
+        return None
+    if fmt is None:
+        return None
+    format_tag, channels, sample_rate, _, block_align, bits_per_sample = fmt
+    if format_tag in _PCM_FORMATS and block_align:
+        frames = size // block_align
+    elif fact_frames is not None:
+        frames = fact_frames
+    else:
+        return None
+    return SampleInfo(WAV, sample_rate, channels, bits_per_sample, frames)
+
+
+def _extended(exponent: int, mantissa: int) -> float:
+    """Decode an 80 bit IEEE 754 extended float, as AIFF sample rates are written."""
+    if not exponent & 0x7FFF and not mantissa:
+        return 0.0
+    value = mantissa * 2.0 ** ((exponent & 0x7FFF) - 16383 - 63)
+    return -value if exponent & 0x8000 else value
+
+
+def _read_aiff(f: BinaryIO, file_size: int) -> Optional[SampleInfo]:
+    for chunk_id, offset, size in _chunks(f, '>', file_size):
+        if chunk_id == b'COMM' and size >= 18:
+            f.seek(offset)
+            channels, frames, bits_per_sample, exponent, mantissa = struct.unpack('>hIhHQ', f.read(18))
+            return SampleInfo(AIFF, round(_extended(exponent, mantissa)), channels, bits_per_sample, frames)
+    return None
+
+
+def read_sample_info(path: Path) -> Optional[SampleInfo]:
+    """Read the format and length of a sample file from its headers.
+
+    Args:
+        path (Path): path of the sample file.
+
+    Returns:
+        info (Optional[SampleInfo]): the metadata, or None if the file is not a WAV or AIFF file, or its
+            headers are incomplete.
+
+    Raises:
+        OSError: if the file cannot be read.
+    """
+    with open(path, 'rb') as f:
+        header = f.read(12)
+        file_size = os.fstat(f.fileno()).st_size
+        try:
+            if header[:4] in (b'RIFF', b'RF64') and header[8:12] == b'WAVE':
+                return _read_wav(f, file_size)
+            if header[:4] == b'FORM' and header[8:12] in (b'AIFF', b'AIFC'):
+                return _read_aiff(f, file_size)
+        except struct.error:  # truncated headers
+            pass
+    return None
+
+
+def _try_read_sample_info(path: Path) -> Tuple[bool, Optional[SampleInfo]]:
+    try:
+        return True, read_sample_info(path)
+    except OSError:
+        return False, None  # not kept in the index, the file may be readable next time
+
+
+def sample_infos(
+    paths: Iterable[Path], index: Optional['CardIndex'] = None, workers: int = 0
+) -> Dict[Path, Optional[SampleInfo]]:
+    """Get the metadata of many sample files.
+
+    Args:
+        paths (Iterable[Path]): paths of the sample files.
+        index (Optional[CardIndex]): card index keeping the metadata of unchanged files.
+        workers (int): number of threads reading headers concurrently, 0 or 1 to read serially.
+
+    Returns:
+        infos (Dict[Path, Optional[SampleInfo]]): metadata by path, None for missing or unsupported files.
+    """
+    infos: Dict[Path, Optional[SampleInfo]] = dict()
+    found: List[Tuple[Path, os.stat_result]] = []
+    for path in paths:
+        if path in infos:
+            continue
+        infos[path] = None
+        try:
+            found.append((path, os.stat(path)))
+        except OSError:
+            pass
+
+    pending: List[Tuple[Path, os.stat_result]] = []
+    for (path, st), (current, info) in zip(
+        found, index.lookup_sample_infos(found) if index else [(False, None)] * len(found)
+    ):
+        infos[path] = info
+        if not current:
+            pending.append((path, st))
+
+    if workers > 1 and len(pending) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_try_read_sample_info, [path for path, _ in pending]))
+    else:
+        results = [_try_read_sample_info(path) for path, _ in pending]
+
+    for (path, _), (_, info) in zip(pending, results):
+        infos[path] = info
+    if index:
+        index.store_sample_infos((path, info, st) for (path, st), (read, info) in zip(pending, results) if read)
+    return infos
+
+
+def sample_durations(card: 'DelugeCardFS', xml_files: Iterable['DelugeXml'], workers: int = 0) -> Dict[Path, float]:
+    """Total length of the samples used by each of some songs, kits or synths.
+
+    A sample used more than once in a file is counted once; missing and unsupported
+    samples count as 0.
+
+    Args:
+        card (DelugeCardFS): the card.
+        xml_files (Iterable[DelugeXml]): the songs, kits or synths.
+        workers (int): number of threads reading headers concurrently, 0 or 1 to read serially.
+
+    Returns:
+        durations (Dict[Path, float]): seconds by XML file path, in the given order.
+    """
+    used = {
+        xml.path: set(sample_path(card.card_root, sample_file) for sample_file, _ in xml.sample_refs())
+        for xml in xml_files
+    }
+    infos = sample_infos(sorted(set().union(*used.values())), card.index(), workers)
+    return {
+        path: sum((infos[sample].duration for sample in samples if infos[sample]), 0.0)  # type: ignore
+        for path, samples in used.items()
+    }
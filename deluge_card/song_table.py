@@ -0,0 +1,234 @@
+"""Bulk song metadata, as a columnar table.
+
+Each song is read in a single streaming pass (an lxml parser target, no tree is
+built), collecting the song attributes, mode notes, instruments and sample
+references. The table is held as a list per column, and can be exported to numpy
+arrays or a pandas DataFrame when those packages are installed.
+"""
+
+import collections
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from attrs import define, field
+from lxml import etree
+
+from .deluge_song import SCALE, convert_tempo, mode_name
+from .deluge_xml import read_and_clean_xml
+from .path_pattern import PatternArg
+
+if False:
+    # for forward-reference type-checking:
+    # ref https://stackoverflow.com/a/38962160
+    from deluge_card import DelugeCardFS
+
+COLUMNS = [
+    'path',
+    'tempo',
+    'root_note',
+    'key',
+    'scale_mode',
+    'scale',
+    'firmware',
+    'minimum_firmware',
+    'synths',
+    'kits',
+    'midi_channels',
+    'cv_channels',
+    'audio_tracks',
+    'sample_refs',
+    'samples',
+]
+
+# numpy dtypes of the numeric columns, the others are object arrays.
+NUMERIC_COLUMNS = dict(
+    tempo='float64',
+    root_note='int64',
+    synths='int64',
+    kits='int64',
+    midi_channels='int64',
+    cv_channels='int64',
+    audio_tracks='int64',
+    sample_refs='int64',
+    samples='int64',
+)
+
+# tag of a child of <instruments> => column
+INSTRUMENT_COLUMNS = dict(
+    sound='synths', kit='kits', midiChannel='midi_channels', cvChannel='cv_channels', audioTrack='audio_tracks'
+)
+
+
+class _SongMetadataTarget:
+    """lxml parser target (SAX-style) collecting song metadata, without building a tree."""
+
+    def __init__(self):
+        self.tags: List[str] = []
+        self.attrib: Dict[str, str] = dict()
+        self.mode_notes: List[int] = []
+        self.instruments: Dict[str, int] = collections.Counter()
+        self.sample_refs = 0
+        self.sample_files: set = set()
+        self.text: Optional[List[str]] = None
+
+    def start(self, tag, attrib):
+        self.tags.append(tag)
+        depth = len(self.tags)
+        if depth == 1:
+            self.attrib = dict(attrib)
+        elif depth == 3 and self.tags[1] == 'instruments':
+            self.instruments[tag] += 1
+        if tag in ('modeNote', 'fileName'):
+            self.text = []
+        elif depth > 1 and attrib.get('fileName'):
+            self._sample(attrib.get('fileName'))
+
+    def data(self, data):
+        if self.text is not None:
+            self.text.append(data)
+
+    def end(self, tag):
+        if self.text is not None:
+            text = ''.join(self.text)
+            self.text = None
+            if tag == 'modeNote' and len(self.tags) > 1 and self.tags[-2] == 'modeNotes':
+                self.mode_notes.append(int(text))
+            elif tag == 'fileName' and len(self.tags) > 1 and text:
+                self._sample(text)
+        self.tags.pop()
+
+    def _sample(self, sample_file: str):
+        self.sample_refs += 1
+        self.sample_files.add(sample_file)
+
+    def close(self):
+        return self
+
+
+def read_song_metadata(song_path: Path) -> Dict[str, Any]:
+    """Read the metadata of a song in one streaming pass.
+
+    Args:
+        song_path (Path): path of the song XML file.
+
+    Returns:
+        row (Dict[str, Any]): value per column, see `COLUMNS`; None where the song lacks an attribute.
+    """
+    try:
+        target = etree.parse(read_and_clean_xml(song_path), etree.XMLParser(target=_SongMetadataTarget(), recover=True))
+    except Exception as err:
+        print(f'parsing {song_path} raises.')
+        raise err
+    attrib = target.attrib
+
+    tempo = None
+    if attrib.get('timePerTimerTick') and attrib.get('timerTickFraction'):
+        tempo = convert_tempo(attrib['timePerTimerTick'], attrib['timerTickFraction'])
+    root_note = int(attrib['rootNote']) if attrib.get('rootNote') else None
+    key = SCALE[root_note % 12] if root_note is not None else None
+    scale_mode = mode_name(target.mode_notes)
+
+    row: Dict[str, Any] = dict(
+        path=str(song_path),
+        tempo=tempo,
+        root_note=root_note,
+        key=key,
+        scale_mode=scale_mode,
+        scale=f'{key} {scale_mode}' if key else None,
+        firmware=attrib.get('firmwareVersion'),
+        minimum_firmware=attrib.get('earliestCompatibleFirmware'),
+        sample_refs=target.sample_refs,
+        samples=len(target.sample_files),
+    )
+    for tag, column in INSTRUMENT_COLUMNS.items():
+        row[column] = target.instruments[tag]
+    return row
+
+
+@define
+class SongTable:
+    """Song metadata, one list per column.
+
+    Attributes:
+        columns (Dict[str, List]): values per column name, see `COLUMNS`.
+    """
+
+    columns: Dict[str, List[Any]] = field(factory=lambda: {name: [] for name in COLUMNS})
+
+    @staticmethod
+    def from_rows(rows: Iterable[Dict[str, Any]]) -> 'SongTable':
+        """New table from rows, as from `read_song_metadata()`.
+
+        Args:
+            rows (Iterable[Dict[str, Any]]): the rows.
+
+        Returns:
+            table (SongTable): new instance.
+        """
+        table = SongTable()
+        for row in rows:
+            for name, values in table.columns.items():
+                values.append(row[name])
+        return table
+
+    @staticmethod
+    def from_card(card: 'DelugeCardFS', pattern: PatternArg = '', workers: int = 0) -> 'SongTable':
+        """Read the metadata of every song on a card.
+
+        Args:
+            card (DelugeCardFS): the card.
+            pattern (str|PathPattern): glob-style filename pattern, see `path_pattern`.
+            workers (int): number of processes reading songs concurrently, 0 or 1 to read serially. The
+                streaming reader runs Python callbacks per element, which threads would serialise.
+
+        Returns:
+            table (SongTable): one row per song, in `songs()` order.
+        """
+        paths = [song.path for song in card.songs(pattern)]
+        if workers <= 1 or len(paths) < 2:
+            return SongTable.from_rows(map(read_song_metadata, paths))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunksize = max(1, len(paths) // (workers * 4))
+            return SongTable.from_rows(pool.map(read_song_metadata, paths, chunksize=chunksize))
+
+    def __len__(self) -> int:
+        return len(self.columns['path'])
+
+    def rows(self) -> Iterator[Dict[str, Any]]:
+        """Iterate the rows.
+
+        Yields:
+            row (Dict[str, Any]): value per column.
+        """
+        for values in zip(*self.columns.values()):
+            yield dict(zip(self.columns.keys(), values))
+
+    def to_numpy(self) -> Dict[str, Any]:
+        """Export the columns as numpy arrays, requires numpy.
+
+        Numeric columns with missing values become float arrays, with NaN where missing.
+
+        Returns:
+            arrays (Dict[str, numpy.ndarray]): array per column.
+        """
+        import numpy
+
+        arrays = dict()
+        for name, values in self.columns.items():
+            dtype = NUMERIC_COLUMNS.get(name, object)
+            if dtype != object and None in values:
+                dtype = 'float64'
+                values = [numpy.nan if v is None else v for v in values]
+            arrays[name] = numpy.array(values, dtype=dtype)
+        return arrays
+
+    def to_pandas(self):
+        """Export the table as a pandas DataFrame, requires pandas.
+
+        Returns:
+            frame (pandas.DataFrame): one row per song.
+        """
+        import pandas
+
+        return pandas.DataFrame(self.to_numpy())
@@ -0,0 +1,69 @@
+"""List the synth and kit presets, or the samples, that duplicate one another."""
+
+import argparse
+
+from deluge_card import list_deluge_fs
+
+
+def report_presets(card, args):
+    """Print the duplicate presets on a card."""
+    report = card.duplicate_presets(args.pattern, args.near, args.workers, use_processes=True)
+    if not args.summary:
+        for group in report.groups:
+            print(f"{'exact' if group.exact else 'near'}: keep {group.keep}")
+            for path, size in zip(group.redundant, group.sizes[1:]):
+                print(f"{size:12d} {path}")
+    print(f'{card.card_root}: {report.summary()}')
+
+
+def dedup_samples(card, args):
+    """Print the identical samples on a card, merging them if asked to."""
+    plan = card.plan_dedup_samples(args.pattern, args.workers)
+    if not args.summary:
+        for canonical, copies in plan.groups:
+            print(f"keep {canonical}")
+            for path in copies:
+                print(f"{path.stat().st_size:12d} {path}")
+    print(f'{card.card_root}: {plan.summary()}')
+    if args.merge:
+        for modop in card.apply_dedup_plan(plan, transactional=True):
+            print(f"{modop.operation}: {modop.path}")
+
+
+def main():
+    """Main entrypoint."""
+    parser = argparse.ArgumentParser(description='ddupes.py - report duplicate presets or samples and their sizes.')
+
+    parser.add_argument('root', help='root folder, must be a valid Deluge file system.')
+    parser.add_argument('pattern', nargs='?', default='', help='glob pattern to match e.g. SYNTHS/*.XML')
+    parser.add_argument(
+        "-n",
+        "--near",
+        type=float,
+        metavar='TOLERANCE',
+        help="also group near duplicates e.g. 0.01 (1%% steps), needs numpy",
+    )
+    parser.add_argument("-S", "--samples", help="find identical samples rather than presets", action="store_true")
+    parser.add_argument(
+        "-m",
+        "--merge",
+        help="with --samples, merge identical samples and delete the copies, as one journalled transaction "
+        "(resume or roll back an interrupted merge with dmv.py --resume or --rollback)",
+        action="store_true",
+    )
+    parser.add_argument("-w", "--workers", type=int, default=0, help="read files in WORKERS workers")
+    parser.add_argument("-s", "--summary", help="summarise output", action="store_true")
+
+    args = parser.parse_args()
+    if args.merge and not args.samples:
+        parser.error('--merge needs --samples')
+
+    for card in list_deluge_fs(args.root):
+        if args.samples:
+            dedup_samples(card, args)
+        else:
+            report_presets(card, args)
+
+
+if __name__ == '__main__':
+    main()  # pragma: no cover
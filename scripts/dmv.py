@@ -3,8 +3,10 @@
 import argparse
 from pathlib import Path
 
-from deluge_card import list_deluge_fs
+from deluge_card import DelugeCardFS, list_deluge_fs
 from deluge_card.deluge_sample import validate_mv_dest
+from deluge_card.fleet import fleet_mv_samples, run_fleet
+from deluge_card.path_pattern import PathPattern
 
 
 def main():
@@ -12,33 +14,75 @@ def main():
     parser = argparse.ArgumentParser(description='dmv.py (dmv) - move FS contents')
 
     parser.add_argument('root', help='root folder, must be a valid Deluge file system.')
-    parser.add_argument('pattern', help='glob pattern to match e.g. **/Clap*.wav')
-    parser.add_argument('dest', help='target folder or file, which must be in a subfolder of root.')
+    parser.add_argument('pattern', nargs='?', help='glob pattern to match e.g. **/Clap*.wav')
+    parser.add_argument('dest', nargs='?', help='target folder or file, which must be in a subfolder of root.')
 
     parser.add_argument("-v", "--verbose", help="increase output verbosity", action="store_true")
     parser.add_argument("-s", "--summary", help="summarise output", action="store_true")
     parser.add_argument('-D', '--debug', action="store_true", help="print debug statements")
+    parser.add_argument("-i", "--index", help="use the card index to skip unchanged XML", action="store_true")
+    parser.add_argument("-t", "--transactional", help="journal the move, so it can be undone", action="store_true")
+    parser.add_argument("--resume", help="complete an interrupted transactional move", action="store_true")
+    parser.add_argument("--rollback", help="undo an interrupted transactional move", action="store_true")
+    parser.add_argument("-x", "--exclude", action="append", default=[], help="glob pattern of samples not to move")
+    parser.add_argument("-I", "--ignore-case", help="match patterns regardless of case", action="store_true")
+    parser.add_argument("-n", "--dry-run", help="show what would be moved, changing nothing", action="store_true")
+    parser.add_argument(
+        "-a", "--all", help="move on every card found, dest is relative to each card", action="store_true"
+    )
+    parser.add_argument("--depth", type=int, default=1, help="folder levels searched for cards (default 1)")
+    parser.add_argument("-w", "--workers", type=int, default=4, help="cards handled concurrently with --all")
 
     args = parser.parse_args()
-    card_imgs = list(list_deluge_fs(args.root))
+    pattern = PathPattern(args.pattern or (), args.exclude, ignore_case=args.ignore_case)
+    card_imgs = list(list_deluge_fs(args.root, depth=args.depth))
 
     if len(card_imgs) == 0:
         print('No card found.')
         return
-    if len(card_imgs) > 1:
-        print("multiple cards found, only single card mv is supported.")
+    if len(card_imgs) > 1 and not args.all:
+        print("multiple cards found, use --all to move on every card.")
         return
+    if args.all:
+        cards = [DelugeCardFS.from_folder(c.card_root, use_index=args.index) for c in card_imgs]
+        fleet_main(parser, args, pattern, sorted(cards, key=lambda card: card.card_root))
+        return
+
+    card = DelugeCardFS.from_folder(card_imgs[0].card_root, use_index=args.index)
+    pending = card.pending_move()
+    if args.resume or args.rollback:
+        if not pending:
+            print('No interrupted move found.')
+        elif args.resume:
+            pending.commit()
+            print(f'resumed move of {len(pending.samples)} samples, {len(pending.xml_files)} XML files.')
+        else:
+            pending.rollback()
+            print(f'rolled back move of {len(pending.samples)} samples, {len(pending.xml_files)} XML files.')
+        return
+    if pending:
+        print('An interrupted move was found, use --resume or --rollback first.')
+        return
+    if not (args.pattern and args.dest):
+        parser.error('pattern and dest are required')
 
-    card = card_imgs[0]
     try:
         validate_mv_dest(card.card_root, Path(args.dest))
         new_path = Path(args.dest)
+        plan = card.plan_mv_samples(pattern, new_path)
     except ValueError as err:
         print(err)
         return
 
+    if args.dry_run:
+        if args.verbose:
+            for move_op in plan.move_ops:
+                print(f"{move_op.old_path} -> {move_op.new_path}")
+        print(plan.summary())
+        return
+
     count = dict(move_file=0, update_song_xml=0, update_kit_xml=0, update_synth_xml=0)
-    for modop in card.mv_samples(args.pattern, new_path):
+    for modop in card.apply_mv_plan(plan, args.transactional):
         if args.debug:
             print(f'modop: {modop}')
         count[modop.operation] += 1
@@ -53,5 +97,31 @@ def main():
         )
 
 
+def fleet_main(parser, args, pattern, cards):
+    """Move, resume or roll back on many cards, printing the aggregated report."""
+    if args.resume or args.rollback:
+
+        def finish_move(card):
+            pending = card.pending_move()
+            if pending and args.resume:
+                pending.commit()
+            elif pending:
+                pending.rollback()
+            return dict(interrupted_moves=1 if pending else 0)
+
+        report = run_fleet(cards, finish_move, args.workers)
+    else:
+        if not (args.pattern and args.dest):
+            parser.error('pattern and dest are required')
+        if Path(args.dest).is_absolute():
+            parser.error('dest must be relative to the card roots with --all')
+        report = fleet_mv_samples(cards, pattern, Path(args.dest), args.transactional, args.workers)
+
+    if args.verbose:
+        for result in report.succeeded:
+            print(f'{result.card_root}: {result.value} in {result.seconds:.1f}s')
+    print(report.summary())
+
+
 if __name__ == '__main__':
     main()  # pragma: no cover
@@ -0,0 +1,30 @@
+"""List the sample files that are not used in any song, kit or synth."""
+
+import argparse
+
+from deluge_card import list_deluge_fs
+
+
+def main():
+    """Main entrypoint."""
+    parser = argparse.ArgumentParser(description='dunused.py - report unused samples and their sizes.')
+
+    parser.add_argument('root', help='root folder, must be a valid Deluge file system.')
+    parser.add_argument('pattern', nargs='?', default='', help='glob pattern to match e.g. **/Clap*.wav')
+    parser.add_argument("-s", "--summary", help="summarise output", action="store_true")
+
+    args = parser.parse_args()
+
+    for card in list_deluge_fs(args.root):
+        count = 0
+        total = 0
+        for orphan in card.unused_samples(args.pattern):
+            count += 1
+            total += orphan.size
+            if not args.summary:
+                print(f"{orphan.size:12d} {orphan.path}")
+        print(f'{card.card_root}: {count} unused samples, {total / 1e6:.1f}MB.')
+
+
+if __name__ == '__main__':
+    main()  # pragma: no cover
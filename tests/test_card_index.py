@@ -0,0 +1,104 @@
+import asyncio
+import itertools
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+from deluge_card import DelugeCardFS
+from deluge_card.card_index import INDEX_FILENAME, CardIndex
+
+
+class TestCardIndex(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name, 'DC01')
+        shutil.copytree(Path(cwd, 'fixtures', 'DC01'), self.root)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def usage(self, card):
+        return sorted((str(s.path), st.xml_file.path.name, st.xml_path) for s in card.samples() for st in s.settings)
+
+    def test_index_disabled_by_default(self):
+        card = DelugeCardFS(self.root)
+        self.assertIsNone(card.index())
+        list(card.samples())
+        self.assertFalse(Path(self.root, INDEX_FILENAME).exists())
+
+    def test_indexed_samples_match_parsed_samples(self):
+        expected = self.usage(DelugeCardFS(self.root))
+        card = DelugeCardFS.from_folder(self.root, use_index=True)
+        self.assertEqual(self.usage(card), expected)
+        self.assertTrue(Path(self.root, INDEX_FILENAME).exists())
+        # and again, from the index this time
+        self.assertEqual(self.usage(DelugeCardFS.from_folder(self.root, use_index=True)), expected)
+
+    def test_index_used_from_async_workers(self):
+        async def asamples(card):
+            return [s async for s in card.asamples(concurrency=4)]
+
+        expected = self.usage(DelugeCardFS(self.root))
+        card = DelugeCardFS(self.root, use_index=True)
+        samples = asyncio.run(asamples(card))
+        self.assertEqual(
+            sorted((str(s.path), st.xml_file.path.name, st.xml_path) for s in samples for st in s.settings), expected
+        )
+        self.assertIsNotNone(card.index().lookup(next(card.songs()).path))
+
+    def test_unchanged_files_are_not_parsed(self):
+        list(DelugeCardFS(self.root, use_index=True).used_samples())
+        with mock.patch('deluge_card.card_index.read_sample_refs_tree') as mock_read:
+            samples = list(DelugeCardFS(self.root, use_index=True).used_samples())
+        self.assertEqual(mock_read.call_count, 0)
+        self.assertTrue(len(samples) > 0)
+
+    def test_changed_file_is_parsed(self):
+        list(DelugeCardFS(self.root, use_index=True).used_samples())
+        song = Path(self.root, 'SONGS', 'SONG001.XML')
+        st = song.stat()
+        os.utime(song, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+        with mock.patch('deluge_card.card_index.read_sample_refs_tree', return_value=[]) as mock_read:
+            list(DelugeCardFS(self.root, use_index=True).used_samples())
+        self.assertEqual(mock_read.call_count, 1)
+
+    def test_recently_modified_file_is_parsed_again(self):
+        song = Path(self.root, 'SONGS', 'SONG001.XML')
+        song.write_bytes(song.read_bytes())  # modified now, within the timestamp resolution of being indexed
+        list(DelugeCardFS(self.root, use_index=True).used_samples())
+        with mock.patch('deluge_card.card_index.read_sample_refs_tree', return_value=[]) as mock_read:
+            list(DelugeCardFS(self.root, use_index=True).used_samples())
+        self.assertEqual(mock_read.call_count, 1)
+
+    def test_damaged_index_is_rebuilt(self):
+        expected = self.usage(DelugeCardFS(self.root))
+        DelugeCardFS(self.root, use_index=True).index().close()
+        db_path = Path(self.root, INDEX_FILENAME)
+        with open(db_path, 'r+b') as db:
+            db.seek(100)
+            db.write(os.urandom(3900))
+        card = DelugeCardFS(self.root, use_index=True)
+        self.assertEqual(self.usage(card), expected)
+        self.assertIsNotNone(card.index().lookup(Path(self.root, 'SONGS', 'SONG001.XML')))
+
+    def test_prune(self):
+        index = CardIndex(self.root)
+        song = Path(self.root, 'SONGS', 'SONG001.XML')
+        index.sample_refs(song)
+        self.assertIsNotNone(index.lookup(song))
+        self.assertEqual(index.prune([]), 1)
+        self.assertIsNone(index.lookup(song))
+
+    def test_scans_prune_deleted_files(self):
+        song = Path(self.root, 'SONGS', 'SONG001.XML')
+        for workers in (0, 2):
+            list(DelugeCardFS(self.root, use_index=True).samples())
+            song.rename(Path(self.root, 'SONGS', 'SONG101.XML'))
+            card = DelugeCardFS(self.root, use_index=True)
+            list(card.samples(workers=workers))
+            xml_paths = [xml.path for xml in itertools.chain(card.synths(), card.songs(), card.kits())]
+            self.assertEqual(card.index().prune(xml_paths), 0)
+            Path(self.root, 'SONGS', 'SONG101.XML').rename(song)
@@ -1,6 +1,9 @@
 # test_module.py
+import asyncio
 import importlib.metadata
 import os
+import shutil
+import tempfile
 from pathlib import Path
 from unittest import TestCase, mock
 
@@ -65,6 +68,16 @@ class TestListSongs(TestCase):
         songs = list(self.card.songs("**/DC01/**/SONG002A*"))
         self.assertEqual(len(songs), 1)
 
+    def test_list_hidden_songs(self):
+        """Hidden XML files and folders are listed, as Path.rglob('*.XML') did."""
+        with tempfile.TemporaryDirectory() as temp_dir:
+            for folder in ('KITS', 'SAMPLES', 'SYNTHS', 'SONGS/.hidden'):
+                Path(temp_dir, folder).mkdir(parents=True)
+            for name in ('SONG001.XML', '._SONG001.XML', '.hidden/SONG002.XML'):
+                Path(temp_dir, 'SONGS', name).write_text('<song/>')
+            songs = [song.path.relative_to(temp_dir).as_posix() for song in DelugeCardFS(Path(temp_dir)).songs()]
+        self.assertEqual(songs, ['SONGS/._SONG001.XML', 'SONGS/.hidden/SONG002.XML', 'SONGS/SONG001.XML'])
+
     def test_list_songs_3(self):
         songs = list(self.card.songs("**/DC01/**/SONG???A*"))
         self.assertEqual(len(songs), 1)
@@ -142,3 +155,104 @@ class TestMoveSamples(TestCase):
         self.assertEqual(len(movops), 4)
         self.assertEqual(mock_write.call_count, 3)
         self.assertEqual(mock_move.call_count, 1)
+
+
+class TestParallelScan(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.card = DelugeCardFS(Path(cwd, 'fixtures', 'DC01'))
+
+    def usage(self, samples):
+        return [(str(s.path), [(st.xml_file.path.name, st.xml_path) for st in s.settings]) for s in samples]
+
+    def test_thread_pool_matches_serial(self):
+        serial = self.usage(self.card.samples())
+        self.assertEqual(self.usage(self.card.samples(workers=4)), serial)
+
+    def test_process_pool_matches_serial(self):
+        serial = self.usage(self.card.used_samples("**/Artists/A/*"))
+        parallel = self.usage(self.card.used_samples("**/Artists/A/*", workers=2, use_processes=True))
+        self.assertEqual(parallel, serial)
+
+
+class TestUnusedSamples(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.card = DelugeCardFS(Path(cwd, 'fixtures', 'DC01'))
+
+    def test_unused_samples(self):
+        unused = sorted(str(o.path.relative_to(self.card.card_root)) for o in self.card.unused_samples())
+        self.assertEqual(
+            unused,
+            [
+                'SAMPLES/Artists/A/kick1D.wav',
+                'SAMPLES/Artists/A/snare1A.wav',
+                'SAMPLES/Artists/A/wurgle.wav',
+                'SAMPLES/Kick/909 Kick.wav',
+                'SAMPLES/Kick/CR78 Kick.wav',
+            ],
+        )
+
+    def test_unused_samples_match_samples_without_settings(self):
+        expected = sorted(s.path.name for s in self.card.samples() if not s.settings)
+        self.assertEqual(sorted(o.path.name for o in self.card.unused_samples()), expected)
+
+    def test_unused_sample_sizes(self):
+        orphans = list(self.card.unused_samples('**/wurgle.wav'))
+        self.assertEqual(len(orphans), 1)
+        self.assertEqual(orphans[0].size, orphans[0].path.stat().st_size)
+
+    def test_unused_samples_after_a_song_is_added(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir, 'DC01')
+            shutil.copytree(self.card.card_root, root)
+            card = DelugeCardFS(root)
+            self.assertIn('wurgle.wav', [o.path.name for o in card.unused_samples()])
+            song = Path(root, 'SONGS/SONG006.XML').read_text()
+            song = song.replace('SAMPLES/DRUMS/Kick/CR78 Kick.wav', 'SAMPLES/Artists/A/wurgle.wav')
+            Path(root, 'SONGS/SONG100.XML').write_text(song)
+            self.assertNotIn('wurgle.wav', [o.path.name for o in card.unused_samples()])
+
+    def test_unused_samples_skips_files_removed_since_listed(self):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            root = Path(temp_dir, 'DC01')
+            shutil.copytree(self.card.card_root, root)
+            card = DelugeCardFS(root)
+            self.assertIn('wurgle.wav', [o.path.name for o in card.unused_samples()])
+            folder = Path(root, 'SAMPLES/Artists/A')
+            st = folder.stat()
+            Path(folder, 'wurgle.wav').unlink()
+            os.utime(folder, ns=(st.st_atime_ns, st.st_mtime_ns))  # as if within the FAT mtime resolution
+            unused = [o.path.name for o in card.unused_samples()]
+            self.assertNotIn('wurgle.wav', unused)
+            self.assertIn('kick1D.wav', unused)
+
+
+class TestAsyncScan(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.card = DelugeCardFS(Path(cwd, 'fixtures', 'DC01'))
+
+    def collect(self, agen):
+        async def run():
+            return [item async for item in agen]
+
+        return asyncio.run(run())
+
+    def test_asongs_match_songs(self):
+        songs = self.collect(self.card.asongs(concurrency=2))
+        self.assertEqual([s.path for s in songs], [s.path for s in self.card.songs()])
+        self.assertTrue(all(s.loaded for s in songs))
+
+    def test_akits_and_asynths_without_load(self):
+        kits = self.collect(self.card.akits(load=False))
+        synths = self.collect(self.card.asynths("*SYNT0*", load=False))
+        self.assertEqual([k.path for k in kits], [k.path for k in self.card.kits()])
+        self.assertEqual([s.path for s in synths], [s.path for s in self.card.synths("*SYNT0*")])
+        self.assertFalse(any(x.loaded for x in kits + synths))
+
+    def test_asamples_match_samples(self):
+        def usage(samples):
+            return [(str(s.path), [(st.xml_file.path.name, st.xml_path) for st in s.settings]) for s in samples]
+
+        self.assertEqual(usage(self.collect(self.card.asamples(concurrency=3))), usage(self.card.samples()))
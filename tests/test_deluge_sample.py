@@ -1,6 +1,8 @@
 import inspect
 import itertools
 import os
+import shutil
+import tempfile
 from pathlib import Path
 from unittest import TestCase, mock, skip
 
@@ -16,7 +18,9 @@ from deluge_card.deluge_sample import (
     modify_sample_kits,
     modify_sample_paths,
     modify_sample_songs,
+    modify_sample_synths,
     mv_samples,
+    plan_xml_updates,
     validate_mv_dest,
 )
 
@@ -246,3 +250,167 @@ class TestSongSampleMove(TestCase):
 
         new_file = Path(new_path, old_path.name)
         self.assertEqual(new_file, Path('SAMPLES/MV/Hangdrum/2.wav'))
+
+
+class TestBatchedXmlUpdates(TestCase):
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.realpath(__file__))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name, 'DC02')
+        shutil.copytree(Path(self.cwd, 'fixtures', 'DC02'), self.root)
+        self.card = DelugeCardFS(self.root)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_plan_groups_updates_per_file(self):
+        matching = '**/WaldorfM/Loopop-Waldorf-M-4*/*.*'
+        move_ops = list(
+            modify_sample_paths(self.root, self.card.samples(matching), matching, Path(self.root, 'SAMPLES/MV'))
+        )
+        updates = plan_xml_updates(move_ops)
+        self.assertEqual(len(updates), 5)  # 4 songs, 1 synth
+        self.assertEqual(sum(len(u) for u in updates.values()), sum(len(mo.sample.settings) for mo in move_ops))
+
+    def move_ops(self):
+        matching = '**/WaldorfM/Loopop-Waldorf-M-4*/*.*'
+        return list(
+            modify_sample_paths(self.root, self.card.samples(matching), matching, Path(self.root, 'SAMPLES/MV'))
+        )
+
+    def test_update_sample_elements(self):
+        updates = plan_xml_updates(self.move_ops())
+        for xml, xml_updates in updates.items():
+            elements = xml.update_sample_elements(xml_updates)
+            self.assertEqual(len(elements), len(xml_updates))
+            refs = {xpath: sample_file for sample_file, xpath in xml.sample_refs()}
+            for xml_path, new_path in xml_updates:
+                self.assertEqual(Path(self.root, refs[xml_path]), new_path)
+
+    def test_deprecated_updaters_use_the_batched_path(self):
+        move_ops = self.move_ops()
+        expected = {xml.path: len(u) for xml, u in plan_xml_updates(move_ops).items()}
+        with self.assertWarns(DeprecationWarning):
+            songs = list(modify_sample_songs(move_ops))
+        with self.assertWarns(DeprecationWarning):
+            synths = list(modify_sample_synths(move_ops))
+        with self.assertWarns(DeprecationWarning):
+            self.assertEqual(list(modify_sample_kits(move_ops)), [])
+        updated = [xml.path for xml in songs + synths]  # one per updated setting, as before
+        self.assertEqual({path: updated.count(path) for path in updated}, expected)
+
+    def test_each_file_written_once(self):
+        matching = '**/WaldorfM/Loopop-Waldorf-M-4*/*.*'
+        with mock.patch('deluge_card.deluge_xml.DelugeXml.write_xml', autospec=True) as mock_write:
+            modops = list(self.card.mv_samples(matching, Path('SAMPLES/MV')))
+        written = [c.args[0].path for c in mock_write.call_args_list]
+        self.assertEqual(len(written), 5)
+        self.assertEqual(len(set(written)), 5)
+        self.assertEqual(len([m for m in modops if m.operation == 'move_file']), 6)
+
+    def test_moved_samples_are_referenced(self):
+        matching = '**/WaldorfM/Loopop-Waldorf-M-4*/*.*'
+        list(self.card.mv_samples(matching, Path('SAMPLES/MV')))
+        moved = list(DelugeCardFS(self.root).used_samples('**/MV/*.wav'))
+        self.assertEqual(len(moved), 6)
+        self.assertEqual(len(list(DelugeCardFS(self.root).used_samples(matching))), 0)
+
+    def test_moved_samples_found_straight_after_move(self):
+        matching = '**/WaldorfM/Loopop-Waldorf-M-4*/*.*'
+        songs = list(self.card.songs('**/SONG006*.XML'))
+        before = [len(list(song.samples())) for song in songs]
+        list(self.card.mv_samples(matching, Path('SAMPLES/MV')))
+        # the moved files are not in the cached listings of their new folder, which is listed again
+        self.assertEqual([len(list(song.samples())) for song in songs], before)
+
+
+class TestMovePlan(TestCase):
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.realpath(__file__))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name, 'DC02')
+        shutil.copytree(Path(self.cwd, 'fixtures', 'DC02'), self.root)
+        self.card = DelugeCardFS(self.root)
+        self.matching = '**/WaldorfM/Loopop-Waldorf-M-4*/*.*'
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_plan_changes_nothing(self):
+        before = {p: p.read_bytes() for p in self.root.rglob('*.XML')}
+        plan = self.card.plan_mv_samples(self.matching, Path('SAMPLES/MV'))
+        self.assertEqual(len(plan.move_ops), 6)
+        self.assertEqual(plan.xml_file_counts(), dict(song=4, kit=0, synth=1))
+        self.assertEqual(plan.element_count, sum(len(s.settings) for s in plan.samples))
+        self.assertEqual(plan.bytes_to_move, sum(mo.old_path.stat().st_size for mo in plan.move_ops))
+        self.assertFalse(any(xml.loaded for xml in plan.xml_files))
+        self.assertEqual({p: p.read_bytes() for p in self.root.rglob('*.XML')}, before)
+        with self.assertRaises(attrs.exceptions.FrozenInstanceError):
+            plan.bytes_to_move = 0
+
+    def test_apply_plan_matches_mv_samples(self):
+        plan = self.card.plan_mv_samples(self.matching, Path('SAMPLES/MV'))
+        self.assertIn('move 6 samples', plan.summary())
+        modops = list(self.card.apply_mv_plan(plan))
+        self.assertEqual(len([m for m in modops if m.operation == 'move_file']), 6)
+        self.assertEqual(len(list(DelugeCardFS(self.root).used_samples('**/MV/*.wav'))), 6)
+
+    def test_plan_invalid_dest(self):
+        with self.assertRaises(ValueError):
+            self.card.plan_mv_samples(self.matching, Path('SAMPLES/NOWHERE'))
+
+
+class TestMovePlanUnchanged(TestCase):
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.realpath(__file__))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name, 'DC01')
+        shutil.copytree(Path(self.cwd, 'fixtures', 'DC01'), self.root)
+        self.card = DelugeCardFS(self.root)
+        self.kit = Path(self.root, 'KITS', 'KIT014.XML')
+        self.kick = Path(self.root, 'SAMPLES', 'DRUMS', 'Kick', 'CR78 Kick.wav')
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def swap_kick_and_snare(self):
+        kick, snare = 'SAMPLES/DRUMS/Kick/CR78 Kick.wav', 'SAMPLES/DRUMS/Snare/CR78 Snare.wav'
+        text = self.kit.read_text()
+        self.kit.write_text(text.replace(kick, '@').replace(snare, kick).replace('@', snare))
+
+    def check_refused(self, plan):
+        before = self.kit.read_bytes()
+        with self.assertRaises(ValueError):
+            list(self.card.apply_mv_plan(plan))
+        self.assertEqual(self.kit.read_bytes(), before)
+        self.assertTrue(self.kick.exists())
+        self.assertFalse(any(xml.loaded and xml.path == self.kit for xml in plan.xml_files))
+
+    def test_changed_since_planned(self):
+        plan = self.card.plan_mv_samples('SAMPLES/DRUMS/Kick/CR78 Kick.wav', Path('SAMPLES/MV'))
+        self.swap_kick_and_snare()
+        self.check_refused(plan)
+
+    def test_references_changed_within_mtime_resolution(self):
+        plan = self.card.plan_mv_samples('SAMPLES/DRUMS/Kick/CR78 Kick.wav', Path('SAMPLES/MV'))
+        st = self.kit.stat()
+        self.swap_kick_and_snare()
+        os.utime(self.kit, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.check_refused(plan)
+
+    def test_references_changed_within_mtime_resolution_with_index(self):
+        self.card = DelugeCardFS(self.root, use_index=True)
+        plan = self.card.plan_mv_samples('SAMPLES/DRUMS/Kick/CR78 Kick.wav', Path('SAMPLES/MV'))
+        st = self.kit.stat()
+        self.swap_kick_and_snare()
+        os.utime(self.kit, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.check_refused(plan)
+
+    def test_references_changed_within_mtime_resolution_over_loaded_trees(self):
+        plan = self.card.plan_mv_samples('SAMPLES/DRUMS/Kick/CR78 Kick.wav', Path('SAMPLES/MV'))
+        for xml in plan.xml_files:
+            xml.load()  # the memory copy is not the card
+        st = self.kit.stat()
+        self.swap_kick_and_snare()
+        os.utime(self.kit, ns=(st.st_atime_ns, st.st_mtime_ns))
+        self.check_refused(plan)
@@ -117,3 +117,31 @@ class TestInstrument(TestDelugeSong):
         self.assertEqual(len(kit_sounds), 14)
         self.assertEqual(kit_sounds[0].name, 'KICK')
         self.assertEqual(kit_sounds[13].name, 'TOMH')
+
+
+class TestSongLazyLoad(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.card = DelugeCardFS(Path(cwd, 'fixtures', 'DC01'))
+
+    @mock.patch('deluge_card.deluge_xml.parse_xml')
+    def test_listing_songs_does_not_parse(self, mock_parse):
+        songs = list(self.card.songs('*002*'))
+        self.assertEqual(len(songs), 2)
+        self.assertFalse(songs[0].loaded)
+        self.assertEqual(mock_parse.call_count, 0)
+
+    def test_parse_on_first_access_and_release(self):
+        song = next(self.card.songs('*SONG001.XML'))
+        self.assertFalse(song.loaded)
+        self.assertEqual(song.minimum_firmware(), '3.1.0-beta')
+        self.assertTrue(song.loaded)
+        song.release()
+        self.assertFalse(song.loaded)
+        self.assertEqual(song.load().minimum_firmware(), '3.1.0-beta')
+
+    def test_card_scan_releases_trees(self):
+        samples = list(self.card.used_samples())
+        xml_files = set(st.xml_file for s in samples for st in s.settings)
+        self.assertTrue(len(xml_files) > 0)
+        self.assertFalse(any(x.loaded for x in xml_files))
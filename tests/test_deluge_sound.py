@@ -6,7 +6,18 @@ from unittest import TestCase, mock
 from lxml import etree
 
 from deluge_card import DelugeCardFS, DelugeSong, DelugeSynth
-from deluge_card.deluge_sound import DelugeSongSound, DelugeSynthSound, LpfMode, ModFxType, Polyphony, SynthMode
+from deluge_card.deluge_sound import (
+    DelugeSongKitSound,
+    DelugeSongSound,
+    DelugeSynthSound,
+    LpfMode,
+    ModFxType,
+    Polyphony,
+    SoundLookup,
+    SynthMode,
+    attr_or_elem,
+    default_attr_or_elem,
+)
 
 
 class TestSoundFromSynth(TestCase):
@@ -38,6 +49,25 @@ class TestSoundFromSynth(TestCase):
         sound = DelugeSynthSound.from_synth(self.synth)
         self.assertEqual(sound.lpf_mode.value, '24dB')
 
+    def test_repr_lists_fields(self):
+        sound = DelugeSynthSound.from_synth(self.synth)
+        self.assertRegex(
+            repr(sound),
+            r"^DelugeSynthSound\(polyphonic=<Polyphony.polyphonic: 'poly'>, sound=<Element sound at 0x\w+>, "
+            r"lpf_mode=<LpfMode._24dB: '24dB'>, mode=<SynthMode.subtractive: 'subtractive'>, "
+            r"mod_fx_type=<ModFxType.\w+: '\w+'>, voice_priority=\d+, path=\w+Path\('.*SYNT991A.XML'\), "
+            r"transpose=-12\)$",
+        )
+
+    def test_eq_compares_fields(self):
+        sound = DelugeSynthSound.from_synth(self.synth)
+        self.assertEqual(sound, DelugeSynthSound.from_synth(self.synth))
+        self.assertNotEqual(sound, DelugeSynthSound(sound.sound, path=Path('other.XML')))
+        copy = DelugeSynthSound.from_synth(self.synth)
+        copy.sound = etree.fromstring(etree.tostring(sound.sound))
+        self.assertNotEqual(sound, copy)  # elements compare by identity, as before
+        self.assertNotEqual(sound, sound.sound)
+
 
 class TestSoundFromSynthExtra(TestCase):
     def setUp(self):
@@ -128,3 +158,42 @@ class TestKitSoundsFromSong(TestSongBase):
     #     sound = DelugeSynthSound.from_synth(self.synth)
     #     print(dir(sound))
     #     self.assertEqual(sound.transpose, -12)
+
+
+class TestSoundLookup(TestSongBase):
+    NAMES = [
+        'name',
+        'mode',
+        'lpfMode',
+        'modFXType',
+        'voicePriority',
+        'polyphonic',
+        'presetSlot',
+        'firmwareVersion',
+        'x',
+    ]
+
+    def test_matches_attr_or_elem(self):
+        synth = DelugeSynth(self.card, Path(self.cwd, 'fixtures', 'DC01', 'SYNTHS', 'SYNT000.XML'))
+        sounds = [synth.xmlroot] + self.song.xmlroot.findall('.//sound')
+        for elem, name in itertools.product(sounds, self.NAMES):
+            with self.subTest(elem=elem, name=name):
+                self.assertEqual(SoundLookup(elem).get_default(name), default_attr_or_elem(elem, name))
+
+    def test_missing_raises(self):
+        with self.assertRaises(AttributeError):
+            SoundLookup(self.song.xmlroot).get('noSuchThing')
+
+    def test_fields_are_lazy(self):
+        sound = DelugeSongKitSound(etree.fromstring('<sound name="KICK" mode="bogus"/>'))
+        self.assertEqual(sound.name, 'KICK')
+        with self.assertRaises(ValueError):
+            sound.mode
+
+    def test_fields_are_memoised(self):
+        sound = list(self.song.synths)[0]
+        self.assertEqual(sound.mode, SynthMode.subtractive)
+        with mock.patch('deluge_card.deluge_sound.SoundLookup.get') as mock_get:
+            self.assertEqual(sound.mode, SynthMode.subtractive)
+        mock_get.assert_not_called()
+        self.assertEqual(sound.mode, attr_or_elem(sound.sound, 'mode', SynthMode))
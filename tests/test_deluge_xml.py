@@ -0,0 +1,113 @@
+import os
+from pathlib import Path
+from unittest import TestCase, mock
+
+from deluge_card import DelugeCardFS, DelugeSong
+from deluge_card.deluge_xml import (
+    parse_xml,
+    read_and_clean_xml,
+    read_sample_refs,
+    read_sample_refs_tree,
+    sample_refs_from_tree,
+)
+
+
+class TestStreamingSampleRefs(TestCase):
+    def setUp(self):
+        self.fixtures = Path(os.path.dirname(os.path.realpath(__file__)), 'fixtures')
+
+    def test_streamed_refs_match_tree_refs(self):
+        for xml_file in sorted(Path(self.fixtures, 'DC01').rglob('*.XML')):
+            with self.subTest(xml_file=xml_file.name):
+                self.assertEqual(read_sample_refs(xml_file), sample_refs_from_tree(parse_xml(xml_file)))
+
+    def test_tree_reader_matches_streamed_refs(self):
+        for xml_file in sorted(self.fixtures.rglob('*.XML')):
+            if xml_file.name == 'dot_SONG000.XML':
+                continue
+            with self.subTest(xml_file=xml_file.name):
+                self.assertEqual(read_sample_refs_tree(xml_file), read_sample_refs(xml_file))
+        with self.assertRaises(Exception):
+            read_sample_refs_tree(Path(self.fixtures, 'dot_SONG000.XML'))
+
+    def test_streamed_xpaths_find_elements(self):
+        xml_file = Path(self.fixtures, 'DC02', 'SYNTHS', 'Waldorf 0.XML')
+        root = parse_xml(xml_file)
+        for sample_file, xpath in read_sample_refs(xml_file):
+            elem = root.getroottree().xpath(xpath)[0]
+            self.assertIn(sample_file, [elem.get('fileName'), elem.text])
+
+    def test_unparseable_file_raises(self):
+        with self.assertRaises(Exception):
+            read_sample_refs(Path(self.fixtures, 'dot_SONG000.XML'))
+
+    @mock.patch('deluge_card.deluge_xml.parse_xml')
+    def test_samples_do_not_build_tree(self, mock_parse):
+        card = DelugeCardFS(Path(self.fixtures, 'DC01'))
+        song = DelugeSong(card, Path(self.fixtures, 'DC01', 'SONGS', 'SONG001.XML'))
+        self.assertEqual(len(list(song.samples(allow_missing=True))), 32)
+        self.assertEqual(mock_parse.call_count, 0)
+        self.assertFalse(song.loaded)
+
+    def test_stream_xml_card_streams(self):
+        song_path = Path(self.fixtures, 'DC01', 'SONGS', 'SONG001.XML')
+        for stream_xml, reader in ((False, read_sample_refs_tree), (True, read_sample_refs)):
+            song = DelugeSong(DelugeCardFS(Path(self.fixtures, 'DC01'), stream_xml=stream_xml), song_path)
+            with mock.patch(f'deluge_card.deluge_xml.{reader.__name__}', side_effect=reader) as mock_reader:
+                self.assertEqual(len(list(song.samples(allow_missing=True))), 32)
+            self.assertEqual(mock_reader.call_count, 1)
+
+
+class TestReadAndCleanXml(TestCase):
+    def setUp(self):
+        self.fixtures = Path(os.path.dirname(os.path.realpath(__file__)), 'fixtures')
+
+    def test_header_lines_removed(self):
+        xml_file = Path(self.fixtures, 'DC01', 'SYNTHS', 'SYNT991A.XML')
+        cleaned = read_and_clean_xml(xml_file).read()
+        self.assertNotIn(b'<firmwareVersion>', cleaned[:200])
+        self.assertNotIn(b'<earliestCompatibleFirmware>', cleaned[:200])
+        self.assertTrue(xml_file.read_bytes().endswith(cleaned[-1000:]))
+
+    def test_chunked_reads_match_full_read(self):
+        xml_file = Path(self.fixtures, 'DC01', 'SYNTHS', 'SYNT991A.XML')
+        reader = read_and_clean_xml(xml_file)
+        chunks = b''.join(iter(lambda: reader.read(13), b''))
+        self.assertEqual(chunks, read_and_clean_xml(xml_file).read())
+        self.assertTrue(reader.closed)
+
+    def test_read_parts_match_full_read(self):
+        xml_file = Path(self.fixtures, 'DC01', 'SYNTHS', 'SYNT991A.XML')
+        with read_and_clean_xml(xml_file) as reader:
+            head, rest = reader.read_parts()
+        self.assertEqual(head + rest, read_and_clean_xml(xml_file).read())
+        self.assertTrue(xml_file.read_bytes().endswith(rest))
+
+
+class TestSampleElements(TestCase):
+    def setUp(self):
+        self.fixtures = Path(os.path.dirname(os.path.realpath(__file__)), 'fixtures')
+        self.card = DelugeCardFS(Path(self.fixtures, 'DC01'))
+        self.song = DelugeSong(self.card, Path(self.fixtures, 'DC01', 'SONGS', 'SONG001.XML'))
+
+    def test_setting_element(self):
+        for sample in self.song.samples(allow_missing=True):
+            for setting in sample.settings:
+                elem = setting.element
+                self.assertEqual(self.card.card_root.joinpath(elem.get('fileName') or elem.text), sample.path)
+
+    def test_update_sample_element(self):
+        setting = next(self.song.samples(allow_missing=True)).settings[0]
+        elem = self.song.update_sample_element(setting.xml_path, Path(self.card.card_root, 'SAMPLES/MV/X.wav'))
+        self.assertIs(elem, setting.element)
+        self.assertIn('SAMPLES/MV/X.wav', [elem.get('fileName'), elem.text])
+
+    def test_elements_forgotten_on_release(self):
+        setting = next(self.song.samples(allow_missing=True)).settings[0]
+        self.song.update_sample_element(setting.xml_path, Path(self.card.card_root, 'SAMPLES/MV/X.wav'))
+        self.song.release()
+        self.assertNotIn('SAMPLES/MV/X.wav', [setting.element.get('fileName'), setting.element.text])
+
+    def test_missing_element_raises(self):
+        with self.assertRaises(ValueError):
+            self.song.sample_element('/song/nothing/here')
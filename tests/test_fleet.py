@@ -0,0 +1,51 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from deluge_card import DelugeCardFS, list_deluge_fs
+from deluge_card.fleet import fleet_mv_samples, fleet_unused_samples, run_fleet
+
+MATCHING = '**/WaldorfM/Loopop-Waldorf-M-4*/*.*'
+
+
+class TestFleet(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        for name in ['A', 'B', 'C']:
+            shutil.copytree(Path(cwd, 'fixtures', 'DC02'), Path(self.temp_dir.name, name))
+        # card C cannot take the move
+        shutil.rmtree(Path(self.temp_dir.name, 'C', 'SAMPLES', 'MV'))
+        self.cards = sorted(list_deluge_fs(self.temp_dir.name), key=lambda card: card.card_root)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_fleet_mv_samples(self):
+        report = fleet_mv_samples(self.cards, MATCHING, Path('SAMPLES/MV'), workers=3)
+        self.assertEqual([r.card_root.name for r in report.results], ['A', 'B', 'C'])
+        self.assertEqual([r.card_root.name for r in report.failed], ['C'])
+        self.assertIsInstance(report.failed[0].error, ValueError)
+        self.assertEqual(report.totals()['move_file'], 12)
+        for name in ['A', 'B']:
+            card = DelugeCardFS(Path(self.temp_dir.name, name))
+            self.assertEqual(len(list(card.used_samples('**/MV/*.wav'))), 6)
+        self.assertIn('3 cards, 2 succeeded, 1 failed.', report.summary())
+
+    def test_serial_matches_parallel(self):
+        serial = fleet_unused_samples(self.cards, workers=0)
+        parallel = fleet_unused_samples(self.cards, workers=3)
+        self.assertEqual([r.value for r in serial.results], [r.value for r in parallel.results])
+        self.assertEqual(len(serial.succeeded), 3)
+
+    def test_errors_are_isolated(self):
+        def explode(card):
+            if card.card_root.name == 'B':
+                raise RuntimeError('bad card')
+            return card.card_root.name
+
+        report = run_fleet(self.cards, explode)
+        self.assertEqual([r.value for r in report.succeeded], ['A', 'C'])
+        self.assertEqual(str(report.failed[0].error), 'bad card')
@@ -0,0 +1,116 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+from deluge_card import DelugeCardFS
+from deluge_card.folder_cache import FolderCache
+
+
+class TestFolderCache(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder = Path(self.temp_dir.name)
+        Path(self.folder, 'a.wav').write_bytes(b'')
+        Path(self.folder, 'sub').mkdir()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_listing(self):
+        listing = FolderCache().listing(str(self.folder))
+        self.assertEqual(listing.files, ('a.wav',))
+        self.assertEqual(listing.folders, ('sub',))
+        self.assertIsNone(FolderCache().listing(str(Path(self.folder, 'missing'))))
+
+    def test_exists_uses_listing(self):
+        cache = FolderCache()
+        self.assertTrue(cache.exists(Path(self.folder, 'a.wav')))
+        with mock.patch('os.stat') as mock_stat, mock.patch('os.scandir') as mock_scandir:
+            self.assertTrue(cache.exists(Path(self.folder, 'a.wav')))
+        mock_stat.assert_not_called()
+        mock_scandir.assert_not_called()
+
+    def test_added_file_found_after_revalidate(self):
+        cache = FolderCache()
+        self.assertFalse(cache.exists(Path(self.folder, 'b.wav')))
+        Path(self.folder, 'b.wav').write_bytes(b'')
+        os.utime(self.folder, ns=(0, 0))  # make sure the folder mtime changed
+        cache.revalidate()
+        self.assertTrue(cache.exists(Path(self.folder, 'b.wav')))
+
+    def test_missing_file_not_stated(self):
+        cache = FolderCache()
+        cache.listing(str(self.folder))
+        with mock.patch('pathlib.Path.exists') as mock_exists, mock.patch('os.stat') as mock_stat:
+            self.assertFalse(cache.exists(Path(self.folder, 'b.wav')))
+            self.assertFalse(cache.exists(Path(self.folder, 'missing', 'b.wav')))
+        mock_exists.assert_not_called()
+        mock_stat.assert_called_once()  # the missing folder, cached until revalidated
+        with mock.patch('os.stat') as mock_stat:
+            self.assertFalse(cache.exists(Path(self.folder, 'missing', 'b.wav')))
+        mock_stat.assert_not_called()
+
+    def test_other_case_stated_once(self):
+        cache = FolderCache()
+        found = Path(self.folder, 'A.WAV').exists()  # True on a case-insensitive filesystem
+        with mock.patch('pathlib.Path.exists', autospec=True, side_effect=Path.exists) as mock_exists:
+            self.assertEqual(cache.exists(Path(self.folder, 'A.WAV')), found)
+            self.assertEqual(cache.exists(Path(self.folder, 'A.WAV')), found)
+        mock_exists.assert_called_once()
+
+    def test_removed_file_after_revalidate(self):
+        cache = FolderCache()
+        self.assertTrue(cache.exists(Path(self.folder, 'a.wav')))
+        Path(self.folder, 'a.wav').unlink()
+        os.utime(self.folder, ns=(0, 0))  # make sure the folder mtime changed
+        cache.revalidate()
+        self.assertFalse(cache.exists(Path(self.folder, 'a.wav')))
+
+
+class TestCardFolderCache(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name, 'DC01')
+        shutil.copytree(Path(cwd, 'fixtures', 'DC01'), self.root)
+        self.card = DelugeCardFS(self.root)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_existing_samples_are_not_checked_again(self):
+        used = list(self.card.used_samples())
+        with mock.patch('pathlib.Path.exists', autospec=True, side_effect=Path.exists) as mock_exists:
+            self.assertEqual(len(list(self.card.used_samples())), len(used))
+        # samples missing from the card are missing from the listings too
+        mock_exists.assert_not_called()
+
+    def test_removed_sample_is_missing(self):
+        used = list(self.card.used_samples())
+        removed = next(s.path for s in used if s.path.exists())
+        removed.unlink()
+        os.utime(removed.parent, ns=(0, 0))
+        self.assertNotIn(removed, [s.path for s in self.card.used_samples()])
+
+    def test_one_walk_for_samples(self):
+        expected = sorted(str(s.path) for s in self.card.samples())
+        with mock.patch('os.scandir', side_effect=os.scandir) as mock_scandir:
+            self.assertEqual(sorted(str(s.path) for s in self.card.samples()), expected)
+        mock_scandir.assert_not_called()  # no folder changed
+
+    def test_per_file_samples_use_the_cached_listings(self):
+        songs = list(self.card.songs())
+        list(self.card.samples())
+        with mock.patch('os.stat', side_effect=os.stat) as mock_stat:
+            for song in songs:
+                list(song.samples())
+        # folders are only checked again by card-level listings
+        self.assertFalse([c for c in mock_stat.call_args_list if os.path.isdir(c.args[0])])
+
+    def test_new_files_listed(self):
+        songs = list(self.card.songs())
+        shutil.copy(songs[0].path, Path(self.root, 'SONGS', 'SONG999.XML'))
+        Path(self.root, 'SONGS', '._SONG999.XML').write_bytes(b'\x00')  # Apple copy crap, listed as rglob() did
+        self.assertEqual(len(list(self.card.songs())), len(songs) + 2)
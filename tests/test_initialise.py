@@ -1,3 +1,4 @@
+import os
 import platform
 import tempfile
 from pathlib import Path
@@ -80,3 +81,42 @@ class TestListDelugeCardFS(TestCase):
         cards = list(list_deluge_fs(self.temp_dir.name))
         self.assertEqual(len(cards), 3)
         self.assertTrue(isinstance(cards[0], DelugeCardFS))
+
+    def make_archive(self):
+        for fname in ['A', 'B', 'archive/2021/C', 'archive/D']:
+            folder = Path(self.temp_dir.name, fname)
+            folder.mkdir(parents=True)
+            DelugeCardFS.initialise(folder)
+        # a card nested in a card's top folder is not searched for
+        Path(self.temp_dir.name, 'A', 'SAMPLES', 'E').mkdir()
+        DelugeCardFS.initialise(Path(self.temp_dir.name, 'A', 'SAMPLES', 'E'))
+
+    def names(self, cards):
+        return sorted(card.card_root.name for card in cards)
+
+    def test_list_with_depth(self):
+        self.make_archive()
+        self.assertEqual(self.names(list_deluge_fs(self.temp_dir.name)), ['A', 'B'])
+        self.assertEqual(self.names(list_deluge_fs(self.temp_dir.name, depth=2)), ['A', 'B', 'D'])
+        self.assertEqual(self.names(list_deluge_fs(self.temp_dir.name, depth=5)), ['A', 'B', 'C', 'D'])
+        self.assertEqual(self.names(list_deluge_fs(Path(self.temp_dir.name, 'A'), depth=5)), ['A'])
+
+    def test_parallel_list_matches_serial(self):
+        self.make_archive()
+        serial = [card.card_root for card in list_deluge_fs(self.temp_dir.name, depth=3)]
+        parallel = [card.card_root for card in list_deluge_fs(self.temp_dir.name, depth=3, workers=4)]
+        self.assertEqual(parallel, serial)
+
+    def test_list_missing_folder_raises(self):
+        with self.assertRaises(FileNotFoundError):
+            list(list_deluge_fs(Path(self.temp_dir.name, 'missing')))
+
+    def test_list_relative_folder_gives_absolute_roots(self):
+        self.make_archive()
+        cwd = os.getcwd()
+        os.chdir(self.temp_dir.name)
+        try:
+            cards = list(list_deluge_fs('.'))
+        finally:
+            os.chdir(cwd)
+        self.assertTrue(all(card.card_root.is_absolute() for card in cards))
@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+from deluge_card import DelugeCardFS
+from deluge_card.deluge_sample import SampleMoveOperation, modify_sample_paths, plan_xml_updates
+from deluge_card.mv_transaction import JOURNAL_FILENAME, MoveTransaction
+
+MATCHING = '**/WaldorfM/Loopop-Waldorf-M-4*/*.*'
+
+
+class TestTransactionalMove(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name, 'DC02')
+        shutil.copytree(Path(cwd, 'fixtures', 'DC02'), self.root)
+        self.card = DelugeCardFS(self.root)
+        self.original = self.snapshot()
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def snapshot(self):
+        return {str(p.relative_to(self.root)): p.read_bytes() for p in sorted(self.root.rglob('*')) if p.is_file()}
+
+    def prepare(self):
+        dest = Path(self.root, 'SAMPLES/MV')
+        move_ops = list(modify_sample_paths(self.root, self.card.samples(MATCHING), MATCHING, dest))
+        xml_updates = plan_xml_updates(move_ops)
+        for xml, updates in xml_updates.items():
+            xml.update_sample_elements(updates)
+        return MoveTransaction.prepare(self.root, list(xml_updates), list(dict.fromkeys(move_ops)))
+
+    def test_transactional_move(self):
+        modops = list(self.card.mv_samples(MATCHING, Path('SAMPLES/MV'), transactional=True))
+        self.assertEqual(len([m for m in modops if m.operation == 'move_file']), 6)
+        self.assertEqual(len(list(DelugeCardFS(self.root).used_samples('**/MV/*.wav'))), 6)
+        self.assertIsNone(self.card.pending_move())
+        leftovers = [p for p in self.root.rglob('*') if p.suffix in ('.dmvtmp', '.dmvbak')]
+        self.assertEqual(leftovers, [])
+
+    def test_failed_rename_rolls_back(self):
+        replace = os.replace
+        calls = []
+
+        def failing_replace(src, dst):
+            calls.append(src)
+            if len(calls) == 3:
+                raise OSError('disk full')
+            return replace(src, dst)
+
+        with mock.patch('deluge_card.mv_transaction.os.replace', side_effect=failing_replace):
+            with self.assertRaises(OSError):
+                list(self.card.mv_samples(MATCHING, Path('SAMPLES/MV'), transactional=True))
+        self.assertEqual(self.snapshot(), self.original)
+
+    def test_refuses_moves_to_the_same_path(self):
+        for folder, content in (('A', b'a'), ('B', b'b')):
+            Path(self.root, 'SAMPLES', folder).mkdir()
+            Path(self.root, 'SAMPLES', folder, 'x.wav').write_bytes(content)
+        Path(self.root, 'SAMPLES/C').mkdir()
+        original = self.snapshot()
+        with self.assertRaises(ValueError):
+            self.card.plan_mv_samples('**/x.wav', Path('SAMPLES/C'))
+        with self.assertRaises(ValueError):
+            list(self.card.mv_samples('**/x.wav', Path('SAMPLES/C'), transactional=True))
+        self.assertEqual(self.snapshot(), original)
+
+        move_ops = [
+            SampleMoveOperation(Path(self.root, 'SAMPLES', folder, 'x.wav'), Path(self.root, 'SAMPLES/C/X.wav'), None)
+            for folder in ('A', 'B')
+        ]
+        with self.assertRaises(ValueError):
+            MoveTransaction.prepare(self.root, [], move_ops)
+        self.assertIsNone(self.card.pending_move())
+
+    def test_refused_move_leaves_trees_unchanged(self):
+        plan = self.card.plan_mv_samples(MATCHING, Path('SAMPLES/MV'))
+        plan.move_ops[0].new_path.parent.mkdir(parents=True, exist_ok=True)
+        plan.move_ops[0].new_path.write_bytes(b'in the way')
+        refs = {xml.path: xml.load().sample_refs() for xml in plan.xml_files}
+        with self.assertRaisesRegex(ValueError, 'overwrite'):
+            list(self.card.apply_mv_plan(plan, transactional=True))
+        self.assertEqual({xml.path: xml.sample_refs() for xml in plan.xml_files}, refs)
+
+    def test_failed_prepare_releases_trees(self):
+        plan = self.card.plan_mv_samples(MATCHING, Path('SAMPLES/MV'))
+        with mock.patch('deluge_card.mv_transaction.shutil.copy2', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                list(self.card.apply_mv_plan(plan, transactional=True))
+        self.assertFalse([xml for xml in plan.xml_files if xml.loaded])
+        self.assertEqual(self.snapshot(), self.original)
+        self.assertEqual(len(list(self.card.used_samples(MATCHING))), 6)
+
+    def test_another_name_of_the_same_file_is_not_an_overwrite(self):
+        old_path = Path(self.root, 'SAMPLES/x.wav')
+        old_path.write_bytes(b'x')
+        os.link(old_path, Path(self.root, 'SAMPLES/X.wav'))  # as a case-insensitive card sees a case-only rename
+        MoveTransaction.check(self.root, [SampleMoveOperation(old_path, Path(self.root, 'SAMPLES/X.wav'), None)])
+        Path(self.root, 'SAMPLES/y.wav').write_bytes(b'x')
+        with self.assertRaisesRegex(ValueError, 'overwrite'):
+            MoveTransaction.check(self.root, [SampleMoveOperation(old_path, Path(self.root, 'SAMPLES/y.wav'), None)])
+
+    def test_prepare_changes_nothing_visible(self):
+        transaction = self.prepare()
+        self.assertTrue(Path(self.root, JOURNAL_FILENAME).exists())
+        pending = self.card.pending_move()
+        self.assertEqual(pending, transaction)
+        pending.rollback()
+        self.assertEqual(self.snapshot(), self.original)
+
+    def test_resume_interrupted_commit(self):
+        self.prepare()
+        transaction = self.card.pending_move()
+        old, new = transaction.samples[0]
+        os.replace(Path(self.root, old), Path(self.root, new))  # commit got this far
+        transaction.commit()
+        self.assertIsNone(self.card.pending_move())
+        self.assertEqual(len(list(DelugeCardFS(self.root).used_samples('**/MV/*.wav'))), 6)
+
+    def test_refuses_when_move_pending(self):
+        self.prepare()
+        with self.assertRaisesRegex(ValueError, 'incomplete move'):
+            list(DelugeCardFS(self.root).mv_samples(MATCHING, Path('SAMPLES/MV'), transactional=True))
@@ -0,0 +1,82 @@
+import os
+from pathlib import Path, PurePosixPath
+from unittest import TestCase
+
+from deluge_card import DelugeCardFS
+from deluge_card.path_pattern import PathPattern, compile_pattern
+
+PATHS = [
+    '/card/SAMPLES/Artists/A/kick1D.wav',
+    '/card/SAMPLES/Kick/909 Kick.wav',
+    'SAMPLES/DRUMS/Kick/DDD1 Kick.wav',
+    '/card/SONGS/SONG014.XML',
+    '/card/SAMPLES/Multisamples/WaldorfM/Loopop-Waldorf-M-4-StereoSizzle Samples/LP-M4-24-100.wav',
+    'x.wav',
+    '/x.wav',
+    'a/[b]/c.wav',
+]
+
+PATTERNS = [
+    '*014*',
+    '**/Artists/A/*',
+    '**/WaldorfM/Loopop-Waldorf-M-4*/*.*',
+    '*.wav',
+    '*.WAV',
+    'Kick/*',
+    '/card/SONGS/*.XML',
+    '/card/*',
+    '*/*Kick*',
+    '[!x]*.wav',
+    '*[a-c]*',
+    '?.wav',
+    '*/[[]b]/*',
+]
+
+
+class TestPathPattern(TestCase):
+    def test_matches_like_purepath(self):
+        for pattern in PATTERNS:
+            for path in PATHS:
+                with self.subTest(pattern=pattern, path=path):
+                    self.assertEqual(compile_pattern(pattern).match(path), PurePosixPath(path).match(pattern))
+
+    def test_recursive_wildcard(self):
+        pattern = compile_pattern('SAMPLES/**/*.wav')
+        self.assertTrue(pattern.match('/card/SAMPLES/x.wav'))
+        self.assertTrue(pattern.match('/card/SAMPLES/a/b/x.wav'))
+        self.assertFalse(pattern.match('/card/SONGS/a/x.wav'))
+
+    def test_ignore_case(self):
+        self.assertFalse(compile_pattern('**/kick/*.WAV').match(PATHS[1]))
+        self.assertTrue(PathPattern('**/kick/*.WAV', ignore_case=True).match(PATHS[1]))
+
+    def test_include_exclude(self):
+        pattern = PathPattern(['*.wav', '*.XML'], ['**/Kick/*', '/x.wav'])
+        self.assertEqual([pattern.match(p) for p in PATHS], [True, False, False, True, True, True, False, True])
+
+    def test_empty_pattern_matches_all(self):
+        self.assertTrue(compile_pattern('').match_all)
+        self.assertTrue(compile_pattern(None).match('anything'))
+        self.assertFalse(PathPattern(exclude='*.wav').match_all)
+
+
+class TestCardPatterns(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.card = DelugeCardFS(Path(cwd, 'fixtures', 'DC01'))
+
+    def test_compiled_pattern_matches_string(self):
+        pattern = '**/Artists/A/*'
+        self.assertEqual(
+            [s.path for s in self.card.samples(PathPattern(pattern))], [s.path for s in self.card.samples(pattern)]
+        )
+
+    def test_exclude_samples(self):
+        included = set(s.path.name for s in self.card.samples('**/Artists/A/*'))
+        names = set(s.path.name for s in self.card.samples(PathPattern('**/Artists/A/*', 'wurgle.wav')))
+        self.assertIn('wurgle.wav', included)
+        self.assertEqual(names, included - {'wurgle.wav'})
+
+    def test_ignore_case_songs(self):
+        self.assertEqual(list(self.card.songs('*song*')), [])
+        self.assertEqual(list(self.card.songs(PathPattern('*song*', ignore_case=True))), list(self.card.songs()))
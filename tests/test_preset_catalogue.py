@@ -0,0 +1,107 @@
+import os
+import tempfile
+from pathlib import Path
+from unittest import TestCase, skipUnless
+
+from deluge_card import DelugeCardFS
+from deluge_card.preset_catalogue import (
+    KIT,
+    SONG_KIT,
+    SONG_SYNTH,
+    SYNTH,
+    decode_param,
+    decode_params,
+    read_sound_params,
+)
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
+
+VALUES = ['0x80000000', '0x7FFFFFFF', '0x3504F334', '0x00000000', '0xff', '-12', '327244']
+DECODED = [-2147483648, 2147483647, 889516852, 0, 255, -12, 327244]
+
+
+class TestDecode(TestCase):
+    def test_decode_param(self):
+        self.assertEqual([decode_param(v) for v in VALUES], DECODED)
+
+    @skipUnless(numpy, 'numpy is not installed')
+    def test_decode_params(self):
+        self.assertEqual(decode_params(VALUES).tolist(), DECODED)
+        self.assertEqual(decode_params(VALUES[:4]).tolist(), DECODED[:4])
+        self.assertEqual(decode_params(VALUES[5:]).tolist(), DECODED[5:])
+        self.assertEqual(len(decode_params([])), 0)
+
+    def test_only_decodable_values_are_read(self):
+        xml = (
+            '<?xml version="1.0" encoding="UTF-8"?>\n<sound firmwareVersion="3.1.5">\n'
+            '<defaultParams volume="0x4CCCCCA8" pan="0x" reverbAmount="\u0661\u0662" delayRate="--5" '
+            'arpRate="-12" portamento="0xG0000000"><lpfFrequency>0x00000000</lpfFrequency></defaultParams>\n'
+            '</sound>\n'
+        )
+        with tempfile.TemporaryDirectory() as temp_dir:
+            path = Path(temp_dir, 'SYNT000.XML')
+            path.write_text(xml, encoding='utf-8')
+            [(_, _, params)] = read_sound_params(path, SYNTH)
+        self.assertEqual(
+            sorted(params), ['defaultParams/arpRate', 'defaultParams/lpfFrequency', 'defaultParams/volume']
+        )
+        self.assertEqual([decode_param(v) for v in params.values()], [1288490152, -12, 0])
+
+
+class TestPresetCatalogue(TestCase):
+    def setUp(self):
+        self.cwd = os.path.dirname(os.path.realpath(__file__))
+        self.card = DelugeCardFS(Path(self.cwd, 'fixtures', 'DC01'))
+        self.catalogue = self.card.preset_catalogue()
+
+    def test_sounds(self):
+        kinds = self.catalogue.kinds
+        self.assertEqual(kinds.count(SYNTH), len(list(self.card.synths())))
+        self.assertEqual(kinds.count(KIT), sum(len(list(k.xmlroot.iter('sound'))) for k in self.card.kits()))
+        self.assertEqual(kinds.count(SONG_SYNTH), sum(len(list(s.synths)) for s in self.card.songs()))
+        self.assertEqual(kinds.count(SONG_KIT), sum(len(list(k.sounds)) for s in self.card.songs() for k in s.kits))
+        self.assertEqual(len(self.card.preset_catalogue(songs=False)), kinds.count(SYNTH) + kinds.count(KIT))
+
+    def test_element_params(self):
+        path = Path(self.cwd, 'fixtures', 'DC01', 'SYNTHS', 'SYNT991A.XML')
+        [(kind, name, params)] = read_sound_params(path, SYNTH)
+        self.assertEqual((kind, name), (SYNTH, None))
+        self.assertEqual(params['transpose'], '-12')
+        self.assertEqual(params['unison/num'], '4')
+        self.assertEqual(params['defaultParams/portamento'], '0x80000000')
+        self.assertEqual(params['patchCables/velocity->volume'], '0x3FFFFFE8')
+        self.assertNotIn('osc1/type', params)
+
+    def test_attribute_params(self):
+        path = Path(self.cwd, 'fixtures', 'DC01', 'SONGS', 'SONG001.XML')
+        sounds = read_sound_params(path, 'song')
+        kind, name, params = sounds[0]
+        self.assertEqual(kind, SONG_SYNTH)
+        self.assertEqual(params['osc2/transpose'], '12')
+        self.assertEqual(params['unison/num'], '3')
+        self.assertNotIn('presetSlot', params)
+        kind, name, params = next(s for s in sounds if s[0] == SONG_KIT)
+        self.assertEqual(name, 'KICK')
+        self.assertEqual(params['osc1/zone/endSamplePos'], '3439')
+
+    def test_parallel_matches_serial(self):
+        self.assertEqual(self.card.preset_catalogue(workers=3), self.catalogue)
+
+    @skipUnless(numpy, 'numpy is not installed')
+    def test_to_numpy(self):
+        matrix, columns = self.catalogue.to_numpy()
+        self.assertEqual(matrix.shape, (len(self.catalogue), len(columns)))
+        for row in range(len(self.catalogue)):
+            values = self.catalogue.values(row)
+            expected = [values.get(name, numpy.nan) for name in columns]
+            numpy.testing.assert_array_equal(matrix[row], expected)
+
+    @skipUnless(numpy, 'numpy is not installed')
+    def test_nearest(self):
+        nearest = self.catalogue.nearest(0, k=3)
+        self.assertEqual(len(nearest), 3)
+        self.assertNotIn(0, [row for row, _ in nearest])
+        self.assertEqual([d for _, d in nearest], sorted(d for _, d in nearest))
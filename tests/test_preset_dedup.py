@@ -0,0 +1,130 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock, skipUnless
+
+from deluge_card import DelugeCardFS
+from deluge_card.preset_catalogue import SYNTH
+from deluge_card.preset_dedup import canonical_xml, find_duplicate_presets
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
+
+
+class TestPresetDedup(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name, 'DC01')
+        shutil.copytree(Path(cwd, 'fixtures', 'DC01'), self.root)
+        self.card = DelugeCardFS(self.root)
+        synth = Path(self.root, 'SYNTHS', 'SYNT000.XML')
+        xml = synth.read_text()
+        # saved again by newer firmware, indented differently
+        Path(self.root, 'SYNTHS', 'COPY.XML').write_text(
+            xml.replace('<sound>', '<firmwareVersion>4.1.3</firmwareVersion>\n<sound>', 1).replace('\t', '  ')
+        )
+        # a tweaked copy
+        self.assertIn('<portamento>0x80000000</portamento>', xml)
+        Path(self.root, 'SYNTHS', 'TWEAK.XML').write_text(
+            xml.replace('0x80000000</portamento>', '0x80000100</portamento>')
+        )
+        # a kit with renamed sounds, a different kit
+        kit = Path(self.root, 'KITS', 'KIT014.XML').read_text()
+        Path(self.root, 'KITS', 'KIT999.XML').write_text(kit.replace('<name>KICK</name>', '<name>BOOM</name>'))
+        # the kit saved again by newer firmware
+        Path(self.root, 'KITS', 'KIT998.XML').write_text(kit.replace('<kit>', '<kit firmwareVersion="4.1.3">', 1))
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_canonical_xml_ignores_name_and_firmware(self):
+        canonical = canonical_xml(Path(self.root, 'SYNTHS', 'COPY.XML'))
+        self.assertEqual(canonical, canonical_xml(Path(self.root, 'SYNTHS', 'SYNT000.XML')))
+        self.assertNotIn(b'firmwareVersion', canonical)
+        self.assertNotEqual(
+            canonical_xml(Path(self.root, 'SYNTHS', 'TWEAK.XML')),
+            canonical_xml(Path(self.root, 'SYNTHS', 'SYNT000.XML')),
+        )
+
+    def test_canonical_xml_keeps_inner_names(self):
+        canonical = canonical_xml(Path(self.root, 'KITS', 'KIT998.XML'))
+        self.assertEqual(canonical, canonical_xml(Path(self.root, 'KITS', 'KIT014.XML')))
+        self.assertIn(b'<name>KICK</name>', canonical)
+        self.assertNotEqual(canonical, canonical_xml(Path(self.root, 'KITS', 'KIT999.XML')))
+
+    def test_canonical_xml_parses_the_markup(self):
+        xml = Path(self.root, 'SYNTHS', 'SYNT000.XML').read_text()
+        path = Path(self.root, 'SYNTHS', 'MARKUP.XML')
+        # a comment, CDATA and markup characters in attribute values are not tags
+        path.write_text(
+            xml.replace('<sound>', '<sound>\n<!-- <name>x</name> -->', 1).replace(
+                '<portamento>0x80000000</portamento>', '<portamento><![CDATA[0x80000000]]></portamento>'
+            )
+        )
+        self.assertEqual(canonical_xml(path), canonical_xml(Path(self.root, 'SYNTHS', 'SYNT000.XML')))
+        kit = Path(self.root, 'KITS', 'KIT014.XML').read_text()
+        path.write_text(kit.replace('<kit>', '<kit a="/>/>/>/>" b=">">', 1))
+        canonical = canonical_xml(path)
+        self.assertIn(b'<kit a="/>/>/>/>" b=">">', canonical)
+        self.assertIn(b'<name>KICK</name>', canonical)
+
+    def test_exact_duplicates(self):
+        report = self.card.duplicate_presets()
+        self.assertEqual(report.preset_count, 8)
+        self.assertEqual(
+            [[p.name for p in g.paths] for g in report.groups],
+            [['KIT014.XML', 'KIT998.XML'], ['COPY.XML', 'SYNT000.XML']],
+        )
+        self.assertTrue(all(g.exact for g in report.groups))
+        self.assertEqual(report.redundant_count, 2)
+        sizes = [
+            Path(self.root, 'KITS', 'KIT998.XML').stat().st_size,
+            Path(self.root, 'SYNTHS', 'SYNT000.XML').stat().st_size,
+        ]
+        self.assertEqual(report.redundant_bytes, sum(sizes))
+        self.assertIn('2 duplicate groups (2 exact, 0 near): 2 redundant presets', report.summary())
+
+    @skipUnless(numpy, 'numpy is not installed')
+    def test_near_duplicates(self):
+        report = self.card.duplicate_presets(tolerance=0.001)
+        group = next(g for g in report.groups if len(g.paths) == 3)
+        self.assertEqual([p.name for p in group.paths], ['COPY.XML', 'SYNT000.XML', 'TWEAK.XML'])
+        self.assertFalse(group.exact)
+        self.assertEqual(report.redundant_count, 3)
+        self.assertEqual(self.card.duplicate_presets('SYNTHS/*', tolerance=0).redundant_count, 1)
+
+    @skipUnless(numpy, 'numpy is not installed')
+    def test_near_duplicates_across_step_boundary(self):
+        xml = Path(self.root, 'SYNTHS', 'SYNT000.XML').read_text()
+        step = int(0.001 * 2**32)
+        boundary = 0x80000000 // step * step
+        files = []
+        for name, value in (('BELOW.XML', boundary - 1), ('ABOVE.XML', boundary)):
+            files.append((Path(self.root, 'SYNTHS', name), SYNTH))
+            files[-1][0].write_text(xml.replace('0x80000000</portamento>', f'0x{value:08X}</portamento>'))
+        self.assertEqual(find_duplicate_presets(files, tolerance=0.001).redundant_count, 1)
+        self.assertEqual(find_duplicate_presets(files, tolerance=0).redundant_count, 0)
+
+    def test_parallel_matches_serial(self):
+        self.assertEqual(self.card.duplicate_presets(workers=3), self.card.duplicate_presets())
+
+    @skipUnless(numpy, 'numpy is not installed')
+    def test_near_parallel_matches_serial(self):
+        self.assertEqual(
+            self.card.duplicate_presets(tolerance=0.001, workers=3), self.card.duplicate_presets(tolerance=0.001)
+        )
+
+    def test_digests_kept_in_index(self):
+        expected = self.card.duplicate_presets()
+        for path in self.root.glob('*/*.XML'):
+            # written by setUp, age them past the index's timestamp resolution window
+            st = path.stat()
+            os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns - 10**10))
+        DelugeCardFS(self.root, use_index=True).duplicate_presets()
+        with mock.patch('deluge_card.preset_dedup.preset_digest') as mock_digest:
+            self.assertEqual(DelugeCardFS(self.root, use_index=True).duplicate_presets(), expected)
+        mock_digest.assert_not_called()
@@ -0,0 +1,227 @@
+import hashlib
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase, mock
+
+from deluge_card import DelugeCardFS
+from deluge_card.mv_transaction import JOURNAL_FILENAME
+from deluge_card.sample_dedup import duplicate_files, file_digest
+
+
+class TestDuplicateFiles(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.folder = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def write(self, name, data):
+        path = Path(self.folder, name)
+        path.write_bytes(data)
+        return path
+
+    def test_file_digest(self):
+        data = os.urandom(100000)
+        path = self.write('a.wav', data)
+        self.assertEqual(file_digest(path, chunk_size=4096), hashlib.sha1(data).hexdigest())
+        self.assertEqual(file_digest(path, 1000, chunk_size=300), hashlib.sha1(data[:1000]).hexdigest())
+        self.assertEqual(file_digest(self.write('empty.wav', b'')), hashlib.sha1().hexdigest())
+
+    def test_groups(self):
+        big = os.urandom(200000)
+        small = os.urandom(1000)
+        paths = [
+            self.write('a.wav', big),
+            self.write('b.wav', small),
+            self.write('c.wav', big),
+            self.write('d.wav', big[:-1] + b'x'),  # same size and head
+            self.write('e.wav', small),
+            self.write('f.wav', b''),
+        ]
+        os.link(paths[0], Path(self.folder, 'a-link.wav'))
+        paths += [Path(self.folder, 'a-link.wav'), Path(self.folder, 'missing.wav')]
+        for workers in (0, 3):
+            groups = duplicate_files(paths, workers)
+            self.assertEqual(sorted([p.name for p in g] for g in groups), [['a.wav', 'c.wav'], ['b.wav', 'e.wav']])
+
+
+class TestDedupSamples(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name, 'DC01')
+        shutil.copytree(Path(cwd, 'fixtures', 'DC01'), self.root)
+        self.kick = Path(self.root, 'SAMPLES', 'DRUMS', 'Kick', 'CR78 Kick.wav')
+        self.synth_sample = Path(self.root, 'SAMPLES', 'CLASSIC', 'DX7', 'SYNTH-MedivalSynzzz3.wav')
+        self.copy = Path(self.root, 'SAMPLES', 'Artists', 'CR78 Kick copy.wav')
+        self.kick.parent.mkdir(parents=True, exist_ok=True)
+        self.kick.write_bytes(os.urandom(150000))
+        # a used sample with the same content, and an unused copy
+        shutil.copy(self.kick, self.synth_sample)
+        shutil.copy(self.kick, self.copy)
+        self.card = DelugeCardFS(self.root)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_plan(self):
+        plan = self.card.plan_dedup_samples()
+        self.assertEqual(plan.groups, ((self.kick, (self.synth_sample, self.copy)),))
+        self.assertEqual(plan.bytes_reclaimed, 300000)
+        self.assertEqual([xml.path.name for xml in plan.xml_files], ['SYNT991A.XML'])
+        self.assertEqual(plan.element_count, 1)
+        self.assertIn('deleting 2 copies (0.3MB)', plan.summary())
+        self.assertTrue(self.copy.exists())
+
+    def check_applied(self, modops):
+        self.assertEqual([m.operation for m in modops], ['update_synth_xml', 'delete_file', 'delete_file'])
+        self.assertFalse(self.copy.exists())
+        self.assertFalse(self.synth_sample.exists())
+        card = DelugeCardFS(self.root)
+        self.assertEqual(len(card.sample_settings(self.kick)), 4)
+        self.assertEqual(card.plan_dedup_samples().groups, ())
+
+    def test_dedup(self):
+        self.check_applied(list(self.card.dedup_samples(workers=2)))
+
+    def test_deleted_copies_missing_straight_after_dedup(self):
+        self.assertTrue(self.card.folder_cache().exists(self.copy))
+        list(self.card.dedup_samples())
+        self.assertFalse(self.card.folder_cache().exists(self.copy))
+        self.assertFalse(self.card.folder_cache().exists(self.synth_sample))
+
+    def test_dedup_transactional(self):
+        self.check_applied(list(self.card.dedup_samples(transactional=True)))
+        self.assertIsNone(self.card.pending_move())
+
+    def test_changed_since_planned(self):
+        plan = self.card.plan_dedup_samples()
+        self.copy.write_bytes(b'changed')
+        with self.assertRaises(ValueError):
+            list(self.card.apply_dedup_plan(plan))
+        self.assertTrue(self.synth_sample.exists())
+
+    def test_touched_since_planned(self):
+        plan = self.card.plan_dedup_samples()
+        st = self.copy.stat()
+        os.utime(self.copy, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        with self.assertRaises(ValueError):
+            list(self.card.apply_dedup_plan(plan))
+        self.assertTrue(self.copy.exists())
+
+    def resave_synth(self, keep_mtime=False):
+        synth = Path(self.root, 'SYNTHS', 'SYNT991A.XML')
+        st = synth.stat()
+        text = synth.read_text().replace('SYNTH-MedivalSynzzz3.wav', 'SYNTH-MedivalSynzzz4.wav')
+        synth.write_text(text)
+        if keep_mtime:  # as if within the FAT mtime resolution
+            os.utime(synth, ns=(st.st_atime_ns, st.st_mtime_ns))
+        return synth
+
+    def test_xml_changed_since_planned(self):
+        for keep_mtime in (False, True):
+            with self.subTest(keep_mtime=keep_mtime):
+                plan = DelugeCardFS(self.root).plan_dedup_samples()
+                synth = self.resave_synth(keep_mtime)
+                before = synth.read_bytes()
+                with self.assertRaises(ValueError):
+                    list(self.card.apply_dedup_plan(plan))
+                self.assertEqual(synth.read_bytes(), before)
+                self.assertTrue(self.synth_sample.exists())
+                synth.write_text(synth.read_text().replace('Synzzz4.wav', 'Synzzz3.wav'))
+
+    def test_xml_changed_since_planned_over_loaded_trees(self):
+        plan = self.card.plan_dedup_samples()
+        for xml in plan.xml_files:
+            xml.load()  # the memory copy is not the card
+        synth = self.resave_synth(keep_mtime=True)
+        before = synth.read_bytes()
+        with self.assertRaisesRegex(ValueError, 'sample reference changed'):
+            list(self.card.apply_dedup_plan(plan))
+        self.assertEqual(synth.read_bytes(), before)
+        self.assertTrue(self.synth_sample.exists())
+
+    def test_refused_transaction_leaves_trees_unchanged(self):
+        plan = self.card.plan_dedup_samples()
+        refs = {xml.path: xml.load().sample_refs() for xml in plan.xml_files}
+        Path(self.root, JOURNAL_FILENAME).write_text('{}')  # another move is pending
+        with self.assertRaisesRegex(ValueError, 'incomplete move'):
+            list(self.card.apply_dedup_plan(plan, transactional=True))
+        self.assertEqual({xml.path: xml.sample_refs() for xml in plan.xml_files}, refs)
+
+    def test_failed_transaction_releases_trees(self):
+        plan = self.card.plan_dedup_samples()
+        with mock.patch('deluge_card.mv_transaction.shutil.copy2', side_effect=OSError('disk full')):
+            with self.assertRaises(OSError):
+                list(self.card.apply_dedup_plan(plan, transactional=True))
+        self.assertFalse([xml for xml in plan.xml_files if xml.loaded])
+        self.assertTrue(self.synth_sample.exists())
+        self.assertEqual(len(self.card.sample_settings(self.synth_sample)), 1)
+
+    def interrupted_merge(self):
+        plan = self.card.plan_dedup_samples()
+        with mock.patch('deluge_card.mv_transaction.MoveTransaction.commit', side_effect=KeyboardInterrupt):
+            with self.assertRaises(KeyboardInterrupt):
+                list(self.card.apply_dedup_plan(plan, transactional=True))
+        pending = self.card.pending_move()
+        self.assertEqual([Path(self.root, path) for path, _ in pending.deletions], [self.synth_sample, self.copy])
+        # the commit got as far as setting the first copy aside
+        path, backup = pending.deletions[0]
+        os.replace(Path(self.root, path), Path(self.root, backup))
+        return pending
+
+    def test_rollback_interrupted_merge_restores_copies(self):
+        before = self.copy.read_bytes()
+        synth = Path(self.root, 'SYNTHS', 'SYNT991A.XML')
+        xml_before = synth.read_bytes()
+        self.interrupted_merge().rollback()
+        self.assertIsNone(self.card.pending_move())
+        self.assertEqual(self.synth_sample.read_bytes(), before)
+        self.assertEqual(self.copy.read_bytes(), before)
+        self.assertEqual(synth.read_bytes(), xml_before)
+        self.assertEqual([p for p in self.root.rglob('*') if p.suffix in ('.dmvtmp', '.dmvbak')], [])
+
+    def test_resume_interrupted_merge_deletes_copies(self):
+        self.interrupted_merge().commit()
+        self.assertIsNone(self.card.pending_move())
+        self.assertFalse(self.synth_sample.exists())
+        self.assertFalse(self.copy.exists())
+        self.assertEqual([p for p in self.root.rglob('*') if p.suffix in ('.dmvtmp', '.dmvbak')], [])
+        self.assertEqual(len(DelugeCardFS(self.root).sample_settings(self.kick)), 4)
+
+    def test_all_names_of_a_copy_are_rewritten(self):
+        alias = Path(self.root, 'SAMPLES', 'CLASSIC', 'alias.wav')
+        os.link(self.synth_sample, alias)
+        song = Path(self.root, 'SONGS', 'SONG001.XML')
+        song.write_text(song.read_text().replace('SAMPLES/DRUMS/Kick/DDD1 Kick.wav', 'SAMPLES/CLASSIC/alias.wav'))
+        card = DelugeCardFS(self.root)
+        plan = card.plan_dedup_samples()
+        self.assertEqual(plan.groups, ((self.kick, (self.synth_sample, alias, self.copy)),))
+        self.assertEqual(plan.bytes_reclaimed, 300000)
+        list(card.apply_dedup_plan(plan))
+        self.assertFalse(alias.exists())
+        card = DelugeCardFS(self.root)
+        self.assertEqual(card.sample_settings(alias), [])
+        self.assertEqual(len(card.sample_settings(self.kick)), 5)
+
+    def test_references_the_pattern_misses_are_rewritten(self):
+        a, b = Path(self.root, 'SAMPLES', 'A', 'x.wav'), Path(self.root, 'SAMPLES', 'B', 'x.wav')
+        for path in (a, b):
+            path.parent.mkdir()
+            path.write_bytes(b'x' * 1000)
+        kit = Path(self.root, 'KITS', 'KIT014.XML')
+        text = kit.read_text().replace('SAMPLES/DRUMS/Kick/CR78 Kick.wav', 'SAMPLES/b/x.wav')
+        text = text.replace('SAMPLES/DRUMS/Snare/CR78 Snare.wav', 'SAMPLES/A/x.wav')
+        kit.write_text(text.replace('SAMPLES/DRUMS/HatC/CR78 Closed hihat.wav', 'SAMPLES/A/x.wav'))
+        card = DelugeCardFS(self.root)
+        plan = card.plan_dedup_samples('SAMPLES/[AB]/x.wav')
+        self.assertEqual(plan.groups, ((a, (b,)),))
+        self.assertEqual(plan.element_count, 1)
+        list(card.apply_dedup_plan(plan))
+        self.assertFalse(b.exists())
+        text = kit.read_text()
+        self.assertNotIn('SAMPLES/b/x.wav', text)
+        self.assertEqual(text.count('SAMPLES/A/x.wav'), 3)
@@ -0,0 +1,91 @@
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import TestCase
+
+from deluge_card import DelugeCardFS
+from deluge_card.sample_index import SampleIndex, normalise_sample_path
+
+
+class TestSampleIndex(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.card = DelugeCardFS(Path(cwd, 'fixtures', 'DC01'))
+
+    def test_normalise_sample_path(self):
+        root = self.card.card_root
+        self.assertEqual(normalise_sample_path(root, Path(root, 'SAMPLES/Kick/A.wav')), 'samples/kick/a.wav')
+        self.assertEqual(normalise_sample_path(root, 'SAMPLES/Kick/A.wav'), 'samples/kick/a.wav')
+        self.assertEqual(normalise_sample_path(Path('cards/DC01'), 'cards/DC01/SAMPLES/A.wav'), 'samples/a.wav')
+
+    def test_settings_match_used_samples(self):
+        index = self.card.sample_index()
+        for sample in self.card.used_samples():
+            self.assertEqual(len(index.settings(sample.path)), len(sample.settings))
+
+    def test_lookup_relative_and_case_insensitive(self):
+        settings = self.card.sample_settings('samples/drums/kick/cr78 kick.wav')
+        self.assertEqual(len(settings), 3)
+        users = self.card.sample_users('SAMPLES/DRUMS/Kick/CR78 Kick.wav')
+        self.assertEqual(sorted(x.path.name for x in users), ['KIT014.XML', 'SONG006.XML', 'SONG009.XML'])
+
+    def test_unused_sample(self):
+        self.assertFalse(self.card.sample_index().is_used('SAMPLES/Artists/A/wurgle.wav'))
+        self.assertEqual(self.card.sample_users('SAMPLES/Artists/A/wurgle.wav'), [])
+
+    def test_remove_xml(self):
+        index = SampleIndex.from_card(self.card)
+        kit = next(self.card.kits())
+        index.remove_xml(kit.path)
+        self.assertEqual(len(index.settings('SAMPLES/DRUMS/Kick/CR78 Kick.wav')), 2)
+        index.update_xml(kit)
+        self.assertEqual(len(index.settings('SAMPLES/DRUMS/Kick/CR78 Kick.wav')), 3)
+
+
+class TestSampleIndexMove(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        root = Path(self.temp_dir.name, 'DC01')
+        shutil.copytree(Path(cwd, 'fixtures', 'DC01'), root)
+        self.card = DelugeCardFS(root)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_index_follows_mv_samples(self):
+        self.assertEqual(len(self.card.sample_settings('SAMPLES/DRUMS/Kick/CR78 Kick.wav')), 3)
+        list(self.card.mv_samples('**/DRUMS/Kick/CR78 Kick.wav', Path('SAMPLES/MV')))
+        self.assertEqual(len(self.card.sample_settings('SAMPLES/DRUMS/Kick/CR78 Kick.wav')), 0)
+        self.assertEqual(len(self.card.sample_settings('SAMPLES/MV/CR78 Kick.wav')), 3)
+
+    def test_index_follows_mv_samples_with_case_variant_refs(self):
+        kit_path = Path(self.card.card_root, 'KITS', 'KIT014.XML')
+        text = kit_path.read_text()
+        text = text.replace('SAMPLES/DRUMS/Snare/CR78 Snare.wav', 'SAMPLES/Artists/A/wurgle.wav')
+        text = text.replace('SAMPLES/DRUMS/HatC/CR78 Closed hihat.wav', 'SAMPLES/ARTISTS/A/WURGLE.wav')
+        kit_path.write_text(text)
+        self.assertEqual(len(self.card.sample_settings('SAMPLES/Artists/A/wurgle.wav')), 2)
+        list(self.card.mv_samples('SAMPLES/Artists/A/*', Path('SAMPLES/MV')))
+        self.assertTrue(Path(self.card.card_root, 'SAMPLES', 'MV', 'wurgle.wav').exists())
+        self.assertEqual(len(self.card.sample_settings('SAMPLES/MV/wurgle.wav')), 1)
+        self.assertEqual(len(self.card.sample_settings('SAMPLES/ARTISTS/A/WURGLE.wav')), 1)
+        self.assertEqual(len(self.card.sample_index(refresh=True).settings('SAMPLES/MV/wurgle.wav')), 1)
+
+    def test_refresh_reads_changed_files_only(self):
+        index = self.card.sample_index()
+        kit_path = Path(self.card.card_root, 'KITS', 'KIT014.XML')
+        st = kit_path.stat()
+        for xml_path in self.card.card_root.rglob('*.XML'):  # indexed long after they were written
+            os.utime(xml_path, ns=(st.st_atime_ns, st.st_mtime_ns - 10**10))
+        index.refresh(self.card)
+        self.assertEqual(index.refresh(self.card), 0)
+        kit_path.write_text(kit_path.read_text().replace('SAMPLES/DRUMS/Kick/CR78 Kick.wav', 'SAMPLES/MV/a.wav'))
+        self.assertIs(self.card.sample_index(refresh=True), index)
+        self.assertEqual(index.refresh(self.card), 1)  # within the mtime resolution, so not trusted yet
+        self.assertEqual(len(index.settings('SAMPLES/DRUMS/Kick/CR78 Kick.wav')), 2)
+        self.assertEqual(len(index.settings('SAMPLES/MV/a.wav')), 1)
+        kit_path.unlink()
+        index.refresh(self.card)
+        self.assertEqual(index.settings('SAMPLES/MV/a.wav'), [])
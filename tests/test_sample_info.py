@@ -0,0 +1,139 @@
+import os
+import shutil
+import struct
+import tempfile
+import wave
+from pathlib import Path
+from unittest import TestCase, mock
+
+from deluge_card import DelugeCardFS, Sample
+from deluge_card.sample_info import AIFF, WAV, SampleInfo, read_sample_info, sample_infos
+
+
+def write_wav(path, channels=2, sample_width=2, rate=44100, frames=100):
+    with wave.open(str(path), 'wb') as w:
+        w.setnchannels(channels)
+        w.setsampwidth(sample_width)
+        w.setframerate(rate)
+        w.writeframes(b'\0' * channels * sample_width * frames)
+
+
+def aiff_bytes(channels=1, frames=1000, bits=16, rate=48000):
+    # 80 bit extended sample rate
+    exponent = rate.bit_length() - 1
+    mantissa = rate << (63 - exponent)
+    comm = struct.pack('>hIhHQ', channels, frames, bits, exponent + 16383, mantissa)
+    sound = b'\0' * 8 + b'\0' * channels * (bits // 8) * frames
+    chunks = b'COMM' + struct.pack('>I', len(comm)) + comm + b'SSND' + struct.pack('>I', len(sound)) + sound
+    return b'FORM' + struct.pack('>I', len(chunks) + 4) + b'AIFF' + chunks
+
+
+class TestReadSampleInfo(TestCase):
+    def setUp(self):
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.dir = Path(self.temp_dir.name)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_wav(self):
+        write_wav(Path(self.dir, 'a.wav'), channels=1, sample_width=3, rate=22050, frames=44100)
+        info = read_sample_info(Path(self.dir, 'a.wav'))
+        self.assertEqual(info, SampleInfo(WAV, 22050, 1, 24, 44100))
+        self.assertEqual(info.duration, 2.0)
+
+    def test_wav_with_chunks_before_data(self):
+        write_wav(Path(self.dir, 'a.wav'), frames=10)
+        data = Path(self.dir, 'a.wav').read_bytes()
+        junk = b'JUNK' + struct.pack('<I', 27) + b'\0' * 28  # odd size, padded
+        data = data[:36] + junk + data[36:]
+        Path(self.dir, 'b.wav').write_bytes(data)
+        self.assertEqual(read_sample_info(Path(self.dir, 'b.wav')), SampleInfo(WAV, 44100, 2, 16, 10))
+
+    def test_truncated_wav(self):
+        write_wav(Path(self.dir, 'a.wav'), frames=100)
+        Path(self.dir, 'b.wav').write_bytes(Path(self.dir, 'a.wav').read_bytes()[: 44 + 4 * 50])
+        Path(self.dir, 'c.wav').write_bytes(Path(self.dir, 'a.wav').read_bytes()[:30])
+        self.assertEqual(read_sample_info(Path(self.dir, 'b.wav')).frame_count, 50)
+        self.assertIsNone(read_sample_info(Path(self.dir, 'c.wav')))
+
+    def test_aiff(self):
+        Path(self.dir, 'a.aif').write_bytes(aiff_bytes(channels=2, frames=1000, bits=16, rate=48000))
+        info = read_sample_info(Path(self.dir, 'a.aif'))
+        self.assertEqual(info, SampleInfo(AIFF, 48000, 2, 16, 1000))
+
+    def test_unsupported(self):
+        Path(self.dir, 'a.mp3').write_bytes(b'ID3\x03' + b'\0' * 100)
+        Path(self.dir, 'empty.wav').write_bytes(b'')
+        self.assertIsNone(read_sample_info(Path(self.dir, 'a.mp3')))
+        self.assertIsNone(read_sample_info(Path(self.dir, 'empty.wav')))
+        with self.assertRaises(OSError):
+            read_sample_info(Path(self.dir, 'missing.wav'))
+
+    def test_sample_infos(self):
+        write_wav(Path(self.dir, 'a.wav'))
+        Path(self.dir, 'b.aif').write_bytes(aiff_bytes())
+        paths = [Path(self.dir, name) for name in ('a.wav', 'b.aif', 'missing.wav', 'a.wav')]
+        for workers in (0, 4):
+            infos = sample_infos(paths, workers=workers)
+            self.assertEqual(list(infos), paths[:3])
+            self.assertEqual([info and info.format for info in infos.values()], [WAV, AIFF, None])
+
+    def test_sample(self):
+        write_wav(Path(self.dir, 'a.wav'), frames=441)
+        self.assertEqual(Sample(Path(self.dir, 'a.wav')).info().duration, 0.01)
+
+
+class TestCardSampleInfo(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.temp_dir = tempfile.TemporaryDirectory()
+        self.root = Path(self.temp_dir.name, 'DC01')
+        shutil.copytree(Path(cwd, 'fixtures', 'DC01'), self.root)
+
+    def tearDown(self):
+        self.temp_dir.cleanup()
+
+    def test_card_sample_infos(self):
+        card = DelugeCardFS(self.root)
+        infos = card.sample_infos()
+        self.assertEqual(len(infos), len(list(card._sample_files())))
+        info = card.sample_info('SAMPLES/DRUMS/Kick/CR78 Kick.wav')
+        self.assertEqual(info, SampleInfo(WAV, 44100, 1, 16, 5673))
+        self.assertEqual(infos[Path(self.root, 'SAMPLES/DRUMS/Kick/CR78 Kick.wav')], info)
+        self.assertIsNone(card.sample_info('SAMPLES/Kick/909 Kick.wav'))  # empty file
+
+    def test_durations(self):
+        card = DelugeCardFS(self.root)
+        kick = card.sample_info('SAMPLES/DRUMS/Kick/CR78 Kick.wav').duration
+        self.assertEqual(card.kit_durations(), {Path(self.root, 'KITS/KIT014.XML'): kick})
+        durations = card.song_durations()
+        self.assertEqual(len(durations), len(list(card.songs())))
+        self.assertEqual(durations[Path(self.root, 'SONGS/SONG006.XML')], kick)
+        self.assertEqual(durations[Path(self.root, 'SONGS/SONG001.XML')], 0.0)
+
+    def test_infos_kept_in_index(self):
+        expected = DelugeCardFS(self.root).sample_infos()
+        self.assertEqual(DelugeCardFS(self.root, use_index=True).sample_infos(), expected)
+        with mock.patch('deluge_card.sample_info.read_sample_info', return_value=None) as mock_read:
+            self.assertEqual(DelugeCardFS(self.root, use_index=True).sample_infos(), expected)
+        # files that are not WAV or AIFF are kept too, none is read again
+        mock_read.assert_not_called()
+        self.assertIn(None, expected.values())
+
+        sample = Path(self.root, 'SAMPLES/DRUMS/Kick/CR78 Kick.wav')
+        write_wav(sample, frames=10)
+        self.assertEqual(DelugeCardFS(self.root, use_index=True).sample_info(sample).frame_count, 10)
+
+    def test_unreadable_samples_not_kept_in_index(self):
+        sample = Path(self.root, 'SAMPLES/DRUMS/Kick/CR78 Kick.wav')
+        with mock.patch('deluge_card.sample_info.read_sample_info', side_effect=OSError):
+            self.assertIsNone(DelugeCardFS(self.root, use_index=True).sample_info(sample))
+        self.assertEqual(DelugeCardFS(self.root, use_index=True).sample_info(sample).frame_count, 5673)
+
+    def test_deleted_samples_pruned_from_index(self):
+        DelugeCardFS(self.root, use_index=True).sample_infos()
+        Path(self.root, 'SAMPLES/DRUMS/Kick/CR78 Kick.wav').unlink()
+        card = DelugeCardFS(self.root, use_index=True)
+        card.sample_infos()
+        self.assertEqual(card.index().prune_sample_infos(sample.path for sample in card._sample_files()), 0)
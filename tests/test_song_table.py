@@ -0,0 +1,50 @@
+import os
+from pathlib import Path
+from unittest import TestCase, skipUnless
+
+from deluge_card import DelugeCardFS
+from deluge_card.song_table import COLUMNS, SongTable, read_song_metadata
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
+
+
+class TestSongTable(TestCase):
+    def setUp(self):
+        cwd = os.path.dirname(os.path.realpath(__file__))
+        self.card = DelugeCardFS(Path(cwd, 'fixtures', 'DC01'))
+
+    def test_matches_song_methods(self):
+        for song in self.card.songs():
+            row = read_song_metadata(song.path)
+            with self.subTest(song=song.path.name):
+                self.assertEqual(row['tempo'], song.tempo())
+                self.assertEqual(row['root_note'], song.root_note())
+                self.assertEqual(row['scale'], song.scale())
+                self.assertEqual(row['minimum_firmware'], song.minimum_firmware())
+                self.assertEqual(row['synths'], len(list(song.synths)))
+                self.assertEqual(row['kits'], len(list(song.kits)))
+                self.assertEqual(row['samples'], len(list(song.samples(allow_missing=True))))
+
+    def test_table(self):
+        table = self.card.song_table()
+        self.assertEqual(len(table), len(list(self.card.songs())))
+        self.assertEqual(list(table.columns), COLUMNS)
+        self.assertEqual(table.columns['path'], [str(s.path) for s in self.card.songs()])
+        self.assertEqual(list(table.rows())[0]['scale'], 'C major')
+
+    def test_parallel_matches_serial(self):
+        self.assertEqual(self.card.song_table(workers=3).columns, self.card.song_table().columns)
+
+    def test_missing_attributes(self):
+        table = SongTable.from_rows([dict(read_song_metadata(next(self.card.songs()).path), tempo=None)])
+        self.assertIsNone(table.columns['tempo'][0])
+
+    @skipUnless(numpy, 'numpy is not installed')
+    def test_to_numpy(self):
+        arrays = self.card.song_table().to_numpy()
+        self.assertEqual(arrays['tempo'].dtype, numpy.float64)
+        self.assertEqual(arrays['synths'].dtype, numpy.int64)
+        self.assertEqual(arrays['path'].dtype, object)